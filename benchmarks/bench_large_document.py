@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Compare large-document mode (split at H1, parallel pandoc, DOCX merge) with the single-pass path.
+
+Each mode runs in a fresh interpreter so peak memory is measured per mode:
+``largest_process_mb`` is the biggest single process (pandoc or this
+interpreter) and ``tree_peak_mb`` the sampled peak of the whole process tree,
+which is what concurrent part conversions add up to (Linux only).
+
+Usage:
+  python benchmarks/bench_large_document.py --lines 50000 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.core.models import BuildOptions  # noqa: E402
+from docforge.core.service import BuildService  # noqa: E402
+
+
+def _document(lines: int, chapters: int) -> str:
+    """Synthetic report of roughly ``lines`` lines: chapters, sections, lists, tables, code and footnotes."""
+    per_chapter = max(20, lines // chapters)
+    out = ["---\ntitle: Large Document Benchmark\nauthor: docforge\n---\n"]
+    written = 4
+    chapter = 0
+    while written < lines:
+        chapter += 1
+        out.append(f"\n# Chapter {chapter}\n\nIntroduction to chapter {chapter} with **bold** text.[^c{chapter}]\n")
+        out.append(f"\n[^c{chapter}]: Footnote for chapter {chapter}.\n")
+        written += 6
+        section = 0
+        while written < chapter * per_chapter and written < lines:
+            section += 1
+            out.append(
+                f"\n## Section {chapter}.{section}\n\n"
+                f"Paragraph with `code`, a [link](https://example.com/{chapter}/{section}) and *emphasis*.\n\n"
+                "- first item\n- second item\n  - nested item\n\n"
+                "| Key | Value | Notes |\n| --- | --- | --- |\n| a | 1 | x |\n| b | 2 | y |\n\n"
+                "```python\nprint('hello')\n```\n"
+            )
+            written += 19
+    return "".join(out)
+
+
+def _tree_rss_bytes(pid: int) -> int:
+    """Resident memory of ``pid`` and its descendants, read from /proc."""
+    total = 0
+    pending = [pid]
+    page = os.sysconf("SC_PAGE_SIZE")
+    while pending:
+        current = pending.pop()
+        try:
+            total += int(Path(f"/proc/{current}/statm").read_text().split()[1]) * page
+            children = Path(f"/proc/{current}/task/{current}/children").read_text().split()
+        except (OSError, IndexError, ValueError):
+            continue
+        pending.extend(int(child) for child in children)
+    return total
+
+
+def run_mode(input_path: Path, split: bool, workers: int) -> dict[str, object]:
+    """One build in this process; called in a child interpreter by ``main``."""
+    config_path = input_path.parent / "templates.yaml"
+    config_text = (ROOT / "config" / "templates.yaml").read_text(encoding="utf-8")
+    config_path.write_text(config_text.replace("split_workers: 4", f"split_workers: {workers}"), encoding="utf-8")
+
+    peak = [0]
+    done = threading.Event()
+
+    def sample() -> None:
+        while not done.is_set():
+            peak[0] = max(peak[0], _tree_rss_bytes(os.getpid()))
+            done.wait(0.01)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    if Path("/proc/self/statm").exists():
+        sampler.start()
+    service = BuildService(base_dir=ROOT)
+    started = time.perf_counter()
+    result = service.run(
+        BuildOptions(
+            input_path=input_path,
+            output_path=input_path.with_name(f"{'split' if split else 'single'}.docx"),
+            config_path=config_path,
+            enable_mermaid=False,
+            split=split,
+            force=True,
+        )
+    )
+    wall = time.perf_counter() - started
+    done.set()
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    largest = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    phases = result.timings.get("phases", {})
+    return {
+        "mode": "split" if split else "single",
+        "exit_code": result.exit_code,
+        "error": result.error.message if result.error else None,
+        "wall_s": round(wall, 3),
+        "pandoc_s": round(phases.get("pandoc", 0.0), 3),
+        "merge_s": round(phases.get("pandoc.merge", 0.0), 3),
+        "largest_process_mb": round(largest * scale / 2**20, 1),
+        "tree_peak_mb": round(peak[0] / 2**20, 1) if peak[0] else None,
+        "output_bytes": result.output_path.stat().st_size if result.output_path else None,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="large-document mode benchmark")
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4, help="tools.split_workers for the split run")
+    parser.add_argument("--mode", choices=["single", "split"], help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(run_mode(Path(args.input), args.mode == "split", args.workers)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as td:
+        input_path = Path(td) / "large.md"
+        input_path.write_text(_document(args.lines, args.chapters), encoding="utf-8")
+        results = []
+        for mode in ("single", "split"):
+            proc = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--input", str(input_path), "--workers", str(args.workers)],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                return proc.returncode
+            results.append(json.loads(proc.stdout))
+    single, split = results
+    ok = single["exit_code"] == split["exit_code"] == 0
+    if ok and single["wall_s"] and split["wall_s"]:
+        split["speedup"] = round(single["wall_s"] / split["wall_s"], 2)
+    print(json.dumps({"lines": args.lines, "chapters": args.chapters, "results": results}, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Compare per-diagram Mermaid latency of the mmdc and batch backends.
+
+Usage:
+  python benchmarks/bench_mermaid_backends.py --diagrams 20 --format png
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.mermaid_batch import shutdown_batch_renderers  # noqa: E402
+from docforge.core.service import BuildService  # noqa: E402
+
+
+def _diagram(idx: int) -> str:
+    return f"flowchart TD\n  A{idx}[Start {idx}] --> B{idx}{{Check}}\n  B{idx} -->|yes| C{idx}[Done]\n  B{idx} -->|no| A{idx}\n"
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def bench_backend(backend: str, diagrams: int, image_ext: str, config_path: Path) -> dict[str, object]:
+    svc = BuildService(base_dir=ROOT)
+    tools_cfg = dict(svc._load_yaml(config_path).get("tools") or {})
+    tools_cfg["mermaid_backend"] = backend
+    runner = svc._build_tool_runner(tools_cfg)
+
+    latencies: list[float] = []
+    failures = 0
+    with tempfile.TemporaryDirectory() as td:
+        work = Path(td)
+        for idx in range(diagrams):
+            mmd = work / f"d{idx}.mmd"
+            mmd.write_text(_diagram(idx), encoding="utf-8")
+            started = time.perf_counter()
+            try:
+                cp = runner.run_mermaid(mmd, work / f"d{idx}.{image_ext}")
+                ok = cp.returncode == 0
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            failures += 0 if ok else 1
+    shutdown_batch_renderers()
+
+    return {
+        "backend": backend,
+        "diagrams": diagrams,
+        "failures": failures,
+        "first_ms": round(latencies[0] * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "total_s": round(sum(latencies), 3),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Mermaid backend latency benchmark")
+    parser.add_argument("--diagrams", type=int, default=20)
+    parser.add_argument("--format", choices=["png", "svg"], default="png")
+    parser.add_argument("--config", default=str(ROOT / "config" / "templates.yaml"))
+    parser.add_argument("--backends", default="mmdc,batch", help="Comma-separated backends to compare")
+    args = parser.parse_args(argv)
+
+    results = [
+        bench_backend(backend.strip(), args.diagrams, args.format, Path(args.config))
+        for backend in args.backends.split(",")
+        if backend.strip()
+    ]
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Compare pandoc throughput of the subprocess and server backends.
+
+Builds pass no Lua filters (page breaks and template settings are applied by
+docforge's DOCX post-processor), so both backends run the same conversions.
+
+Usage:
+  python benchmarks/bench_pandoc_backends.py --documents 50 --sections 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.pandoc_server import PandocServerToolRunner, shutdown_pandoc_servers  # noqa: E402
+from docforge.adapters.tool_runner import SubprocessToolRunner  # noqa: E402
+
+
+def _document(idx: int, sections: int) -> str:
+    parts = [f"# Report {idx}\n"]
+    for sec in range(sections):
+        parts.append(f"\n## Section {sec}\n\nParagraph {sec} of document {idx} with **bold** and `code`.\n")
+        parts.append("\n| Key | Value |\n| --- | --- |\n| a | 1 |\n| b | 2 |\n")
+    return "".join(parts)
+
+
+def bench_backend(name: str, runner, documents: int, sections: int, concurrency: int) -> dict[str, object]:
+    reference_doc = ROOT / "templates" / "tech_template_v1.docx"
+    with tempfile.TemporaryDirectory() as td:
+        work = Path(td)
+        inputs = []
+        for idx in range(documents):
+            path = work / f"doc{idx}.md"
+            path.write_text(_document(idx, sections), encoding="utf-8")
+            inputs.append(path)
+
+        def convert(path: Path) -> tuple[float, bool]:
+            args = [
+                str(path),
+                "--from",
+                "gfm+yaml_metadata_block",
+                "--to",
+                "docx",
+                "--output",
+                str(path.with_suffix(".docx")),
+                "--reference-doc",
+                str(reference_doc),
+                "--toc",
+                "--number-sections",
+            ]
+            started = time.perf_counter()
+            try:
+                ok = runner.run_pandoc(args).returncode == 0
+            except Exception:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        # Warm-up (server start, first connection) is excluded from throughput.
+        convert(inputs[0])
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(convert, inputs))
+        wall = time.perf_counter() - started
+
+    latencies = [r[0] for r in results]
+    return {
+        "backend": name,
+        "documents": documents,
+        "concurrency": concurrency,
+        "failures": sum(1 for r in results if not r[1]),
+        "wall_s": round(wall, 3),
+        "docs_per_s": round(documents / wall, 2) if wall else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="pandoc backend throughput benchmark")
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pandoc", default=None, help="pandoc executable (default: PATH)")
+    args = parser.parse_args(argv)
+
+    subprocess_runner = SubprocessToolRunner(pandoc_path=args.pandoc)
+    server_runner = PandocServerToolRunner(subprocess_runner)
+    if server_runner._pool() is None:
+        print("pandoc server unavailable; the server numbers measure the subprocess fallback", file=sys.stderr)
+    results = [
+        bench_backend("subprocess", subprocess_runner, args.documents, args.sections, args.concurrency),
+        bench_backend("server", server_runner, args.documents, args.sections, args.concurrency),
+    ]
+    shutdown_pandoc_servers()
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
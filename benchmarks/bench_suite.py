@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""Benchmark suite: synthetic corpora, BuildService throughput/latency/memory, regression gate.
+
+``--runner fake`` swaps pandoc and mmdc for a runner that writes stub files,
+so the numbers measure docforge's own Python overhead (scan, fingerprint,
+cache, bookkeeping). ``--runner real`` uses the tools from the config.
+Every run builds into a scratch base directory with a cold Mermaid cache per
+iteration (``--warm-cache`` keeps it), so the repository is never touched.
+
+Usage:
+  python benchmarks/bench_suite.py generate --out /tmp/corpus --documents 50 --mermaid-density 0.5
+  python benchmarks/bench_suite.py run --runner fake --documents 50 --output results.json
+  python benchmarks/bench_suite.py compare baseline.json results.json --threshold 0.10
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, fields
+from pathlib import Path
+from typing import Any
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from corpus import FRONT_MATTER_SHAPES, CorpusSpec, generate_corpus  # noqa: E402
+from docforge import __version__  # noqa: E402
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner  # noqa: E402
+from docforge.core.models import BuildOptions, EXIT_OK  # noqa: E402
+from docforge.core.service import BuildService  # noqa: E402
+from docforge.core.timing import sum_timings  # noqa: E402
+
+RESULTS_SCHEMA_VERSION = "1.0"
+DEFAULT_THRESHOLD = 0.10
+# Metric path -> True when larger is better.
+COMPARED_METRICS = {
+    "throughput_docs_per_s": True,
+    "throughput_mb_per_s": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "peak_rss_mb": False,
+}
+
+
+class FakeToolRunner(ToolRunner):
+    """Writes stub outputs instantly, leaving only docforge's own work to measure."""
+
+    def run_pandoc(self, args, input_text=None):
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        output_svg.write_bytes(b"<svg xmlns='http://www.w3.org/2000/svg'/>")
+        return CompletedProcessLike(0, "", "")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+    def mermaid_settings(self):
+        return {"renderer": "fake"}
+
+
+def _scratch_base(work: Path) -> Path:
+    """Base dir with a config whose paths point back into the repo."""
+    base = work / "base"
+    config = yaml.safe_load((ROOT / "config" / "templates.yaml").read_text(encoding="utf-8"))
+    for template in config.get("templates", {}).values():
+        template["reference_doc"] = str((ROOT / template["reference_doc"]).resolve())
+    tools = config.setdefault("tools", {})
+    for key in ("browser_executable", "puppeteer_cache_dir", "mmdc_config", "puppeteer_config"):
+        if tools.get(key) and not Path(tools[key]).is_absolute():
+            tools[key] = str((ROOT / tools[key]).resolve())
+    tools["version_cache"] = str((ROOT / ".cache" / "tool_versions.json").resolve())
+    config.setdefault("cache", {})["mermaid_dir"] = ".cache/mermaid"
+    config.setdefault("defaults", {})["build_store"] = False
+    (base / "config").mkdir(parents=True)
+    (base / "config" / "templates.yaml").write_text(yaml.safe_dump(config, sort_keys=False), encoding="utf-8")
+    return base
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _peak_rss_mb(who: int) -> float | None:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak * scale / 2**20, 1) if peak else None
+
+
+def run_suite(
+    spec: CorpusSpec,
+    runner_kind: str,
+    workers: int = 1,
+    repeat: int = 3,
+    warmup: int = 1,
+    warm_cache: bool = False,
+) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="docforge-bench-") as td:
+        work = Path(td)
+        base = _scratch_base(work)
+        inputs = generate_corpus(spec, work / "corpus")
+        corpus_bytes = sum(path.stat().st_size for path in inputs)
+        service = BuildService(base_dir=base, tool_runner=FakeToolRunner() if runner_kind == "fake" else None)
+        jobs = [
+            BuildOptions(
+                input_path=path,
+                output_path=work / "out" / path.with_suffix(".docx").name,
+                config_path=base / "config" / "templates.yaml",
+                force=True,
+            )
+            for path in inputs
+        ]
+
+        def build(job: BuildOptions) -> tuple[float, int, dict[str, Any]]:
+            started = time.perf_counter()
+            result = service.run(job)
+            return time.perf_counter() - started, result.exit_code, result.timings
+
+        latencies: list[float] = []
+        timings: list[dict[str, Any]] = []
+        failures = 0
+        wall = 0.0
+        for iteration in range(warmup + repeat):
+            if not warm_cache:
+                shutil.rmtree(base / ".cache" / "mermaid", ignore_errors=True)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                outcomes = list(pool.map(build, jobs))
+            elapsed = time.perf_counter() - started
+            if iteration < warmup:
+                continue
+            wall += elapsed
+            for seconds, exit_code, doc_timings in outcomes:
+                latencies.append(seconds)
+                timings.append(doc_timings)
+                failures += exit_code != EXIT_OK
+
+    ordered = sorted(latencies)
+    built = len(latencies)
+    return {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "created_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "environment": {
+            "docforge": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "runner": runner_kind,
+        "corpus": {**asdict(spec), "bytes": corpus_bytes},
+        "settings": {"workers": workers, "repeat": repeat, "warmup": warmup, "warm_cache": warm_cache},
+        "metrics": {
+            "documents": built,
+            "failures": failures,
+            "wall_s": round(wall, 4),
+            "throughput_docs_per_s": round(built / wall, 3) if wall else None,
+            "throughput_mb_per_s": round(corpus_bytes * repeat / 2**20 / wall, 3) if wall else None,
+            "latency_ms": {
+                "mean": round(statistics.fmean(ordered) * 1000, 3) if ordered else None,
+                "p50": round(_percentile(ordered, 0.50) * 1000, 3),
+                "p90": round(_percentile(ordered, 0.90) * 1000, 3),
+                "p95": round(_percentile(ordered, 0.95) * 1000, 3),
+                "p99": round(_percentile(ordered, 0.99) * 1000, 3),
+                "max": round(ordered[-1] * 1000, 3) if ordered else None,
+            },
+            "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+            "peak_child_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+        },
+        "phases": sum_timings(timings)["phases"],
+    }
+
+
+def compare_results(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    """One row per compared metric; ``regression`` is set when it got worse by more than ``threshold``."""
+    rows = []
+    for path, higher_is_better in COMPARED_METRICS.items():
+        before, after = _lookup(baseline["metrics"], path), _lookup(current["metrics"], path)
+        if not isinstance(before, (int, float)) or not isinstance(after, (int, float)) or not before:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        rows.append(
+            {
+                "metric": path,
+                "baseline": before,
+                "current": after,
+                "change": round(change, 4),
+                "regression": worse > threshold,
+            }
+        )
+    return rows
+
+
+def _lookup(data: dict[str, Any], path: str) -> Any:
+    for key in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _add_corpus_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = CorpusSpec()
+    parser.add_argument("--documents", type=int, default=defaults.documents)
+    parser.add_argument("--chapters", type=int, default=defaults.chapters, help="H1 headings per document")
+    parser.add_argument("--sections", type=int, default=defaults.sections, help="H2 sections per chapter")
+    parser.add_argument("--paragraphs", type=int, default=defaults.paragraphs, help="paragraphs per section")
+    parser.add_argument("--paragraph-words", type=int, default=defaults.paragraph_words)
+    parser.add_argument("--mermaid-density", type=float, default=defaults.mermaid_density, help="diagrams per section")
+    parser.add_argument("--mermaid-nodes", type=int, default=defaults.mermaid_nodes)
+    parser.add_argument("--table-density", type=float, default=defaults.table_density, help="tables per section")
+    parser.add_argument("--table-columns", type=int, default=defaults.table_columns)
+    parser.add_argument("--table-rows", type=int, default=defaults.table_rows)
+    parser.add_argument("--front-matter", choices=FRONT_MATTER_SHAPES, default=defaults.front_matter)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def _spec(args: argparse.Namespace) -> CorpusSpec:
+    return CorpusSpec(**{f.name: getattr(args, f.name) for f in fields(CorpusSpec)})
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="docforge benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    generate = sub.add_parser("generate", help="write a synthetic corpus")
+    generate.add_argument("--out", required=True)
+    _add_corpus_arguments(generate)
+
+    run = sub.add_parser("run", help="build a synthetic corpus and write metrics as JSON")
+    _add_corpus_arguments(run)
+    run.add_argument("--runner", choices=["fake", "real"], default="fake")
+    run.add_argument("--workers", type=int, default=1, help="documents built in parallel")
+    run.add_argument("--repeat", type=int, default=3, help="measured passes over the corpus")
+    run.add_argument("--warmup", type=int, default=1, help="unmeasured passes before measuring")
+    run.add_argument("--warm-cache", action="store_true", help="keep the Mermaid cache between passes")
+    run.add_argument("--output", default=None, help="results file (default: stdout)")
+    run.add_argument("--baseline", default=None, help="compare against this results file after the run")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare = sub.add_parser("compare", help="flag metrics that regressed beyond a threshold")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"allowed relative slowdown, e.g. 0.10 = 10%% (default: {DEFAULT_THRESHOLD})",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        paths = generate_corpus(_spec(args), Path(args.out))
+        print(f"wrote {len(paths)} documents to {args.out}")
+        return 0
+
+    if args.command == "run":
+        results = run_suite(
+            _spec(args),
+            args.runner,
+            workers=args.workers,
+            repeat=max(1, args.repeat),
+            warmup=max(0, args.warmup),
+            warm_cache=args.warm_cache,
+        )
+        text = json.dumps(results, indent=2)
+        if args.output:
+            Path(args.output).write_text(text + "\n", encoding="utf-8")
+        else:
+            print(text)
+        if results["metrics"]["failures"]:
+            print(f"{results['metrics']['failures']} builds failed", file=sys.stderr)
+            return 1
+        if not args.baseline:
+            return 0
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        return _report(baseline, results, args.threshold)
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    return _report(baseline, current, args.threshold)
+
+
+def _report(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> int:
+    for key in ("runner", "corpus", "settings"):
+        if baseline.get(key) != current.get(key):
+            print(f"[WARN] {key} differs from the baseline; numbers may not be comparable", file=sys.stderr)
+    rows = compare_results(baseline, current, threshold)
+    width = max([len(row["metric"]) for row in rows] + [6])
+    print(f"{'metric'.ljust(width)}  {'baseline':>12}  {'current':>12}  {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['metric'].ljust(width)}  {row['baseline']:>12}  {row['current']:>12}  "
+            f"{row['change'] * 100:>+7.1f}%{flag}"
+        )
+    regressions = [row["metric"] for row in rows if row["regression"]]
+    if regressions:
+        print(f"regressions beyond {threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+"""Synthetic Markdown corpora for the benchmark suite.
+
+Documents are generated from a seed, so a spec always produces the same
+bytes: results stay comparable across runs and machines. Every diagram is
+unique (labels carry document and section numbers), so a cold Mermaid cache
+renders all of them.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+FRONT_MATTER_SHAPES = ("none", "minimal", "full")
+WORDS = (
+    "system data service request latency cache template document build render "
+    "queue worker config release audit policy network storage report module"
+).split()
+
+
+@dataclass
+class CorpusSpec:
+    documents: int = 20
+    chapters: int = 2  # H1 headings per document
+    sections: int = 10  # H2 sections per chapter
+    paragraphs: int = 3  # per section
+    paragraph_words: int = 60
+    mermaid_density: float = 0.2  # diagrams per section; fractions are drawn at random
+    mermaid_nodes: int = 6
+    table_density: float = 0.5  # tables per section
+    table_columns: int = 4
+    table_rows: int = 6
+    front_matter: str = "minimal"
+    seed: int = 1
+
+    def __post_init__(self) -> None:
+        if self.front_matter not in FRONT_MATTER_SHAPES:
+            raise ValueError(f"front_matter must be one of {', '.join(FRONT_MATTER_SHAPES)}")
+
+
+def generate_corpus(spec: CorpusSpec, out_dir: Path) -> list[Path]:
+    """Write ``spec.documents`` Markdown files plus ``corpus.json`` into ``out_dir``."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index in range(spec.documents):
+        path = out_dir / f"doc{index:04d}.md"
+        path.write_text(generate_document(spec, index), encoding="utf-8")
+        paths.append(path)
+    (out_dir / "corpus.json").write_text(json.dumps(asdict(spec), indent=2) + "\n", encoding="utf-8")
+    return paths
+
+
+def generate_document(spec: CorpusSpec, index: int) -> str:
+    rng = random.Random(f"{spec.seed}:{index}")
+    out = [_front_matter(spec, index)]
+    for chapter in range(1, spec.chapters + 1):
+        out.append(f"# Chapter {chapter}: {_words(rng, 3).title()}\n\n{_paragraph(rng, spec.paragraph_words)}\n\n")
+        for section in range(1, spec.sections + 1):
+            out.append(f"## {chapter}.{section} {_words(rng, 4).title()}\n\n")
+            for _ in range(spec.paragraphs):
+                out.append(_paragraph(rng, spec.paragraph_words) + "\n\n")
+            for number in range(_count(rng, spec.table_density)):
+                out.append(_table(rng, spec.table_columns, spec.table_rows) + "\n")
+            for number in range(_count(rng, spec.mermaid_density)):
+                out.append(_diagram(rng, spec.mermaid_nodes, f"d{index}c{chapter}s{section}n{number}") + "\n")
+    return "".join(out)
+
+
+def _count(rng: random.Random, density: float) -> int:
+    whole = int(density)
+    return whole + (1 if rng.random() < density - whole else 0)
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    text = _words(rng, words).capitalize()
+    return text.replace(" cache ", " **cache** ", 1).replace(" config ", " `config` ", 1) + "."
+
+
+def _table(rng: random.Random, columns: int, rows: int) -> str:
+    header = "| " + " | ".join(f"Col {c + 1}" for c in range(columns)) + " |"
+    rule = "|" + "|".join(" --- " for _ in range(columns)) + "|"
+    body = ["| " + " | ".join(_words(rng, 2) for _ in range(columns)) + " |" for _ in range(rows)]
+    return "\n".join([header, rule, *body]) + "\n"
+
+
+def _diagram(rng: random.Random, nodes: int, label: str) -> str:
+    lines = ["```mermaid", "graph TD"]
+    for node in range(1, max(2, nodes)):
+        parent = rng.randrange(node)
+        lines.append(f"  {label}_{parent}[{rng.choice(WORDS)} {parent}] --> {label}_{node}[{rng.choice(WORDS)} {node}]")
+    lines.append("```")
+    return "\n".join(lines) + "\n"
+
+
+def _front_matter(spec: CorpusSpec, index: int) -> str:
+    if spec.front_matter == "none":
+        return ""
+    if spec.front_matter == "minimal":
+        return f"---\ntitle: Benchmark document {index}\n---\n\n"
+    return (
+        "---\n"
+        f"title: Benchmark document {index}\n"
+        "author: Benchmark Suite\n"
+        "date: 2024-01-01\n"
+        f"version: 1.{index}\n"
+        "template: tech\n"
+        "toc: true\n"
+        "number_sections: true\n"
+        "tags: [benchmark, synthetic, docforge]\n"
+        "review:\n"
+        "  owner: perf\n"
+        "  approvers:\n"
+        "    - alice\n"
+        "    - bob\n"
+        "---\n\n"
+    )
@@ -12,8 +12,8 @@ a = Analysis(
     binaries=[],
     datas=[
         (str(ROOT / 'config'), 'config'),
-        (str(ROOT / 'filters'), 'filters'),
         (str(ROOT / 'templates'), 'templates'),
+        (str(ROOT / 'src' / 'docforge' / 'adapters' / 'mermaid_batch.js'), 'docforge/adapters'),
     ],
     hiddenimports=hiddenimports,
     hookspath=[],
@@ -1,3 +1,13 @@
+from docforge.adapters.async_runner import AsyncToolRunner
+from docforge.adapters.mermaid_batch import MermaidBatchToolRunner
+from docforge.adapters.pandoc_server import PandocServerToolRunner
 from docforge.adapters.tool_runner import BundledToolRunner, SubprocessToolRunner, ToolRunner
 
-__all__ = ["ToolRunner", "SubprocessToolRunner", "BundledToolRunner"]
+__all__ = [
+    "ToolRunner",
+    "SubprocessToolRunner",
+    "BundledToolRunner",
+    "MermaidBatchToolRunner",
+    "PandocServerToolRunner",
+    "AsyncToolRunner",
+]
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import subprocess
+from pathlib import Path
+
+from docforge.adapters.tool_runner import (
+    CompletedProcessLike,
+    SubprocessToolRunner,
+    ToolRunnerError,
+    ToolTimeoutError,
+    kill_process_tree,
+    new_process_group,
+    scratch_input_file,
+)
+
+
+class AsyncToolRunner(SubprocessToolRunner):
+    """``SubprocessToolRunner`` with awaitable pandoc/mmdc calls on ``asyncio`` subprocesses.
+
+    Each tool runs in its own process group. When the awaiting task is
+    cancelled the whole group is killed (mmdc's browser included) before the
+    cancellation propagates. Version probes and Mermaid settings are shared
+    with the blocking runner, so both produce the same cache keys and
+    ``build_meta.json``.
+    """
+
+    async def arun_pandoc(self, args: list[str], input_text: str | None = None) -> CompletedProcessLike:
+        if not self._pandoc_path:
+            raise ToolRunnerError("pandoc is not installed or not in PATH")
+        if input_text is None or self._pandoc_input_mode == "stdin":
+            return await self._arun([self._pandoc_path, *args], input_text=input_text, timeout=self._pandoc_timeout)
+        with scratch_input_file(input_text) as input_path:
+            return await self._arun([self._pandoc_path, *args, str(input_path)], timeout=self._pandoc_timeout)
+
+    async def arun_mermaid(self, input_mmd: Path, output_svg: Path) -> CompletedProcessLike:
+        return await self._arun(
+            self._mermaid_command(input_mmd, output_svg), env=self._mermaid_env(), timeout=self._mermaid_timeout
+        )
+
+    @staticmethod
+    async def _arun(
+        command: list[str],
+        env: dict[str, str] | None = None,
+        input_text: str | None = None,
+        timeout: float | None = None,
+    ) -> CompletedProcessLike:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=subprocess.PIPE if input_text is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                **new_process_group(),
+            )
+        except OSError as exc:
+            raise ToolRunnerError(str(exc)) from exc
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                proc.communicate(input_text.encode("utf-8") if input_text is not None else None), timeout
+            )
+        except asyncio.TimeoutError:
+            kill_process_tree(proc)
+            with contextlib.suppress(Exception):
+                await proc.wait()
+            raise ToolTimeoutError(f"{Path(command[0]).name} timed out after {timeout:g}s and was killed") from None
+        except BaseException:
+            kill_process_tree(proc)
+            with contextlib.suppress(Exception):
+                await proc.wait()
+            raise
+        return CompletedProcessLike(
+            proc.returncode if proc.returncode is not None else -1,
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace"),
+        )
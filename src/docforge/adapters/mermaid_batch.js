@@ -0,0 +1,119 @@
+#!/usr/bin/env node
+// Long-lived Mermaid renderer used by MermaidBatchToolRunner.
+//
+// Launches one headless browser and renders diagrams sent as JSON lines on
+// stdin. Each request is {"id", "input", "output"}; each reply is
+// {"id", "ok", "error"}. A single {"ready": true} (or {"fatal": "..."}) line
+// is written once the browser is up. Module resolution relies on NODE_PATH
+// pointing at the node_modules tree that ships with @mermaid-js/mermaid-cli.
+"use strict";
+
+const fs = require("fs");
+const path = require("path");
+const readline = require("readline");
+
+function readJson(file) {
+  if (!file) {
+    return {};
+  }
+  try {
+    return JSON.parse(fs.readFileSync(file, "utf8"));
+  } catch (err) {
+    return {};
+  }
+}
+
+function argValue(name) {
+  const idx = process.argv.indexOf(name);
+  return idx >= 0 ? process.argv[idx + 1] : undefined;
+}
+
+function reply(payload) {
+  process.stdout.write(JSON.stringify(payload) + "\n");
+}
+
+async function main() {
+  const mermaidConfig = readJson(argValue("--mermaid-config"));
+  const launchOptions = readJson(argValue("--puppeteer-config"));
+  if (process.env.PUPPETEER_EXECUTABLE_PATH && !launchOptions.executablePath) {
+    launchOptions.executablePath = process.env.PUPPETEER_EXECUTABLE_PATH;
+  }
+
+  let puppeteer;
+  let mermaidScript;
+  try {
+    puppeteer = require("puppeteer");
+    mermaidScript = require.resolve("mermaid/dist/mermaid.min.js");
+  } catch (err) {
+    reply({ fatal: `cannot load puppeteer/mermaid: ${err.message}` });
+    process.exit(3);
+  }
+
+  let browser;
+  try {
+    browser = await puppeteer.launch(launchOptions);
+  } catch (err) {
+    reply({ fatal: `browser launch failed: ${err.message}` });
+    process.exit(3);
+  }
+
+  async function render(request) {
+    const page = await browser.newPage();
+    try {
+      await page.setContent('<!doctype html><html><body><div id="container"></div></body></html>');
+      await page.addScriptTag({ path: mermaidScript });
+      const source = fs.readFileSync(request.input, "utf8");
+      const svg = await page.evaluate(
+        async (src, cfg) => {
+          // eslint-disable-next-line no-undef
+          mermaid.initialize(Object.assign({ startOnLoad: false }, cfg));
+          // eslint-disable-next-line no-undef
+          const result = await mermaid.render("docforge-diagram", src);
+          const container = document.getElementById("container");
+          container.innerHTML = result.svg;
+          return result.svg;
+        },
+        source,
+        mermaidConfig
+      );
+      fs.mkdirSync(path.dirname(request.output), { recursive: true });
+      if (request.output.toLowerCase().endsWith(".svg")) {
+        fs.writeFileSync(request.output, svg, "utf8");
+      } else {
+        const element = await page.$("#container svg");
+        await element.screenshot({ path: request.output, omitBackground: true });
+      }
+      reply({ id: request.id, ok: true });
+    } catch (err) {
+      reply({ id: request.id, ok: false, error: String((err && err.message) || err) });
+    } finally {
+      await page.close().catch(() => {});
+    }
+  }
+
+  const pending = new Set();
+  const rl = readline.createInterface({ input: process.stdin });
+  rl.on("line", (line) => {
+    if (!line.trim()) {
+      return;
+    }
+    let request;
+    try {
+      request = JSON.parse(line);
+    } catch (err) {
+      reply({ id: null, ok: false, error: `invalid request: ${err.message}` });
+      return;
+    }
+    const task = render(request).finally(() => pending.delete(task));
+    pending.add(task);
+  });
+  rl.on("close", async () => {
+    await Promise.allSettled([...pending]);
+    await browser.close().catch(() => {});
+    process.exit(0);
+  });
+
+  reply({ ready: true });
+}
+
+main();
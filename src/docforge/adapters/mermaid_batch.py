@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import atexit
+import itertools
+import json
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import threading
+from collections import deque
+
+from docforge.adapters.tool_runner import (
+    CompletedProcessLike,
+    SubprocessToolRunner,
+    ToolTimeoutError,
+    kill_process_tree,
+    new_process_group,
+)
+
+HELPER_SCRIPT = Path(__file__).resolve().with_name("mermaid_batch.js")
+STARTUP_TIMEOUT_SECONDS = 120.0
+RENDER_TIMEOUT_SECONDS = 120.0
+# Helpers that crashed or timed out are relaunched this many times per process, then mmdc takes over.
+MAX_RESTARTS = 3
+
+
+class _BatchRendererProcess:
+    """One Node helper process holding a warm headless browser."""
+
+    def __init__(self, command: list[str], env: dict[str, str]) -> None:
+        self._command = command
+        self._env = env
+        self._proc: subprocess.Popen[str] | None = None
+        self._write_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._pending: dict[int, tuple[threading.Event, list[dict]]] = {}
+        self._ids = itertools.count(1)
+        self._stderr_tail: deque[str] = deque(maxlen=20)
+        self.fatal: str | None = None
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None and self.fatal is None
+
+    def start(self) -> bool:
+        try:
+            self._proc = subprocess.Popen(
+                self._command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+                env=self._env,
+                **new_process_group(),
+            )
+        except OSError as exc:
+            self.fatal = str(exc)
+            return False
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+        if not self._ready.wait(STARTUP_TIMEOUT_SECONDS):
+            self.fatal = "timed out waiting for Mermaid batch renderer to start"
+            self.close()
+            return False
+        return self.fatal is None
+
+    def render(self, input_mmd: Path, output_path: Path, timeout: float | None = None) -> CompletedProcessLike | None:
+        """Render one diagram; returns None when the helper is no longer usable.
+
+        A render that outlives ``timeout`` means the browser is wedged: the
+        helper and its browser are killed (later renders fall back to mmdc)
+        and ``ToolTimeoutError`` is raised.
+        """
+        if not self.alive or self._proc is None or self._proc.stdin is None:
+            return None
+        request_id = next(self._ids)
+        done = threading.Event()
+        slot: list[dict] = []
+        with self._state_lock:
+            self._pending[request_id] = (done, slot)
+        payload = {"id": request_id, "input": str(input_mmd), "output": str(output_path)}
+        try:
+            with self._write_lock:
+                self._proc.stdin.write(json.dumps(payload) + "\n")
+                self._proc.stdin.flush()
+        except (OSError, ValueError):
+            with self._state_lock:
+                self._pending.pop(request_id, None)
+            return None
+        limit = timeout if timeout is not None else RENDER_TIMEOUT_SECONDS
+        if not done.wait(limit):
+            with self._state_lock:
+                self._pending.pop(request_id, None)
+            self.fatal = f"Mermaid batch renderer timed out after {limit:g}s"
+            kill_process_tree(self._proc)
+            raise ToolTimeoutError(f"{self.fatal} and was killed")
+        if not slot:
+            return None
+        reply = slot[0]
+        if reply.get("ok"):
+            return CompletedProcessLike(0, "", "")
+        return CompletedProcessLike(1, "", str(reply.get("error") or "Unknown Mermaid rendering error"))
+
+    def close(self) -> None:
+        proc = self._proc
+        if proc is None:
+            return
+        try:
+            if proc.stdin:
+                proc.stdin.close()
+            proc.wait(timeout=10)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            kill_process_tree(proc)
+
+    def _read_stdout(self) -> None:
+        assert self._proc is not None and self._proc.stdout is not None
+        for line in self._proc.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get("ready"):
+                self._ready.set()
+            elif "fatal" in message:
+                self.fatal = str(message["fatal"])
+                self._ready.set()
+            else:
+                with self._state_lock:
+                    entry = self._pending.pop(message.get("id"), None)
+                if entry is not None:
+                    entry[1].append(message)
+                    entry[0].set()
+        # EOF: helper exited. Wake everybody so callers can fall back.
+        if self.fatal is None:
+            tail = "".join(self._stderr_tail).strip()
+            self.fatal = tail or "Mermaid batch renderer exited"
+        self._ready.set()
+        with self._state_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for done, _slot in pending:
+            done.set()
+
+    def _read_stderr(self) -> None:
+        assert self._proc is not None and self._proc.stderr is not None
+        for line in self._proc.stderr:
+            self._stderr_tail.append(line)
+
+
+_RENDERERS: dict[tuple[str, ...], _BatchRendererProcess] = {}
+_RESTARTS: dict[tuple[str, ...], int] = {}
+_RENDERERS_LOCK = threading.Lock()
+
+
+def shutdown_batch_renderers() -> None:
+    with _RENDERERS_LOCK:
+        renderers = list(_RENDERERS.values())
+        _RENDERERS.clear()
+        _RESTARTS.clear()
+    for renderer in renderers:
+        renderer.close()
+
+
+atexit.register(shutdown_batch_renderers)
+
+
+class MermaidBatchToolRunner(SubprocessToolRunner):
+    """Renders Mermaid through one warm browser shared by every build in the process.
+
+    Falls back to a per-diagram ``mmdc`` call when Node, Puppeteer or the
+    browser cannot be started. A helper that crashed or timed out is
+    relaunched on the next diagram, up to ``MAX_RESTARTS`` times.
+    """
+
+    def __init__(
+        self,
+        pandoc_path: str | None = None,
+        mmdc_path: str | None = None,
+        mmdc_config_path: str | None = None,
+        puppeteer_config_path: str | None = None,
+        browser_executable_path: str | None = None,
+        puppeteer_cache_dir: str | None = None,
+        pandoc_input_mode: str = "stdin",
+        version_cache_path: str | None = None,
+        pandoc_timeout: float | None = None,
+        mermaid_timeout: float | None = None,
+        node_path: str | None = None,
+    ) -> None:
+        super().__init__(
+            pandoc_path=pandoc_path,
+            mmdc_path=mmdc_path,
+            mmdc_config_path=mmdc_config_path,
+            puppeteer_config_path=puppeteer_config_path,
+            browser_executable_path=browser_executable_path,
+            puppeteer_cache_dir=puppeteer_cache_dir,
+            pandoc_input_mode=pandoc_input_mode,
+            version_cache_path=version_cache_path,
+            pandoc_timeout=pandoc_timeout,
+            mermaid_timeout=mermaid_timeout,
+        )
+        self._node_path = self._resolve_executable(node_path, "node")
+
+    def run_mermaid(self, input_mmd: Path, output_svg: Path) -> CompletedProcessLike:
+        renderer = self._renderer()
+        if renderer is not None:
+            output_svg.parent.mkdir(parents=True, exist_ok=True)
+            result = renderer.render(input_mmd, output_svg, timeout=self._mermaid_timeout)
+            if result is not None:
+                return result
+        return super().run_mermaid(input_mmd, output_svg)
+
+    def mermaid_settings(self) -> dict[str, str]:
+        settings = super().mermaid_settings()
+        settings["renderer"] = "batch"
+        return settings
+
+    def _renderer(self) -> _BatchRendererProcess | None:
+        if not self._node_path or not HELPER_SCRIPT.exists():
+            return None
+        command = [self._node_path, str(HELPER_SCRIPT)]
+        if self._mmdc_config_path and Path(self._mmdc_config_path).exists():
+            command.extend(["--mermaid-config", self._mmdc_config_path])
+        if self._puppeteer_config_path and Path(self._puppeteer_config_path).exists():
+            command.extend(["--puppeteer-config", self._puppeteer_config_path])
+        env = self._mermaid_env()
+        node_paths = self._node_module_paths(self._mmdc_path)
+        key = (*command, *node_paths, env.get("PUPPETEER_EXECUTABLE_PATH", ""))
+
+        with _RENDERERS_LOCK:
+            renderer = _RENDERERS.get(key)
+            if renderer is not None:
+                if renderer.alive:
+                    return renderer
+                # A dead helper stays registered once out of restarts, so it is not relaunched on every diagram.
+                if _RESTARTS.get(key, 0) >= MAX_RESTARTS:
+                    return None
+                _RESTARTS[key] = _RESTARTS.get(key, 0) + 1
+                renderer.close()
+            if node_paths:
+                existing = env.get("NODE_PATH")
+                env["NODE_PATH"] = os.pathsep.join([*node_paths, *([existing] if existing else [])])
+            renderer = _BatchRendererProcess(command, env)
+            _RENDERERS[key] = renderer
+            if not renderer.start():
+                return None
+            return renderer
+
+    @staticmethod
+    def _node_module_paths(mmdc_path: str | None) -> list[str]:
+        """Locate the node_modules trees that hold mermaid-cli's puppeteer and mermaid."""
+        if not mmdc_path:
+            return []
+        resolved = shutil.which(mmdc_path) or mmdc_path
+        real = Path(os.path.realpath(resolved))
+        found: list[str] = []
+        for parent in real.parents:
+            candidates = [parent / "node_modules"]
+            if parent.name == "node_modules":
+                candidates.append(parent)
+            for candidate in candidates:
+                if not candidate.is_dir():
+                    continue
+                nested = candidate / "@mermaid-js" / "mermaid-cli" / "node_modules"
+                for path in (nested, candidate):
+                    if path.is_dir() and str(path) not in found:
+                        found.append(str(path))
+        return found
@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import atexit
+import base64
+import http.client
+import json
+import os
+import queue
+import re
+import socket
+import subprocess
+import threading
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Any
+
+from docforge.adapters.tool_runner import CompletedProcessLike, SubprocessToolRunner, ToolRunner, ToolTimeoutError
+
+STARTUP_TIMEOUT_SECONDS = 15.0
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 120.0
+MAX_RESTARTS = 3
+IMAGE_REF_RE = re.compile(r"!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+\"[^\"]*\")?\s*\)")
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP connections to one server, shared between threads."""
+
+    def __init__(self, host: str, port: int, timeout: float, maxsize: int = 8) -> None:
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(maxsize=maxsize)
+
+    def request(self, method: str, path: str, body: bytes | None = None) -> tuple[int, bytes]:
+        """Send one request; connect failures raise ``ConnectionError``, a slow answer ``TimeoutError``."""
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = self._connect()
+            reused = False
+        try:
+            return self._send(conn, method, path, body)
+        except TimeoutError:
+            # The server is busy with this request, not gone: retrying would only wait again.
+            raise
+        except (OSError, http.client.HTTPException):
+            if not reused:
+                raise
+        # The server may have dropped an idle keep-alive connection; retry once fresh.
+        return self._send(self._connect(), method, path, body)
+
+    def _connect(self) -> http.client.HTTPConnection:
+        conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+        try:
+            conn.connect()
+        except OSError as exc:
+            conn.close()
+            raise ConnectionError(f"cannot connect to {self._host}:{self._port}: {exc}") from exc
+        return conn
+
+    def _send(
+        self, conn: http.client.HTTPConnection, method: str, path: str, body: bytes | None
+    ) -> tuple[int, bytes]:
+        headers = {"Accept": "application/json", "Content-Type": "application/json"}
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+        return response.status, payload
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class PandocServer:
+    """A supervised ``pandoc server`` process on a local port."""
+
+    def __init__(self, pandoc_path: str, request_timeout: float = DEFAULT_REQUEST_TIMEOUT_SECONDS) -> None:
+        self._pandoc_path = pandoc_path
+        self._request_timeout = request_timeout
+        self._proc: subprocess.Popen[bytes] | None = None
+        self._lock = threading.Lock()
+        self._restarts = 0
+        self.pool: _ConnectionPool | None = None
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def ensure_running(self) -> _ConnectionPool | None:
+        with self._lock:
+            if self.alive and self.pool is not None:
+                return self.pool
+            if self._proc is not None:
+                # Crashed since last use: restart a bounded number of times.
+                if self._restarts >= MAX_RESTARTS:
+                    return None
+                self._restarts += 1
+                self.close()
+            return self._start()
+
+    def _start(self) -> _ConnectionPool | None:
+        port = _free_port()
+        command = [
+            self._pandoc_path,
+            "server",
+            "--port",
+            str(port),
+            "--timeout",
+            str(int(self._request_timeout)),
+        ]
+        try:
+            self._proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError:
+            self._proc = None
+            return None
+
+        pool = _ConnectionPool("127.0.0.1", port, timeout=self._request_timeout)
+        deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if not self.alive:
+                return None
+            try:
+                status, _ = pool.request("GET", "/version")
+            except (OSError, http.client.HTTPException):
+                time.sleep(0.05)
+                continue
+            if status == 200:
+                self.pool = pool
+                return pool
+            break
+        self.close()
+        return None
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+_SERVERS: dict[str, PandocServer] = {}
+_SERVERS_LOCK = threading.Lock()
+
+
+def shutdown_pandoc_servers() -> None:
+    with _SERVERS_LOCK:
+        servers = list(_SERVERS.values())
+        _SERVERS.clear()
+    for server in servers:
+        server.close()
+
+
+atexit.register(shutdown_pandoc_servers)
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+class PandocServerToolRunner(ToolRunner):
+    """Converts through a long-running ``pandoc server`` (JSON HTTP API).
+
+    Wraps another runner: Mermaid and version probing are delegated to it, and
+    so is any pandoc call the server cannot handle (server unavailable, or
+    options such as ``--lua-filter`` that the sandboxed server rejects; docforge's
+    own builds pass none).
+    """
+
+    def __init__(
+        self,
+        fallback: SubprocessToolRunner,
+        server_url: str | None = None,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT_SECONDS,
+    ) -> None:
+        self.fallback = fallback
+        self._request_timeout = request_timeout
+        self._external_pool: _ConnectionPool | None = None
+        if server_url:
+            parsed = urllib.parse.urlsplit(server_url)
+            self._external_pool = _ConnectionPool(
+                parsed.hostname or "127.0.0.1", parsed.port or 3030, timeout=request_timeout
+            )
+
+    def run_pandoc(self, args: list[str], input_text: str | None = None) -> CompletedProcessLike:
+        translated = self._translate_args(args, input_text)
+        if translated is None:
+            return self.fallback.run_pandoc(args, input_text)
+        payload, output_path = translated
+
+        pool = self._pool()
+        if pool is None:
+            return self.fallback.run_pandoc(args, input_text)
+        try:
+            status, body = pool.request("POST", "/", json.dumps(payload).encode("utf-8"))
+        except TimeoutError as exc:
+            # A conversion that hung on the server would hang in a subprocess too; fail instead of waiting twice.
+            raise ToolTimeoutError(f"pandoc server did not answer within {self._request_timeout:g}s") from exc
+        except (OSError, http.client.HTTPException):
+            # Server unreachable or connection dropped: the subprocess path still works.
+            return self.fallback.run_pandoc(args, input_text)
+        return self._handle_response(status, body, output_path)
+
+    def run_mermaid(self, input_mmd: Path, output_svg: Path) -> CompletedProcessLike:
+        return self.fallback.run_mermaid(input_mmd, output_svg)
+
+    def get_versions(self) -> dict[str, str]:
+        return self.fallback.get_versions()
+
+    def mermaid_settings(self) -> dict[str, str]:
+        return self.fallback.mermaid_settings()
+
+    def _pool(self) -> _ConnectionPool | None:
+        if self._external_pool is not None:
+            return self._external_pool
+        pandoc_path = self.fallback._pandoc_path
+        if not pandoc_path:
+            return None
+        with _SERVERS_LOCK:
+            server = _SERVERS.get(pandoc_path)
+            if server is None:
+                server = PandocServer(pandoc_path, request_timeout=self._request_timeout)
+                _SERVERS[pandoc_path] = server
+        return server.ensure_running()
+
+    @staticmethod
+    def _handle_response(status: int, body: bytes, output_path: Path) -> CompletedProcessLike:
+        text = body.decode("utf-8", errors="replace")
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        if status != 200 or not isinstance(data, dict) or "output" not in data:
+            message = data.get("error") if isinstance(data, dict) else None
+            return CompletedProcessLike(1, "", str(message or text or f"pandoc server returned HTTP {status}"))
+
+        output = data["output"]
+        content = base64.b64decode(output) if data.get("base64") else str(output).encode("utf-8")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_bytes(content)
+        messages = data.get("messages") or []
+        stderr = "\n".join(str(m.get("message", m)) if isinstance(m, dict) else str(m) for m in messages)
+        return CompletedProcessLike(0, "", stderr)
+
+    @staticmethod
+    def _translate_args(args: list[str], input_text: str | None = None) -> tuple[dict[str, Any], Path] | None:
+        """Map pandoc CLI arguments onto a server request; None when unsupported."""
+        payload: dict[str, Any] = {"standalone": True}
+        files: dict[str, str] = {}
+        metadata: dict[str, str] = {}
+        output_path: Path | None = None
+        resource_paths: list[Path] = []
+        input_paths: list[Path] = []
+
+        idx = 0
+        while idx < len(args):
+            arg = args[idx]
+            value = args[idx + 1] if idx + 1 < len(args) else None
+            if arg in {"--from", "--to", "--output", "--reference-doc", "--resource-path", "-M"}:
+                if value is None:
+                    return None
+                idx += 2
+            else:
+                idx += 1
+            if not arg.startswith("-"):
+                input_paths.append(Path(arg))
+            elif arg == "--from":
+                payload["from"] = value
+            elif arg == "--to":
+                payload["to"] = value
+            elif arg == "--output":
+                output_path = Path(str(value))
+            elif arg == "--reference-doc":
+                ref = Path(str(value))
+                payload["reference-doc"] = ref.name
+                files[ref.name] = base64.b64encode(ref.read_bytes()).decode("ascii")
+            elif arg == "--resource-path":
+                resource_paths = [Path(p) for p in str(value).split(os.pathsep) if p]
+            elif arg == "-M":
+                key, _, val = str(value).partition("=")
+                metadata[key] = val
+            elif arg == "--toc":
+                payload["table-of-contents"] = True
+            elif arg == "--number-sections":
+                payload["number-sections"] = True
+            else:
+                # --lua-filter and anything else the sandboxed server cannot do.
+                return None
+
+        if output_path is None:
+            return None
+        if input_text is not None and not input_paths:
+            text = input_text
+        elif input_text is None and len(input_paths) == 1 and input_paths[0].exists():
+            text = input_paths[0].read_text(encoding="utf-8")
+        else:
+            return None
+        payload["text"] = text
+        if metadata:
+            payload["metadata"] = metadata
+        files.update(_embedded_files(text, resource_paths))
+        if files:
+            payload["files"] = files
+        return payload, output_path
+
+
+def _file_uri_path(uri: str) -> Path:
+    """Local path of a ``file:`` URI: ``C:\\...`` for ``file:///C:/...`` on Windows, UNC for ``file://host/...``."""
+    parts = urllib.parse.urlsplit(uri)
+    path = parts.path if parts.netloc in ("", "localhost") else f"//{parts.netloc}{parts.path}"
+    return Path(urllib.request.url2pathname(path))
+
+
+def _embedded_files(text: str, resource_paths: list[Path]) -> dict[str, str]:
+    """Base64 images referenced by the document; the server cannot read the disk."""
+    files: dict[str, str] = {}
+    for target in IMAGE_REF_RE.findall(text):
+        if target in files:
+            continue
+        if re.match(r"^[a-z][a-z0-9+.-]*:", target) and not target.startswith("file:"):
+            continue
+        if target.startswith("file:"):
+            candidates = [_file_uri_path(target)]
+        else:
+            candidates = [Path(target)] if Path(target).is_absolute() else [base / target for base in resource_paths]
+        for candidate in candidates:
+            if candidate.is_file():
+                files[target] = base64.b64encode(candidate.read_bytes()).decode("ascii")
+                break
+    return files
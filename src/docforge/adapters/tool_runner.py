@@ -1,16 +1,30 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
 from dataclasses import dataclass
+import hashlib
+import json
 import os
 from pathlib import Path
 import shutil
+import signal
 import subprocess
+import tempfile
+import threading
+from typing import Any, Iterator
+
+PANDOC_INPUT_MODES = {"stdin", "file"}
+VERSION_PROBE_TIMEOUT_SECONDS = 60.0
 
 
 class ToolRunnerError(RuntimeError):
     pass
 
 
+class ToolTimeoutError(ToolRunnerError):
+    """A tool ran past its timeout; its whole process group has been killed."""
+
+
 @dataclass
 class CompletedProcessLike:
     returncode: int
@@ -19,7 +33,8 @@ class CompletedProcessLike:
 
 
 class ToolRunner:
-    def run_pandoc(self, args: list[str]) -> CompletedProcessLike:
+    def run_pandoc(self, args: list[str], input_text: str | None = None) -> CompletedProcessLike:
+        """Run pandoc. With ``input_text`` the document is passed as content, not as a path in ``args``."""
         raise NotImplementedError
 
     def run_mermaid(self, input_mmd: Path, output_svg: Path) -> CompletedProcessLike:
@@ -28,6 +43,10 @@ class ToolRunner:
     def get_versions(self) -> dict[str, str]:
         raise NotImplementedError
 
+    def mermaid_settings(self) -> dict[str, str]:
+        """Everything besides the diagram source that changes rendered Mermaid output."""
+        return {}
+
 
 class SubprocessToolRunner(ToolRunner):
     def __init__(
@@ -38,6 +57,10 @@ class SubprocessToolRunner(ToolRunner):
         puppeteer_config_path: str | None = None,
         browser_executable_path: str | None = None,
         puppeteer_cache_dir: str | None = None,
+        pandoc_input_mode: str = "stdin",
+        version_cache_path: str | None = None,
+        pandoc_timeout: float | None = None,
+        mermaid_timeout: float | None = None,
     ) -> None:
         self._pandoc_path = self._resolve_executable(pandoc_path, "pandoc")
         self._mmdc_path = self._resolve_executable(mmdc_path, "mmdc")
@@ -45,6 +68,14 @@ class SubprocessToolRunner(ToolRunner):
         self._puppeteer_config_path = puppeteer_config_path
         self._browser_executable_path = browser_executable_path
         self._puppeteer_cache_dir = puppeteer_cache_dir
+        self._pandoc_input_mode = pandoc_input_mode if pandoc_input_mode in PANDOC_INPUT_MODES else "stdin"
+        # Seconds before a hung tool is killed; None waits forever.
+        self._pandoc_timeout = pandoc_timeout
+        self._mermaid_timeout = mermaid_timeout
+        self._mermaid_settings: dict[str, str] | None = None
+        self._version_cache = ToolVersionCache(Path(version_cache_path)) if version_cache_path else None
+        self._versions: dict[str, str] = {}
+        self._versions_lock = threading.Lock()
 
     @staticmethod
     def _resolve_executable(override: str | None, default_name: str) -> str | None:
@@ -68,20 +99,42 @@ class SubprocessToolRunner(ToolRunner):
         return None
 
     @staticmethod
-    def _run(command: list[str], env: dict[str, str] | None = None) -> CompletedProcessLike:
+    def _run(
+        command: list[str],
+        env: dict[str, str] | None = None,
+        input_text: str | None = None,
+        timeout: float | None = None,
+    ) -> CompletedProcessLike:
+        """Run ``command`` in its own process group; on timeout the whole group is killed.
+
+        mmdc starts a browser that outlives a plain ``kill`` of mmdc itself,
+        so killing the group is what actually frees the worker.
+        """
         try:
-            proc = subprocess.run(
+            proc = subprocess.Popen(
                 command,
-                capture_output=True,
+                stdin=subprocess.PIPE if input_text is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
                 encoding="utf-8",
                 errors="replace",
-                check=False,
                 env=env,
+                **new_process_group(),
             )
         except OSError as exc:
             raise ToolRunnerError(str(exc)) from exc
-        return CompletedProcessLike(proc.returncode, proc.stdout or "", proc.stderr or "")
+        try:
+            stdout, stderr = proc.communicate(input_text, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_tree(proc)
+            _reap(proc)
+            raise ToolTimeoutError(f"{Path(command[0]).name} timed out after {timeout:g}s and was killed") from None
+        except BaseException:
+            kill_process_tree(proc)
+            _reap(proc)
+            raise
+        return CompletedProcessLike(proc.returncode, stdout or "", stderr or "")
 
     def _mermaid_env(self) -> dict[str, str]:
         env = dict(os.environ)
@@ -95,12 +148,21 @@ class SubprocessToolRunner(ToolRunner):
             env["PUPPETEER_CACHE_DIR"] = str(cache_dir)
         return env
 
-    def run_pandoc(self, args: list[str]) -> CompletedProcessLike:
+    def run_pandoc(self, args: list[str], input_text: str | None = None) -> CompletedProcessLike:
         if not self._pandoc_path:
             raise ToolRunnerError("pandoc is not installed or not in PATH")
-        return self._run([self._pandoc_path, *args])
+        if input_text is None or self._pandoc_input_mode == "stdin":
+            # pandoc reads stdin when no input file is given.
+            return self._run([self._pandoc_path, *args], input_text=input_text, timeout=self._pandoc_timeout)
+        with scratch_input_file(input_text) as input_path:
+            return self._run([self._pandoc_path, *args, str(input_path)], timeout=self._pandoc_timeout)
 
     def run_mermaid(self, input_mmd: Path, output_svg: Path) -> CompletedProcessLike:
+        return self._run(
+            self._mermaid_command(input_mmd, output_svg), env=self._mermaid_env(), timeout=self._mermaid_timeout
+        )
+
+    def _mermaid_command(self, input_mmd: Path, output_svg: Path) -> list[str]:
         if not self._mmdc_path:
             raise ToolRunnerError("mmdc is not installed or not in PATH")
         output_svg.parent.mkdir(parents=True, exist_ok=True)
@@ -113,7 +175,7 @@ class SubprocessToolRunner(ToolRunner):
             pptr_cfg = Path(self._puppeteer_config_path)
             if pptr_cfg.exists():
                 cmd.extend(["-p", str(pptr_cfg)])
-        return self._run(cmd, env=self._mermaid_env())
+        return cmd
 
     def get_versions(self) -> dict[str, str]:
         return {
@@ -121,12 +183,159 @@ class SubprocessToolRunner(ToolRunner):
             "mmdc": self._version_of(self._mmdc_path, "--version"),
         }
 
+    def mermaid_settings(self) -> dict[str, str]:
+        if self._mermaid_settings is None:
+            self._mermaid_settings = {
+                "renderer": "mmdc",
+                "mmdc_version": self._version_of(self._mmdc_path, "--version"),
+                "mmdc_config_sha256": _file_sha256(self._mmdc_config_path),
+                "puppeteer_config_sha256": _file_sha256(self._puppeteer_config_path),
+            }
+        return dict(self._mermaid_settings)
+
     def _version_of(self, executable: str | None, arg: str) -> str:
         if not executable:
             return "unavailable"
-        cp = self._run([executable, arg])
-        line = (cp.stdout or cp.stderr).strip().splitlines()
-        return line[0] if line else "unknown"
+        with self._versions_lock:
+            if executable in self._versions:
+                return self._versions[executable]
+            signature = _executable_signature(executable)
+            version = None
+            if self._version_cache is not None and signature is not None:
+                version = self._version_cache.get(signature)
+            if version is None:
+                try:
+                    cp = self._run([executable, arg], timeout=VERSION_PROBE_TIMEOUT_SECONDS)
+                except ToolTimeoutError:
+                    # Not cached: a hung probe says nothing about the binary.
+                    self._versions[executable] = "unknown"
+                    return "unknown"
+                line = (cp.stdout or cp.stderr).strip().splitlines()
+                version = line[0] if line else "unknown"
+                if self._version_cache is not None and signature is not None:
+                    self._version_cache.put(signature, version)
+            self._versions[executable] = version
+            return version
+
+
+class ToolVersionCache:
+    """On-disk ``--version`` results keyed by executable path, mtime and size.
+
+    Probing ``mmdc`` starts Node, so the answer is kept until the binary on
+    disk changes. Several processes may share the file; writes merge into
+    the current contents and are renamed into place.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def get(self, signature: dict[str, object]) -> str | None:
+        entry = self._read().get(str(signature["path"]))
+        if not isinstance(entry, dict):
+            return None
+        if entry.get("mtime_ns") != signature["mtime_ns"] or entry.get("size") != signature["size"]:
+            return None
+        version = entry.get("version")
+        return version if isinstance(version, str) else None
+
+    def put(self, signature: dict[str, object], version: str) -> None:
+        entries = self._read()
+        entries[str(signature["path"])] = {**signature, "version": version}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, prefix=".tool_versions.", suffix=".tmp", delete=False, encoding="utf-8"
+            ) as tmp:
+                json.dump({"entries": entries}, tmp, indent=2, sort_keys=True)
+                tmp_path = Path(tmp.name)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # A read-only cache location only costs us the re-probe next time.
+            pass
+
+    def _read(self) -> dict[str, object]:
+        try:
+            with self.path.open("r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        entries = data.get("entries") if isinstance(data, dict) else None
+        return entries if isinstance(entries, dict) else {}
+
+
+def new_process_group() -> dict[str, Any]:
+    """``Popen`` arguments that start the child as the leader of a new process group."""
+    if os.name == "posix":
+        return {"start_new_session": True}
+    return {"creationflags": getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)}
+
+
+def kill_process_tree(proc: Any) -> None:
+    """Kill a child started with ``new_process_group`` and everything it spawned.
+
+    Works for ``subprocess.Popen`` and ``asyncio.subprocess.Process`` alike.
+    """
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True, check=False)
+            proc.kill()
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def _reap(proc: subprocess.Popen[str]) -> None:
+    try:
+        proc.communicate(timeout=5)
+    except (subprocess.TimeoutExpired, ValueError, OSError):
+        # A grandchild that left the group may still hold the pipes; don't wait on it.
+        for stream in (proc.stdout, proc.stderr):
+            if stream is not None:
+                stream.close()
+        proc.wait()
+
+
+def _executable_signature(executable: str) -> dict[str, object] | None:
+    resolved = shutil.which(executable) or executable
+    try:
+        real = os.path.realpath(resolved)
+        stat = os.stat(real)
+    except OSError:
+        return None
+    return {"path": real, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _file_sha256(path: str | None) -> str:
+    if not path:
+        return ""
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return ""
+
+
+def _scratch_dir() -> str | None:
+    # Prefer a RAM-backed tmpfs so the document never touches persistent storage.
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return str(shm)
+    return None
+
+
+@contextmanager
+def scratch_input_file(text: str, suffix: str = ".md") -> Iterator[Path]:
+    """Materialize document content for tools that need a path; always removed afterwards."""
+    fd, name = tempfile.mkstemp(suffix=suffix, prefix="docforge-", dir=_scratch_dir())
+    path = Path(name)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+            fh.write(text)
+        yield path
+    finally:
+        path.unlink(missing_ok=True)
 
 
 class BundledToolRunner(SubprocessToolRunner):
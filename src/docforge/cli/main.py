@@ -1,17 +1,39 @@
 from __future__ import annotations
 
 import argparse
+import json
+import os
 import sys
 from pathlib import Path
 
-from docforge.core.models import BuildOptions
+from docforge.core.batch import BatchRunner, collect_jobs, collision_result, output_collisions
+from docforge.core.daemon import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_TIMEOUT_SECONDS,
+    BuildDaemon,
+)
+from docforge.core.mermaid_cache import CacheConfigError, MermaidCache
+from docforge.core.models import (
+    BuildOptions,
+    BuildResult,
+    EXIT_ARG_ERROR,
+    STATUS_RESTORED_FROM_STORE,
+    STATUS_SKIPPED_UP_TO_DATE,
+)
 from docforge.core.service import BuildService
+from docforge.core.timing import format_profile, sum_timings
+from docforge.core.watch import DEFAULT_DEBOUNCE_SECONDS, DEFAULT_POLL_SECONDS, Watcher
 
 
 def build_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(description="Multi-template Markdown to DOCX builder")
+    parser = argparse.ArgumentParser(
+        description="Multi-template Markdown to DOCX builder",
+        epilog="Subcommands: batch, watch, serve, cache (see 'docforge <subcommand> --help')",
+    )
     parser.add_argument("--input", required=True, help="Input markdown file")
-    parser.add_argument("--output", required=True, help="Output docx path")
+    parser.add_argument("--output", help="Output docx path (required unless --check)")
     parser.add_argument("--type", dest="doc_type", help="Template type (gov|tech|compliance|audit)")
     parser.add_argument(
         "--config",
@@ -29,42 +51,369 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Mermaid output format override (png or svg)",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of Mermaid diagrams rendered in parallel (default: tools.mermaid_workers in config)",
+    )
     parser.add_argument("--no-mermaid", action="store_true", help="Disable Mermaid rendering")
+    parser.add_argument(
+        "--split",
+        action="store_true",
+        default=None,
+        help="Large-document mode: convert H1 sections in parallel and merge them (default: defaults.split_min_lines)",
+    )
+    parser.add_argument("--force", action="store_true", help="Rebuild even when the output is up to date")
+    parser.add_argument(
+        "--output-hash",
+        choices=["sync", "deferred", "off"],
+        default=None,
+        help="When to hash the output for SHA256SUMS and the build manifest (default from config)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Validate config, template, front matter and Mermaid syntax without running pandoc or mmdc",
+    )
+    parser.add_argument("--profile", action="store_true", help="Print a per-phase timing breakdown")
     parser.add_argument("--verbose", action="store_true", help="Verbose logs")
     return parser
 
 
-def main(argv: list[str] | None = None) -> int:
-    parser = build_parser()
-    args = parser.parse_args(argv)
+def build_batch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="docforge batch",
+        description="Build many Markdown files with one loaded config and a process pool",
+    )
+    parser.add_argument("inputs", nargs="*", help="Input markdown files or globs (e.g. 'docs/**/*.md')")
+    parser.add_argument("--manifest", default=None, help="YAML/JSON list of documents (input, output, type)")
+    parser.add_argument("--output-dir", help="Directory for generated docx files (required unless --check)")
+    parser.add_argument("--report", default=None, help="Summary report path (default: <output-dir>/batch_report.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel documents")
+    parser.add_argument("--type", dest="doc_type", help="Template type for documents without their own")
+    parser.add_argument("--config", default="config/templates.yaml", help="Path to template config YAML")
+    parser.add_argument("--template-dir", default=None, help="Override directory for template docx paths")
+    parser.add_argument("--mermaid-format", choices=["png", "svg"], default=None, help="Mermaid output format")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel Mermaid renders per document")
+    parser.add_argument("--no-mermaid", action="store_true", help="Disable Mermaid rendering")
+    parser.add_argument(
+        "--split",
+        action="store_true",
+        default=None,
+        help="Large-document mode for every document (default: defaults.split_min_lines)",
+    )
+    parser.add_argument("--force", action="store_true", help="Rebuild even when the output is up to date")
+    parser.add_argument(
+        "--output-hash",
+        choices=["sync", "deferred", "off"],
+        default=None,
+        help="When to hash outputs for SHA256SUMS and the build manifest (default from config)",
+    )
+    parser.add_argument("--check", action="store_true", help="Validate every document without building it")
+    parser.add_argument("--profile", action="store_true", help="Print a per-phase timing breakdown")
+    parser.add_argument("--verbose", action="store_true", help="Verbose logs")
+    return parser
 
+
+def build_watch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="docforge watch",
+        description="Rebuild Markdown files whenever they, their images, templates or config change",
+    )
+    parser.add_argument("inputs", nargs="+", help="Input markdown files or globs (e.g. 'docs/**/*.md')")
+    parser.add_argument("--output-dir", required=True, help="Directory for generated docx files")
+    parser.add_argument("--type", dest="doc_type", help="Template type for documents without front matter")
+    parser.add_argument("--config", default="config/templates.yaml", help="Path to template config YAML")
+    parser.add_argument("--template-dir", default=None, help="Override directory for template docx paths")
+    parser.add_argument("--mermaid-format", choices=["png", "svg"], default=None, help="Mermaid output format")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel Mermaid renders per document")
+    parser.add_argument("--workers", type=int, default=1, help="Documents rebuilt in parallel")
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE_SECONDS,
+        help=f"Seconds without further changes before rebuilding (default: {DEFAULT_DEBOUNCE_SECONDS})",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_POLL_SECONDS,
+        help=f"Seconds between file checks (default: {DEFAULT_POLL_SECONDS})",
+    )
+    parser.add_argument("--no-mermaid", action="store_true", help="Disable Mermaid rendering")
+    parser.add_argument("--profile", action="store_true", help="Print a per-phase timing breakdown per build")
+    parser.add_argument("--verbose", action="store_true", help="Verbose logs")
+    return parser
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="docforge serve",
+        description="Run a local build daemon: POST /build, GET /health, GET /metrics",
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Listen address (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Listen port (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Builds run in parallel")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"Queued builds before requests are rejected with 429 (default: {DEFAULT_QUEUE_SIZE})",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT_SECONDS,
+        help=f"Default per-request timeout in seconds (default: {DEFAULT_TIMEOUT_SECONDS:g})",
+    )
+    parser.add_argument("--config", default="config/templates.yaml", help="Path to template config YAML")
+    return parser
+
+
+def build_cache_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="docforge cache", description="Inspect and maintain the Mermaid image cache")
+    parser.add_argument("action", choices=["stats", "prune", "clear"])
+    parser.add_argument("--config", default="config/templates.yaml", help="Path to template config YAML")
+    parser.add_argument("--max-size-mb", type=float, default=None, help="prune: size limit override")
+    parser.add_argument("--max-age-days", type=float, default=None, help="prune: age limit override")
+    return parser
+
+
+def _base_dir() -> Path:
     if getattr(sys, "frozen", False):
         # Packaged executable mode: keep resources relative to the exe location.
-        base_dir = Path(sys.executable).resolve().parent
-    else:
-        base_dir = Path(__file__).resolve().parents[3]
-    service = BuildService(base_dir=base_dir)
+        return Path(sys.executable).resolve().parent
+    return Path(__file__).resolve().parents[3]
+
 
-    config_path = Path(args.config)
-    if args.config == "config/templates.yaml":
+def _config_path(raw: str, base_dir: Path) -> Path:
+    if raw == "config/templates.yaml":
         # Use absolute default config to avoid cwd/temp-dir ambiguity in packaged runs.
-        config_path = base_dir / "config" / "templates.yaml"
+        return base_dir / "config" / "templates.yaml"
+    return Path(raw)
+
+
+def batch_main(argv: list[str]) -> int:
+    parser = build_batch_parser()
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.manifest:
+        parser.error("provide input globs and/or --manifest")
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    if not args.output_dir and not args.check:
+        parser.error("--output-dir is required unless --check is given")
+
+    base_dir = _base_dir()
+    config_path = _config_path(args.config, base_dir)
+    # Checks write nothing but the report, so they default to the working directory.
+    output_dir = Path(args.output_dir or ".").expanduser().resolve()
+    template = BuildOptions(
+        input_path=Path(),
+        output_path=Path(),
+        template_type=args.doc_type,
+        config_path=config_path,
+        template_dir=Path(args.template_dir) if args.template_dir else None,
+        enable_mermaid=not args.no_mermaid,
+        mermaid_format=args.mermaid_format,
+        mermaid_workers=args.jobs,
+        split=args.split,
+        output_hash=args.output_hash,
+        verbose=args.verbose,
+        force=args.force,
+    )
+
+    try:
+        jobs = collect_jobs(args.inputs, Path(args.manifest) if args.manifest else None, output_dir, template)
+    except (OSError, ValueError) as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        return EXIT_ARG_ERROR
+    if not jobs:
+        print("[ERROR] No input documents matched", file=sys.stderr)
+        return EXIT_ARG_ERROR
+
+    report = BatchRunner(base_dir=base_dir, config_path=config_path, workers=args.workers, check=args.check).run(jobs)
+    report_path = Path(args.report) if args.report else output_dir / "batch_report.json"
+    BatchRunner.write_report(report, report_path)
+
+    for item in report.items:
+        if item.exit_code == 0:
+            if args.verbose:
+                print(f"[OK] {item.input_path}" if args.check else f"[OK] {item.input_path} -> {item.output_path}")
+        else:
+            print(f"[FAIL] {item.input_path} (exit {item.exit_code}): {item.error}", file=sys.stderr)
+    failed = sum(1 for item in report.items if item.exit_code != 0)
+    verb = "valid" if args.check else "succeeded"
+    print(f"[BATCH] {len(report.items) - failed}/{len(report.items)} {verb}; report: {report_path}")
+    if args.profile:
+        print(format_profile(sum_timings([item.timings for item in report.items if item.timings])))
+    return report.exit_code
+
+
+def watch_main(argv: list[str]) -> int:
+    parser = build_watch_parser()
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+
+    base_dir = _base_dir()
+    config_path = _config_path(args.config, base_dir)
+    output_dir = Path(args.output_dir).expanduser().resolve()
+    template = BuildOptions(
+        input_path=Path(),
+        output_path=Path(),
+        template_type=args.doc_type,
+        config_path=config_path,
+        template_dir=Path(args.template_dir) if args.template_dir else None,
+        enable_mermaid=not args.no_mermaid,
+        mermaid_format=args.mermaid_format,
+        mermaid_workers=args.jobs,
+        verbose=args.verbose,
+    )
+    jobs = collect_jobs(args.inputs, None, output_dir, template)
+    if not jobs:
+        print("[ERROR] No input documents matched", file=sys.stderr)
+        return EXIT_ARG_ERROR
+    collisions = output_collisions(jobs)
+    for index, owner in collisions.items():
+        error = collision_result(jobs[index], owner).error
+        print(f"[FAIL] {jobs[index].input_path}: {error.message if error else 'output collision'}", file=sys.stderr)
+    jobs = [job for index, job in enumerate(jobs) if index not in collisions]
+
+    def report(job: BuildOptions, result: BuildResult, elapsed: float) -> None:
+        if result.exit_code != 0:
+            message = result.error.message if result.error else "build failed"
+            print(f"[FAIL] {job.input_path} (exit {result.exit_code}): {message}", file=sys.stderr)
+        elif result.status == STATUS_SKIPPED_UP_TO_DATE:
+            if args.verbose:
+                print(f"[OK] Up to date: {job.output_path}")
+        else:
+            print(f"[OK] {job.input_path} -> {job.output_path} ({elapsed:.2f}s)")
+        if args.profile and result.timings:
+            print(format_profile(result.timings))
+
+    watcher = Watcher(
+        base_dir=base_dir,
+        config_path=config_path,
+        jobs=jobs,
+        debounce=args.debounce,
+        poll_interval=args.interval,
+        workers=args.workers,
+        on_result=report,
+    )
+    print(f"[WATCH] Watching {len(jobs)} document(s); press Ctrl+C to stop")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def serve_main(argv: list[str]) -> int:
+    parser = build_serve_parser()
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be >= 1")
+
+    base_dir = _base_dir()
+    daemon = BuildDaemon(
+        base_dir=base_dir,
+        config_path=_config_path(args.config, base_dir),
+        workers=args.workers,
+        queue_size=args.queue_size,
+        timeout=args.timeout,
+    )
+    try:
+        daemon.start(args.host, args.port)
+    except OSError as exc:
+        print(f"[ERROR] Cannot listen on {args.host}:{args.port}: {exc}", file=sys.stderr)
+        return EXIT_ARG_ERROR
+    host, port = daemon.address
+    print(f"[SERVE] Listening on http://{host}:{port} with {args.workers} worker(s); press Ctrl+C to stop")
+    try:
+        daemon.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
+    return 0
+
+
+def cache_main(argv: list[str]) -> int:
+    parser = build_cache_parser()
+    args = parser.parse_args(argv)
+    base_dir = _base_dir()
+    config_path = _config_path(args.config, base_dir)
+    try:
+        config = BuildService._load_yaml(config_path)
+    except Exception as exc:
+        print(f"[ERROR] Invalid config YAML: {exc}", file=sys.stderr)
+        return EXIT_ARG_ERROR
+
+    try:
+        cache = MermaidCache.from_config(config, base_dir)
+    except CacheConfigError as exc:
+        print(f"[ERROR] Invalid config: {exc}", file=sys.stderr)
+        return EXIT_ARG_ERROR
+    if args.action == "stats":
+        result = cache.disk_stats()
+    elif args.action == "prune":
+        result = cache.prune(
+            max_bytes=int(args.max_size_mb * 1024 * 1024) if args.max_size_mb is not None else None,
+            max_age_seconds=args.max_age_days * 86400 if args.max_age_days is not None else None,
+        )
+    else:
+        result = cache.clear()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    subcommands = {"batch": batch_main, "watch": watch_main, "serve": serve_main, "cache": cache_main}
+    if argv and argv[0] in subcommands:
+        return subcommands[argv[0]](argv[1:])
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    if not args.output and not args.check:
+        parser.error("--output is required unless --check is given")
+
+    base_dir = _base_dir()
+    service = BuildService(base_dir=base_dir)
+    config_path = _config_path(args.config, base_dir)
 
     options = BuildOptions(
         input_path=Path(args.input),
-        output_path=Path(args.output),
+        output_path=Path(args.output) if args.output else Path(args.input).with_suffix(".docx"),
         template_type=args.doc_type,
         config_path=config_path,
         template_dir=Path(args.template_dir) if args.template_dir else None,
         enable_mermaid=not args.no_mermaid,
         mermaid_format=args.mermaid_format,
+        mermaid_workers=args.jobs,
+        split=args.split,
+        output_hash=args.output_hash,
         verbose=args.verbose,
+        force=args.force,
     )
 
-    result = service.run(options)
+    result = service.validate(options) if args.check else service.run(options)
+    service.wait_for_records()
 
     for warning in result.warnings:
         print(f"[WARN] {warning.code}: {warning.message}")
+    if args.profile and result.timings:
+        print(format_profile(result.timings))
 
     if result.exit_code != 0:
         if result.error:
@@ -72,9 +421,18 @@ def main(argv: list[str] | None = None) -> int:
             stderr = result.error.details.get("stderr") if result.error.details else None
             if stderr:
                 print(stderr, file=sys.stderr)
+            for problem in (result.error.details or {}).get("mermaid", [])[1:]:
+                print(f"[ERROR] {problem}", file=sys.stderr)
         return result.exit_code
 
-    if result.output_path:
+    if args.check:
+        print(f"[OK] Valid: {options.input_path}")
+        return 0
+    if result.output_path and result.status == STATUS_SKIPPED_UP_TO_DATE:
+        print(f"[OK] Up to date: {result.output_path}")
+    elif result.output_path and result.status == STATUS_RESTORED_FROM_STORE:
+        print(f"[OK] Restored from build store: {result.output_path}")
+    elif result.output_path:
         print(f"[OK] Generated DOCX: {result.output_path}")
     return 0
 
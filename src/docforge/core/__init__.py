@@ -1,4 +1,18 @@
-from docforge.core.models import BuildOptions, BuildResult
+from docforge.core.async_service import AsyncBuildService
+from docforge.core.batch import BatchRunner
+from docforge.core.daemon import BuildDaemon
+from docforge.core.models import BatchItemResult, BatchReport, BuildOptions, BuildResult
 from docforge.core.service import BuildService
+from docforge.core.watch import Watcher
 
-__all__ = ["BuildOptions", "BuildResult", "BuildService"]
+__all__ = [
+    "AsyncBuildService",
+    "BatchItemResult",
+    "BatchReport",
+    "BatchRunner",
+    "BuildDaemon",
+    "BuildOptions",
+    "BuildResult",
+    "BuildService",
+    "Watcher",
+]
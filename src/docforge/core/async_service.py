@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from docforge.adapters.async_runner import AsyncToolRunner
+from docforge.adapters.tool_runner import (
+    CompletedProcessLike,
+    ToolRunner,
+    ToolRunnerError,
+    ToolTimeoutError,
+    scratch_input_file,
+)
+from docforge.core.mermaid_cache import MermaidCache
+from docforge.core.models import BuildError, BuildOptions, BuildResult
+from docforge.core.rasterize import uses_foreign_object
+from docforge.core.service import BuildService, _PreparedBuild
+from docforge.core.timing import PhaseTimer
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+class AsyncBuildService:
+    """Awaitable ``BuildService`` for asyncio applications.
+
+    Shares the preparation and bookkeeping stages with ``BuildService`` (run
+    in worker threads; they only touch local files), so results and
+    ``build_meta.json`` are identical. Pandoc and Mermaid run as asyncio
+    subprocesses through ``AsyncToolRunner``; cancelling ``run`` kills them.
+    Blocking runners (e.g. test doubles) are called via ``asyncio.to_thread``.
+
+    ``max_concurrency`` caps the external tool processes running at once
+    across every build on this service; Mermaid blocks of one document are
+    additionally limited by its ``mermaid_workers`` setting.
+    """
+
+    def __init__(
+        self,
+        base_dir: Path,
+        tool_runner: ToolRunner | None = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> None:
+        self.service = BuildService(base_dir=base_dir, tool_runner=tool_runner)
+        self.max_concurrency = max(1, max_concurrency)
+        self._limit = asyncio.Semaphore(self.max_concurrency)
+        # Render-lock path -> (lock, users): only one coroutine per lock waits on the file lock.
+        self._inflight: dict[Path, tuple[asyncio.Lock, list[int]]] = {}
+
+    @property
+    def base_dir(self) -> Path:
+        return self.service.base_dir
+
+    async def run(self, options: BuildOptions) -> BuildResult:
+        started = time.perf_counter()
+        result = await self._build(options)
+        await asyncio.to_thread(self.service._journal, options, result, time.perf_counter() - started)
+        return result
+
+    async def _build(self, options: BuildOptions) -> BuildResult:
+        timer = PhaseTimer()
+        prepared = await asyncio.to_thread(self.service._prepare, options, timer, self._build_tool_runner)
+        if isinstance(prepared, BuildResult):
+            return prepared
+        try:
+            markdown_body = prepared.markdown_body
+            mermaid_rendered = 0
+            if prepared.mermaid_enabled:
+                with timer.phase("mermaid"):
+                    result = await self._replace_mermaid_with_image(prepared, timer)
+                    await asyncio.to_thread(prepared.mermaid_cache.flush)
+                fallback = BuildService._raster_fallback_warning(timer)
+                if fallback is not None:
+                    prepared.warnings.append(fallback)
+                if isinstance(result, BuildError):
+                    return BuildResult(exit_code=result.code, error=result, warnings=prepared.warnings)
+                markdown_body, mermaid_rendered = result
+
+            if prepared.image_optimizer is not None:
+                with timer.phase("images"):
+                    markdown_body = await asyncio.to_thread(self.service._optimize_images, prepared, markdown_body)
+
+            try:
+                with timer.phase("pandoc"):
+                    pandoc_proc = await self._convert(prepared, markdown_body, timer)
+            except ToolRunnerError as exc:
+                return self.service._tool_failure(exc, timer)
+            return await asyncio.to_thread(self.service._finish, prepared, pandoc_proc, mermaid_rendered, timer)
+        finally:
+            await asyncio.to_thread(prepared.mermaid_cache.release)
+
+    async def _convert(self, prepared: _PreparedBuild, markdown_body: str, timer: PhaseTimer) -> CompletedProcessLike:
+        if prepared.split_parts <= 1:
+            cmd_args, document = self.service._pandoc_input(prepared, markdown_body)
+            async with self._limit:
+                return await self._run_pandoc(prepared.runner, cmd_args, document)
+
+        async def convert(cmd_args: list[str], document: str) -> CompletedProcessLike:
+            async with self._limit:
+                return await self._run_pandoc(prepared.runner, cmd_args, document)
+
+        with tempfile.TemporaryDirectory(prefix=".docforge-parts-", dir=prepared.output_path.parent) as work_dir:
+            inputs = self.service._part_inputs(prepared, markdown_body, Path(work_dir))
+            procs = await asyncio.gather(*(convert(cmd_args, document) for cmd_args, document, _ in inputs))
+            part_paths = [part_path for _, _, part_path in inputs]
+            return await asyncio.to_thread(self.service._merge_parts, prepared, part_paths, list(procs), timer)
+
+    def _build_tool_runner(self, tools_cfg: Any) -> ToolRunner:
+        # The warm Mermaid browser and pandoc server backends are thread based; asyncio uses plain processes.
+        return AsyncToolRunner(**self.service._tool_runner_kwargs(tools_cfg))
+
+    async def _replace_mermaid_with_image(
+        self, prepared: _PreparedBuild, timer: PhaseTimer
+    ) -> tuple[str, int] | BuildError:
+        cache = prepared.mermaid_cache
+        image_ext = prepared.mermaid_format
+        profile = prepared.mermaid_profile
+        blocks = prepared.scan.mermaid_blocks
+        pending = self.service._plan_mermaid(blocks, cache, image_ext, profile, timer)
+
+        if pending:
+            per_document = asyncio.Semaphore(max(1, prepared.mermaid_workers))
+
+            async def render(number: int, digest: str, source: str) -> tuple[int, str | None]:
+                async with per_document:
+                    started = time.perf_counter()
+                    outcome = "miss"
+                    try:
+                        if prepared.mermaid_derive is not None:
+                            outcome, error = await self._derive_png(prepared, timer, number, digest, source)
+                            return number, error
+                        async with self._render_guard(cache, digest, image_ext, profile):
+                            if cache.adopt(digest, image_ext, profile):
+                                outcome = "joined"
+                                return number, None
+                            return number, await self._render_with_retry(
+                                prepared, timer, number, digest, source, image_ext, profile
+                            )
+                    except OSError as exc:
+                        return number, f"Mermaid cache I/O failed: {exc}"
+                    finally:
+                        elapsed = time.perf_counter() - started
+                        timer.add("mermaid.render", elapsed)
+                        timer.record_block(number, outcome, elapsed)
+
+            outcomes = await asyncio.gather(
+                *(render(number, digest, source) for digest, (number, source) in pending.items())
+            )
+            failures = [(number, error) for number, error in outcomes if error is not None]
+            if failures:
+                number, error = min(failures)
+                return self.service._mermaid_failure(number, error, timer)
+
+        body = self.service._substitute_mermaid(prepared.markdown_body, blocks, cache, image_ext, profile)
+        return body, len(blocks)
+
+    @contextlib.asynccontextmanager
+    async def _render_guard(
+        self, cache: MermaidCache, digest: str, image_ext: str, profile: str
+    ) -> AsyncIterator[None]:
+        """``MermaidCache.render_lock`` without blocking the event loop.
+
+        Coroutines of this service queue on an asyncio lock; only the one at
+        the front waits for the file lock, in a worker thread.
+        """
+        key = cache.render_lock_path(digest, image_ext, profile)
+        lock, users = self._inflight.setdefault(key, (asyncio.Lock(), [0]))
+        users[0] += 1
+        try:
+            async with lock:
+                guard = cache.render_lock(digest, image_ext, profile)
+                acquiring = asyncio.ensure_future(asyncio.to_thread(guard.__enter__))
+                try:
+                    await asyncio.shield(acquiring)
+                except asyncio.CancelledError:
+                    # The thread still takes the lock; hand it back as soon as it does.
+                    acquiring.add_done_callback(
+                        lambda f: f.cancelled() or f.exception() is not None or guard.__exit__(None, None, None)
+                    )
+                    raise
+                try:
+                    yield
+                finally:
+                    guard.__exit__(None, None, None)
+        finally:
+            users[0] -= 1
+            if not users[0]:
+                del self._inflight[key]
+
+    async def _derive_png(
+        self, prepared: _PreparedBuild, timer: PhaseTimer, number: int, digest: str, source: str
+    ) -> tuple[str, str | None]:
+        """Async ``BuildService._derive_png``: the SVG renders through the runner, rasterization runs in a thread."""
+        cache = prepared.mermaid_cache
+        derive = prepared.mermaid_derive
+        assert derive is not None
+        svg_digest = BuildService._sha256_text(f"svg:{source}")
+        outcome = "derived"
+        if await asyncio.to_thread(cache.lookup, svg_digest, "svg", derive.svg_profile) is None:
+            async with self._render_guard(cache, svg_digest, "svg", derive.svg_profile):
+                if not cache.adopt(svg_digest, "svg", derive.svg_profile):
+                    outcome = "miss"
+                    error = await self._render_with_retry(
+                        prepared, timer, number, svg_digest, source, "svg", derive.svg_profile
+                    )
+                    if error is not None:
+                        return outcome, error
+        async with self._render_guard(cache, digest, "png", prepared.mermaid_profile):
+            if cache.adopt(digest, "png", prepared.mermaid_profile):
+                return "joined", None
+            svg_path = cache.image_path(svg_digest, "svg", derive.svg_profile)
+            if await asyncio.to_thread(uses_foreign_object, svg_path):
+                BuildService._record_raster_fallback(timer, number)
+                return "miss", await self._render_with_retry(
+                    prepared, timer, number, digest, source, "png", prepared.mermaid_profile
+                )
+            error = await asyncio.to_thread(
+                BuildService._rasterize, timer, cache, svg_path, digest, prepared.mermaid_profile, derive
+            )
+        return outcome, error
+
+    async def _render_with_retry(
+        self,
+        prepared: _PreparedBuild,
+        timer: PhaseTimer,
+        number: int,
+        digest: str,
+        source: str,
+        image_ext: str,
+        profile: str,
+    ) -> str | None:
+        attempt = 1
+        while True:
+            try:
+                error = await self._render_mermaid_block(
+                    prepared.runner, prepared.mermaid_cache, digest, source, image_ext, profile
+                )
+            except ToolTimeoutError as exc:
+                error = str(exc)
+                timer.record_event("mermaid_timeout", block=number, attempt=attempt, message=error)
+            except ToolRunnerError as exc:
+                return str(exc)
+            if error is None:
+                return None
+            delay = BuildService._plan_retry(timer, number, attempt, error, prepared.mermaid_retry)
+            if delay is None:
+                return error if attempt == 1 else f"{error} (after {attempt} attempts)"
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _render_mermaid_block(
+        self,
+        runner: ToolRunner,
+        cache: MermaidCache,
+        digest: str,
+        source: str,
+        image_ext: str,
+        profile: str,
+    ) -> str | None:
+        staging = cache.staging_path(digest, image_ext, profile)
+        try:
+            with scratch_input_file(source, suffix=".mmd") as mmd_path:
+                async with self._limit:
+                    mermaid_proc = await self._run_mermaid(runner, mmd_path, staging)
+            return BuildService._commit_render(mermaid_proc, cache, staging, digest, image_ext, profile)
+        finally:
+            staging.unlink(missing_ok=True)
+
+    @staticmethod
+    async def _run_mermaid(runner: ToolRunner, input_mmd: Path, output_path: Path) -> CompletedProcessLike:
+        if isinstance(runner, AsyncToolRunner):
+            return await runner.arun_mermaid(input_mmd, output_path)
+        return await asyncio.to_thread(runner.run_mermaid, input_mmd, output_path)
+
+    @staticmethod
+    async def _run_pandoc(runner: ToolRunner, args: list[str], input_text: str) -> CompletedProcessLike:
+        if isinstance(runner, AsyncToolRunner):
+            return await runner.arun_pandoc(args, input_text=input_text)
+        return await asyncio.to_thread(runner.run_pandoc, args, input_text)
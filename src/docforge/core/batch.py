@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import datetime as dt
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+from docforge.adapters.tool_runner import ToolRunner
+from docforge.core.models import (
+    BatchItemResult,
+    BatchReport,
+    BuildOptions,
+    BuildResult,
+    EXIT_ARG_ERROR,
+    EXIT_CONVERT_ERROR,
+)
+from docforge.core.service import BuildService
+from docforge.core.timing import sum_timings
+
+BATCH_REPORT_SCHEMA_VERSION = "1.0"
+
+_WORKER_SERVICE: BuildService | None = None
+_WORKER_CHECK = False
+
+
+def collect_jobs(
+    patterns: list[str],
+    manifest_path: Path | None,
+    output_dir: Path,
+    template: BuildOptions,
+) -> list[BuildOptions]:
+    """Expand input globs and manifest entries into per-document build options.
+
+    Glob inputs mirror their directory layout (relative to the common parent of
+    all matches) under ``output_dir``. Manifest entries may be plain paths or
+    mappings with ``input``, optional ``output`` and optional ``type``.
+    Repeated entries are listed once; different documents writing the same
+    output are all kept, see ``output_collisions``.
+    """
+    entries: list[tuple[Path, Path | None, str | None]] = []
+
+    matched: list[Path] = []
+    for pattern in patterns:
+        hits = sorted(glob.glob(os.path.expanduser(pattern), recursive=True))
+        if not hits and Path(pattern).is_file():
+            hits = [pattern]
+        matched.extend(Path(hit).resolve() for hit in hits if Path(hit).is_file())
+    if matched:
+        root = Path(os.path.commonpath([str(p.parent) for p in matched]))
+        for path in matched:
+            entries.append((path, output_dir / path.relative_to(root).with_suffix(".docx"), None))
+
+    if manifest_path is not None:
+        entries.extend(_load_manifest(manifest_path, output_dir))
+
+    jobs: list[BuildOptions] = []
+    seen: set[tuple[Path, Path, str | None]] = set()
+    for input_path, output_path, doc_type in entries:
+        output_path = output_path or output_dir / input_path.with_suffix(".docx").name
+        if (input_path, output_path, doc_type) in seen:
+            continue
+        seen.add((input_path, output_path, doc_type))
+        jobs.append(
+            BuildOptions(
+                input_path=input_path,
+                output_path=output_path,
+                template_type=doc_type or template.template_type,
+                config_path=template.config_path,
+                template_dir=template.template_dir,
+                enable_mermaid=template.enable_mermaid,
+                mermaid_format=template.mermaid_format,
+                mermaid_workers=template.mermaid_workers,
+                split=template.split,
+                output_hash=template.output_hash,
+                verbose=template.verbose,
+                force=template.force,
+            )
+        )
+    return jobs
+
+
+def output_collisions(jobs: list[BuildOptions]) -> dict[int, BuildOptions]:
+    """Jobs whose output an earlier job already writes, by index, with that earlier job.
+
+    Two jobs must never race on the same output file: only the first is built.
+    """
+    owners: dict[Path, BuildOptions] = {}
+    collisions: dict[int, BuildOptions] = {}
+    for index, job in enumerate(jobs):
+        owner = owners.setdefault(job.output_path, job)
+        if owner is not job:
+            collisions[index] = owner
+    return collisions
+
+
+def collision_result(job: BuildOptions, owner: BuildOptions) -> BuildResult:
+    return BuildService._fail(
+        EXIT_ARG_ERROR, f"Output {job.output_path} is also the output of {owner.input_path}; not built"
+    )
+
+
+def _load_manifest(manifest_path: Path, output_dir: Path) -> list[tuple[Path, Path | None, str | None]]:
+    manifest_path = manifest_path.expanduser().resolve()
+    with manifest_path.open("r", encoding="utf-8") as fh:
+        data = yaml.safe_load(fh) or []
+    if isinstance(data, dict):
+        data = data.get("documents", [])
+    if not isinstance(data, list):
+        raise ValueError("manifest must be a list of documents")
+
+    base = manifest_path.parent
+    entries: list[tuple[Path, Path | None, str | None]] = []
+    for item in data:
+        if isinstance(item, str):
+            item = {"input": item}
+        if not isinstance(item, dict) or not item.get("input"):
+            raise ValueError(f"invalid manifest entry: {item!r}")
+        input_path = Path(str(item["input"])).expanduser()
+        if not input_path.is_absolute():
+            input_path = base / input_path
+        output_path: Path | None = None
+        if item.get("output"):
+            output_path = Path(str(item["output"])).expanduser()
+            if not output_path.is_absolute():
+                output_path = output_dir / output_path
+        doc_type = str(item["type"]) if item.get("type") else None
+        entries.append((input_path.resolve(), output_path, doc_type))
+    return entries
+
+
+def _init_worker(base_dir: Path, config_path: Path, check: bool = False) -> None:
+    global _WORKER_SERVICE, _WORKER_CHECK
+    _WORKER_CHECK = check
+    # Checks never start a tool, so they skip resolving one.
+    _WORKER_SERVICE = BuildService(base_dir=base_dir) if check else BatchRunner.create_service(base_dir, config_path)
+
+
+def _run_job(options: BuildOptions) -> tuple[BuildResult, float]:
+    assert _WORKER_SERVICE is not None
+    outcome = _run_with(_WORKER_SERVICE, options, check=_WORKER_CHECK)
+    # Pool workers exit without joining threads, so deferred hashes are recorded before the job returns.
+    _WORKER_SERVICE.wait_for_records()
+    return outcome
+
+
+def _run_with(service: BuildService, options: BuildOptions, check: bool = False) -> tuple[BuildResult, float]:
+    started = time.monotonic()
+    try:
+        result = service.validate(options) if check else service.run(options)
+    except Exception as exc:  # one broken document must not abort the batch
+        result = BuildService._fail(EXIT_CONVERT_ERROR, f"Unexpected error: {exc}")
+    return result, time.monotonic() - started
+
+
+class BatchRunner:
+    """Builds many documents with one loaded config and one tool runner per worker.
+
+    With ``check=True`` every document goes through ``BuildService.validate``
+    instead: nothing is rendered or converted, so thousands of files fit in
+    one CI step.
+    """
+
+    def __init__(
+        self,
+        base_dir: Path,
+        config_path: Path,
+        workers: int = 1,
+        tool_runner: ToolRunner | None = None,
+        check: bool = False,
+    ) -> None:
+        self.base_dir = base_dir.resolve()
+        self.config_path = config_path
+        self.workers = max(1, workers)
+        self.tool_runner = tool_runner
+        self.check = check
+
+    @staticmethod
+    def create_service(base_dir: Path, config_path: Path, tool_runner: ToolRunner | None = None) -> BuildService:
+        service = BuildService(base_dir=base_dir, tool_runner=tool_runner)
+        if tool_runner is None:
+            # Warm the config cache and resolve tools once up front; if config is broken, each job reports it.
+            resolved_config = (config_path if config_path.is_absolute() else base_dir / config_path).resolve()
+            try:
+                cached = service.config_cache.load(resolved_config)
+            except Exception:
+                return service
+            service.config_cache.tool_runner(cached, service._build_tool_runner)
+        return service
+
+    def run(self, jobs: list[BuildOptions]) -> BatchReport:
+        started_at = dt.datetime.now(dt.timezone.utc).isoformat()
+        started = time.monotonic()
+        outcomes: list[tuple[BuildResult, float]]
+        collisions = output_collisions(jobs)
+        runnable = [job for index, job in enumerate(jobs) if index not in collisions]
+
+        if self.workers == 1 or len(runnable) <= 1 or self.tool_runner is not None:
+            if self.check:
+                service = BuildService(base_dir=self.base_dir, tool_runner=self.tool_runner)
+            else:
+                service = self.create_service(self.base_dir, self.config_path, self.tool_runner)
+            outcomes = [_run_with(service, job, check=self.check) for job in runnable]
+            service.wait_for_records()
+        else:
+            with ProcessPoolExecutor(
+                max_workers=min(self.workers, len(runnable)),
+                initializer=_init_worker,
+                initargs=(self.base_dir, self.config_path, self.check),
+            ) as pool:
+                # Checks take milliseconds; batching them keeps inter-process overhead down.
+                chunksize = max(1, len(runnable) // (self.workers * 4)) if self.check else 1
+                outcomes = list(pool.map(_run_job, runnable, chunksize=chunksize))
+        built = iter(outcomes)
+        outcomes = [
+            (collision_result(job, collisions[index]), 0.0) if index in collisions else next(built)
+            for index, job in enumerate(jobs)
+        ]
+
+        items = [
+            BatchItemResult(
+                input_path=job.input_path,
+                output_path=job.output_path,
+                exit_code=result.exit_code,
+                status=result.status,
+                elapsed_seconds=elapsed,
+                error=result.error.message if result.error else None,
+                warnings=[w.code for w in result.warnings],
+                timings=result.timings,
+            )
+            for job, (result, elapsed) in zip(jobs, outcomes)
+        ]
+        return BatchReport(
+            items=items,
+            started_at=started_at,
+            elapsed_seconds=time.monotonic() - started,
+            workers=self.workers,
+        )
+
+    @staticmethod
+    def write_report(report: BatchReport, report_path: Path) -> Path:
+        payload: dict[str, Any] = {
+            "schema_version": BATCH_REPORT_SCHEMA_VERSION,
+            "started_at": report.started_at,
+            "elapsed_seconds": round(report.elapsed_seconds, 3),
+            "workers": report.workers,
+            "total": len(report.items),
+            "succeeded": sum(1 for item in report.items if item.exit_code == 0),
+            "failed": sum(1 for item in report.items if item.exit_code != 0),
+            "timings": sum_timings([item.timings for item in report.items if item.timings]),
+            "documents": [
+                {
+                    "input": str(item.input_path),
+                    "output": str(item.output_path),
+                    "exit_code": item.exit_code,
+                    "status": item.status,
+                    "elapsed_seconds": round(item.elapsed_seconds, 3),
+                    "error": item.error,
+                    "warnings": item.warnings,
+                }
+                for item in report.items
+            ],
+        }
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with report_path.open("w", encoding="utf-8") as fh:
+            json.dump(payload, fh, indent=2, ensure_ascii=False)
+        return report_path
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import math
+import os
+import shutil
+import uuid
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any
+
+from docforge.core.file_lock import file_lock
+
+LATEST_META_NAME = "build_meta.json"
+CHECKSUMS_NAME = "SHA256SUMS"
+JOURNAL_NAME = "build_journal.jsonl"
+LOCK_NAME = ".logs.lock"
+BUILDS_DIR_NAME = "builds"
+DEFAULT_MAX_SIZE_MB = 64
+DEFAULT_BACKUPS = 5
+DEFAULT_KEEP_DAYS = 30
+DAY_DIR_FORMAT = "%Y-%m-%d"
+
+
+class LogConfigError(ValueError):
+    pass
+
+
+class BuildLog:
+    """Build records under ``logs/`` that stay intact when many builds run at once.
+
+    Every build gets its own metadata file, ``builds/<date>/<time>-<output>-<id>.json``,
+    written to a temporary name and renamed into place; ``build_meta.json`` is
+    then atomically replaced with a link to it so it always names the latest
+    finished build. ``SHA256SUMS`` and the JSONL journal (one line per run,
+    including skips and failures) are appended under a lock shared by all
+    processes on the host and rotated to ``.1`` ... ``.N`` above
+    ``logs.max_size_mb``. Day directories older than ``logs.keep_days`` are
+    deleted when the first build of a new day writes its metadata.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int | None = None,
+        backups: int = DEFAULT_BACKUPS,
+        keep_days: int | None = DEFAULT_KEEP_DAYS,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.backups = max(0, backups)
+        self.keep_days = keep_days
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any], base_dir: Path) -> "BuildLog":
+        logs_cfg = config.get("logs") if isinstance(config, dict) else None
+        if not isinstance(logs_cfg, dict):
+            logs_cfg = {}
+        max_mb = _number(logs_cfg, "max_size_mb", DEFAULT_MAX_SIZE_MB)
+        backups = _number(logs_cfg, "backups", DEFAULT_BACKUPS, whole=True)
+        keep_days = _number(logs_cfg, "keep_days", DEFAULT_KEEP_DAYS, whole=True)
+        return cls(
+            (base_dir / "logs").resolve(),
+            max_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+            backups=int(backups) if backups is not None else DEFAULT_BACKUPS,
+            keep_days=int(keep_days) if keep_days else None,
+        )
+
+    @property
+    def checksums_path(self) -> Path:
+        return self.root / CHECKSUMS_NAME
+
+    @property
+    def journal_path(self) -> Path:
+        return self.root / JOURNAL_NAME
+
+    def write_meta(self, build_meta: dict[str, Any], output_path: Path) -> Path:
+        """Write one build's metadata to a path no other build uses; returns that path."""
+        now = dt.datetime.now(dt.timezone.utc)
+        day_dir = self.root / BUILDS_DIR_NAME / now.strftime(DAY_DIR_FORMAT)
+        if not day_dir.is_dir():
+            self.expire_builds(now.date())
+        day_dir.mkdir(parents=True, exist_ok=True)
+        meta_path = day_dir / f"{now.strftime('%H%M%S')}-{output_path.stem}-{uuid.uuid4().hex[:12]}.json"
+        with NamedTemporaryFile("w", dir=day_dir, suffix=".tmp", delete=False, encoding="utf-8") as tmp:
+            json.dump(build_meta, tmp, indent=2, ensure_ascii=False)
+            tmp_path = Path(tmp.name)
+        os.replace(tmp_path, meta_path)
+        self._point_latest(meta_path)
+        return meta_path
+
+    def expire_builds(self, today: dt.date | None = None) -> list[Path]:
+        """Delete day directories of per-build metadata older than ``keep_days``; returns the removed ones."""
+        builds = self.root / BUILDS_DIR_NAME
+        if not self.keep_days or not builds.is_dir():
+            return []
+        cutoff = (today or dt.datetime.now(dt.timezone.utc).date()) - dt.timedelta(days=self.keep_days)
+        removed: list[Path] = []
+        with file_lock(self.root / LOCK_NAME):
+            for day_dir in builds.iterdir():
+                try:
+                    day = dt.datetime.strptime(day_dir.name, DAY_DIR_FORMAT).date()
+                except ValueError:
+                    continue  # not ours
+                if day < cutoff and day_dir.is_dir():
+                    shutil.rmtree(day_dir, ignore_errors=True)
+                    removed.append(day_dir)
+        return removed
+
+    def append_checksum(self, output_sha256: str, output_path: Path) -> Path:
+        self._append(self.checksums_path, f"{output_sha256}  {output_path}\n")
+        return self.checksums_path
+
+    def record(self, entry: dict[str, Any]) -> None:
+        """Append one JSON line to the build journal."""
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+        self._append(self.journal_path, line + "\n")
+
+    def _point_latest(self, meta_path: Path) -> None:
+        latest = self.root / LATEST_META_NAME
+        staging = self.root / f".{LATEST_META_NAME}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(meta_path, staging)
+        except OSError:  # file systems without hard links
+            shutil.copyfile(meta_path, staging)
+        os.replace(staging, latest)
+
+    def _append(self, path: Path, text: str) -> None:
+        data = text.encode("utf-8")
+        with file_lock(self.root / LOCK_NAME):
+            if self.max_bytes:
+                try:
+                    size = path.stat().st_size
+                except FileNotFoundError:
+                    size = 0
+                if size and size + len(data) > self.max_bytes:
+                    self._rotate(path)
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    def _rotate(self, path: Path) -> None:
+        """``path`` -> ``path.1`` -> ... -> ``path.N``; the oldest is dropped. Caller holds the lock."""
+        if self.backups == 0:
+            path.unlink(missing_ok=True)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            older = path.with_name(f"{path.name}.{index}")
+            if older.exists():
+                os.replace(older, path.with_name(f"{path.name}.{index + 1}"))
+        os.replace(path, path.with_name(f"{path.name}.1"))
+
+
+def _number(logs_cfg: dict[str, Any], key: str, default: float, whole: bool = False) -> float | None:
+    """``logs.<key>`` as a non-negative number (an integer if ``whole``); None when set to null."""
+    value = logs_cfg.get(key, default)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise LogConfigError(f"logs.{key} must be a number, got {value!r}") from None
+    if not math.isfinite(number) or number < 0 or (whole and not number.is_integer()):
+        kind = "a non-negative whole number" if whole else "a non-negative number"
+        raise LogConfigError(f"logs.{key} must be {kind}, got {value!r}")
+    return number
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+import yaml
+
+from docforge.adapters.tool_runner import ToolRunner
+from docforge.core.hashing import sha256_file
+
+# (mtime_ns, ctime_ns, size, inode): any write or replace of the file changes at least one of them.
+FileStamp = tuple[int, int, int, int]
+
+
+def file_stamp(path: Path) -> FileStamp:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_ctime_ns, st.st_size, st.st_ino)
+
+
+def parse_config(data: bytes) -> dict[str, Any]:
+    parsed = yaml.safe_load(data.decode("utf-8")) or {}
+    if not isinstance(parsed, dict):
+        raise ValueError("expected mapping")
+    return parsed
+
+
+@dataclass
+class CachedConfig:
+    """One parsed config file and everything derived from it.
+
+    ``reference_docs`` and ``runners`` are filled in lazily by the service and
+    live exactly as long as the parsed config: a changed file gets a fresh
+    entry, so template paths and tool paths are resolved again.
+    """
+
+    path: Path
+    stamp: FileStamp
+    sha256: str
+    config: dict[str, Any]
+    reference_docs: dict[tuple[str, ...], Path] = field(default_factory=dict)
+    runners: dict[Any, ToolRunner] = field(default_factory=dict)
+
+    @property
+    def templates(self) -> Any:
+        return self.config.get("templates", {})
+
+    @property
+    def defaults(self) -> Any:
+        return self.config.get("defaults", {})
+
+    @property
+    def tools(self) -> Any:
+        return self.config.get("tools", {})
+
+
+class ConfigCache:
+    """Parsed configs, resolved tool runners and file hashes shared by every build of a service.
+
+    Entries are checked with one ``stat`` per lookup. When the stamp changed
+    but the bytes did not (a ``touch``, a checkout rewriting the file), the
+    parsed entry is kept and only its stamp is refreshed. Thread-safe; the
+    daemon and watch mode build from several threads at once.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._configs: dict[Path, CachedConfig] = {}
+        self._hashes: dict[Path, tuple[FileStamp, str]] = {}
+
+    def load(self, path: Path) -> CachedConfig:
+        """The parsed config at ``path``; raises ``OSError``/``ValueError``/``yaml.YAMLError`` like a plain load."""
+        stamp = file_stamp(path)
+        with self._lock:
+            entry = self._configs.get(path)
+            if entry is not None and entry.stamp == stamp:
+                self.hits += 1
+                return entry
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            entry = self._configs.get(path)
+            if entry is not None and entry.sha256 == digest:
+                entry.stamp = stamp
+                self.hits += 1
+                return entry
+        entry = CachedConfig(path=path, stamp=stamp, sha256=digest, config=parse_config(data))
+        with self._lock:
+            self.misses += 1
+            self._configs[path] = entry
+            self._hashes[path] = (stamp, digest)
+        return entry
+
+    def file_sha256(self, path: Path) -> str:
+        """SHA-256 of ``path``, re-read only when its stamp changed."""
+        stamp = file_stamp(path)
+        with self._lock:
+            known = self._hashes.get(path)
+        if known is not None and known[0] == stamp:
+            return known[1]
+        digest = sha256_file(path)
+        with self._lock:
+            self._hashes[path] = (stamp, digest)
+        return digest
+
+    def tool_runner(self, entry: CachedConfig, build: Callable[[Any], ToolRunner]) -> ToolRunner:
+        """The runner ``build`` makes from ``entry``'s tools section, built once per config and builder."""
+        with self._lock:
+            runner = entry.runners.get(build)
+            if runner is None:
+                runner = entry.runners[build] = build(entry.tools)
+            return runner
+
+    def clear(self) -> None:
+        with self._lock:
+            self._configs.clear()
+            self._hashes.clear()
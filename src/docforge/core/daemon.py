@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from docforge import __version__
+from docforge.adapters.tool_runner import ToolRunner
+from docforge.core.batch import BatchRunner, _run_with
+from docforge.core.models import BuildOptions, BuildResult, EXIT_OK
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_TIMEOUT_SECONDS = 300.0
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+@dataclass
+class _Job:
+    options: BuildOptions
+    done: threading.Event = field(default_factory=threading.Event)
+    result: BuildResult | None = None
+    elapsed: float = 0.0
+    abandoned: bool = False
+
+
+class BuildDaemon:
+    """Serves ``BuildService.run`` over a local HTTP/JSON API.
+
+    Requests go through a bounded queue drained by a fixed number of worker
+    threads that share one warm service and tool runner (so the batch Mermaid
+    browser and the pandoc server stay up between requests). A full queue is
+    answered with 429. A request that outlives its timeout gets 504; if it was
+    still queued it is dropped, a build already running finishes in the
+    background and its result is discarded.
+
+    Endpoints: ``POST /build``, ``GET /health``, ``GET /metrics``.
+    """
+
+    def __init__(
+        self,
+        base_dir: Path,
+        config_path: Path,
+        workers: int = 1,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        tool_runner: ToolRunner | None = None,
+    ) -> None:
+        self.base_dir = base_dir.resolve()
+        self.config_path = config_path if config_path.is_absolute() else self.base_dir / config_path
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.service = BatchRunner.create_service(self.base_dir, self.config_path, tool_runner)
+        self._queue: queue.Queue[_Job | None] = queue.Queue(maxsize=max(1, queue_size))
+        self._threads: list[threading.Thread] = []
+        self._httpd: ThreadingHTTPServer | None = None
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._in_flight = 0
+        self._counters = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "bad_requests": 0,
+        }
+        self._statuses: dict[str, int] = {}
+        self._build_seconds = 0.0
+        self._stopped = threading.Event()
+
+    @property
+    def address(self) -> tuple[str, int]:
+        assert self._httpd is not None
+        host, port = self._httpd.server_address[:2]
+        return str(host), int(port)
+
+    def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        """Start the workers and the HTTP listener (port 0 picks a free port)."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"docforge-serve-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="docforge-serve-http", daemon=True).start()
+
+    def wait(self) -> None:
+        """Block until ``shutdown`` is called."""
+        while not self._stopped.wait(1.0):
+            pass
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads.clear()
+
+    def submit(self, options: BuildOptions, timeout: float | None = None) -> tuple[int, dict[str, Any]]:
+        """Queue one build and wait for it; returns the HTTP status and JSON body."""
+        job = _Job(options)
+        with self._lock:
+            self._counters["requests"] += 1
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._counters["rejected"] += 1
+            return 429, {"error": "build queue is full, retry later", "queue_size": self._queue.maxsize}
+
+        wait = self.timeout if timeout is None else timeout
+        if not job.done.wait(wait):
+            job.abandoned = True
+            with self._lock:
+                self._counters["timed_out"] += 1
+            return 504, {"error": f"build did not finish within {wait:g}s"}
+
+        result = job.result
+        assert result is not None
+        body: dict[str, Any] = {
+            "exit_code": result.exit_code,
+            "status": result.status,
+            "output": str(result.output_path) if result.output_path else None,
+            "meta": str(result.meta_path) if result.meta_path else None,
+            "elapsed_seconds": round(job.elapsed, 6),
+            "warnings": [{"code": w.code, "message": w.message} for w in result.warnings],
+            "error": result.error.message if result.error else None,
+            "timings": result.timings,
+        }
+        return (200 if result.exit_code == EXIT_OK else 422), body
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "status": "ok",
+            "version": __version__,
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "uptime_seconds": round(time.monotonic() - self._started, 3),
+        }
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "statuses": dict(self._statuses),
+                "in_flight": self._in_flight,
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "workers": self.workers,
+                "build_seconds_total": round(self._build_seconds, 6),
+                "uptime_seconds": round(time.monotonic() - self._started, 3),
+            }
+
+    def options_from_request(self, payload: Any) -> BuildOptions:
+        """Map a ``POST /build`` body onto build options; raises ValueError on bad input."""
+        if not isinstance(payload, dict):
+            raise ValueError("request body must be a JSON object")
+        if not payload.get("input") or not payload.get("output"):
+            raise ValueError("'input' and 'output' are required")
+        mermaid_format = payload.get("mermaid_format")
+        if mermaid_format not in (None, "png", "svg"):
+            raise ValueError("'mermaid_format' must be png or svg")
+        workers = payload.get("jobs")
+        if workers is not None and (not isinstance(workers, int) or workers < 1):
+            raise ValueError("'jobs' must be a positive integer")
+        return BuildOptions(
+            input_path=Path(str(payload["input"])),
+            output_path=Path(str(payload["output"])),
+            template_type=str(payload["type"]) if payload.get("type") else None,
+            config_path=self.config_path,
+            template_dir=Path(str(payload["template_dir"])) if payload.get("template_dir") else None,
+            enable_mermaid=not bool(payload.get("no_mermaid", False)),
+            mermaid_format=mermaid_format,
+            mermaid_workers=workers,
+            force=bool(payload.get("force", False)),
+        )
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.abandoned:
+                continue
+            with self._lock:
+                self._in_flight += 1
+            try:
+                job.result, job.elapsed = _run_with(self.service, job.options)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._build_seconds += job.elapsed
+                    if job.result is not None:
+                        key = "succeeded" if job.result.exit_code == EXIT_OK else "failed"
+                        self._counters[key] += 1
+                        self._statuses[job.result.status] = self._statuses.get(job.result.status, 0) + 1
+                job.done.set()
+
+    def _bad_request(self) -> None:
+        with self._lock:
+            self._counters["bad_requests"] += 1
+
+
+def _make_handler(daemon: BuildDaemon) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = f"docforge/{__version__}"
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._reply(200, daemon.health())
+            elif self.path == "/metrics":
+                self._reply(200, daemon.metrics())
+            else:
+                self._reply(404, {"error": f"unknown endpoint {self.path}"})
+
+        def do_POST(self) -> None:
+            if self.path != "/build":
+                self._reply(404, {"error": f"unknown endpoint {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_REQUEST_BYTES:
+                    raise ValueError("request body too large")
+                payload = json.loads(self.rfile.read(length) or b"null")
+                options = daemon.options_from_request(payload)
+                timeout = payload.get("timeout")
+                timeout = float(timeout) if timeout is not None else None
+            except (TypeError, ValueError) as exc:
+                daemon._bad_request()
+                self._reply(400, {"error": str(exc)})
+                return
+            status, body = daemon.submit(options, timeout)
+            self._reply(status, body)
+
+        def _reply(self, status: int, body: dict[str, Any]) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    return Handler
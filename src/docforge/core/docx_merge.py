@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import posixpath
+import re
+import zipfile
+from pathlib import Path
+
+DOCUMENT_PART = "word/document.xml"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+NUMBERING_PART = "word/numbering.xml"
+FOOTNOTES_PART = "word/footnotes.xml"
+STYLES_PART = "word/styles.xml"
+CONTENT_TYPES = "[Content_Types].xml"
+
+BODY_OPEN_RE = re.compile(r"<w:body\b[^>]*>")
+RELATIONSHIP_RE = re.compile(r"<Relationship\b[^>]*>")
+ATTRIBUTE_RE = re.compile(r'([\w:]+)="([^"]*)"')
+ABSTRACT_NUM_RE = re.compile(r'<w:abstractNum\b[^>]*\bw:abstractNumId="(\d+)".*?</w:abstractNum>', re.DOTALL)
+NUM_RE = re.compile(r'<w:num\b[^>]*\bw:numId="(\d+)"[^>]*>.*?</w:num>', re.DOTALL)
+FOOTNOTE_RE = re.compile(r"<w:footnote\b([^>]*?)(?:/>|>.*?</w:footnote>)", re.DOTALL)
+STYLE_RE = re.compile(r'<w:style\b[^>]*\bw:styleId="([^"]+)".*?</w:style>', re.DOTALL)
+DEFAULT_TYPE_RE = re.compile(r'<Default\b[^>]*\bExtension="([^"]+)"[^>]*/>')
+OVERRIDE_TYPE_RE = re.compile(r'<Override\b[^>]*\bPartName="([^"]+)"[^>]*/>')
+BOOKMARK_ID_RE = re.compile(r'<w:bookmark(?:Start|End)\b[^>]*?\bw:id="(\d+)"')
+DRAWING_ID_RE = re.compile(r'<wp:docPr\b[^>]*?\bid="(\d+)"')
+BODY_REFERENCE_RE = re.compile(
+    r'(?P<rel>\br:(?:embed|id|link|pict)=")(?P<rel_id>[^"]+)'
+    r'|(?P<num><w:numId w:val=")(?P<num_id>\d+)'
+    r'|(?P<note><w:footnoteReference\b[^>]*?\bw:id=")(?P<note_id>-?\d+)'
+    r'|(?P<mark><w:bookmark(?:Start|End)\b[^>]*?\bw:id=")(?P<mark_id>\d+)'
+    r'|(?P<drawing><wp:docPr\b[^>]*?\bid=")(?P<drawing_id>\d+)'
+)
+
+
+class DocxMergeError(Exception):
+    pass
+
+
+def merge_docx(parts: list[Path], output_path: Path, lead_marker: str | None = None) -> None:
+    """Append the bodies of ``parts[1:]`` to ``parts[0]`` and write one DOCX.
+
+    All parts must come from the same reference document (as in large-document
+    mode). The first part supplies the package: styles, settings, headers,
+    footers, document properties and the final section properties. Later
+    parts contribute their body plus everything it references: images and
+    hyperlinks get new relationship ids, list numbering and footnotes are
+    renumbered, bookmark and drawing ids are shifted to stay unique, and
+    styles missing from the first part are copied over.
+
+    When ``lead_marker`` is given, each later body is trimmed up to and
+    including the last paragraph containing it (the placeholder headings of
+    ``DocumentPart.source``).
+    """
+    if not parts:
+        raise DocxMergeError("no DOCX parts to merge")
+    base = _Package(parts[0])
+    document = base.text(DOCUMENT_PART)
+    _, body_end = _body_bounds(document)
+    merger = _Merger(base, document[:body_end])
+    pieces = [document[:body_end]]
+    for index, part_path in enumerate(parts[1:], start=1):
+        part = _Package(part_path)
+        part_document = part.text(DOCUMENT_PART)
+        start, end = _body_bounds(part_document)
+        body = part_document[start:end]
+        if lead_marker:
+            body = _drop_lead(body, lead_marker)
+        pieces.append(merger.add(index, part, body))
+    pieces.append(document[body_end:])
+    base.set_text(DOCUMENT_PART, "".join(pieces))
+    merger.finish()
+    base.write(output_path)
+
+
+def _body_bounds(document: str) -> tuple[int, int]:
+    """Start and end of the body content, excluding the trailing section properties."""
+    opening = BODY_OPEN_RE.search(document)
+    closing = document.rfind("</w:body>")
+    if opening is None or closing == -1:
+        raise DocxMergeError("word/document.xml has no body")
+    section = document.rfind("<w:sectPr", opening.end(), closing)
+    # A sectPr inside the last paragraph's properties is a section break, not the body's own.
+    if section != -1 and document[section:closing].rstrip().endswith("</w:sectPr>"):
+        return opening.end(), section
+    return opening.end(), closing
+
+
+def _drop_lead(body: str, marker: str) -> str:
+    position = body.rfind(marker)
+    if position == -1:
+        return body
+    paragraph_end = body.find("</w:p>", position)
+    return body[paragraph_end + len("</w:p>") :] if paragraph_end != -1 else body
+
+
+def _max_id(pattern: re.Pattern[str], text: str, default: int = 0) -> int:
+    return max((int(match.group(1)) for match in pattern.finditer(text)), default=default)
+
+
+class _Package:
+    """A DOCX read fully into memory, written back in its original entry order."""
+
+    def __init__(self, path: Path) -> None:
+        try:
+            with zipfile.ZipFile(path) as archive:
+                self.infos = archive.infolist()
+                self.entries = {info.filename: archive.read(info) for info in self.infos}
+        except (OSError, zipfile.BadZipFile) as exc:
+            raise DocxMergeError(f"cannot read {path}: {exc}") from exc
+        self.path = path
+
+    def has(self, name: str) -> bool:
+        return name in self.entries
+
+    def text(self, name: str) -> str:
+        if name not in self.entries:
+            raise DocxMergeError(f"{self.path.name} has no {name}")
+        return self.entries[name].decode("utf-8")
+
+    def set_text(self, name: str, value: str) -> None:
+        self.set_bytes(name, value.encode("utf-8"))
+
+    def set_bytes(self, name: str, value: bytes) -> None:
+        if name not in self.entries:
+            self.infos.append(zipfile.ZipInfo(name, date_time=self.infos[0].date_time))
+        self.entries[name] = value
+
+    def write(self, output_path: Path) -> None:
+        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for info in self.infos:
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, self.entries[info.filename])
+
+
+class _Merger:
+    def __init__(self, base: _Package, base_body: str) -> None:
+        self.base = base
+        self.relationships = base.text(DOCUMENT_RELS)
+        self.next_relationship = 1 + max(
+            (int(m.group(1)) for m in re.finditer(r'\bId="rId(\d+)"', self.relationships)), default=0
+        )
+        self.new_relationships: list[str] = []
+        self.numbering = base.text(NUMBERING_PART) if base.has(NUMBERING_PART) else None
+        self.next_abstract_num = 1 + _max_id(re.compile(r'w:abstractNumId="(\d+)"'), self.numbering or "")
+        self.next_num = 1 + _max_id(re.compile(r'w:numId="(\d+)"'), self.numbering or "")
+        self.new_abstract_nums: list[str] = []
+        self.new_nums: list[str] = []
+        self.footnotes = base.text(FOOTNOTES_PART) if base.has(FOOTNOTES_PART) else None
+        self.next_footnote = 1 + _max_id(re.compile(r'<w:footnote\b[^>]*?\bw:id="(\d+)"'), self.footnotes or "")
+        self.new_footnotes: list[str] = []
+        self.styles = base.text(STYLES_PART) if base.has(STYLES_PART) else None
+        self.style_ids = {m.group(1) for m in STYLE_RE.finditer(self.styles or "")}
+        self.new_styles: list[str] = []
+        self.content_types = base.text(CONTENT_TYPES)
+        self.type_defaults = {m.group(1).lower() for m in DEFAULT_TYPE_RE.finditer(self.content_types)}
+        self.new_types: list[str] = []
+        self.next_bookmark = 1 + _max_id(BOOKMARK_ID_RE, base_body, default=-1)
+        self.next_drawing = 1 + _max_id(DRAWING_ID_RE, base_body)
+
+    def add(self, index: int, part: _Package, body: str) -> str:
+        """Copy what ``body`` references out of ``part`` and return the body with remapped ids."""
+        relationships = {}
+        for tag in RELATIONSHIP_RE.finditer(part.text(DOCUMENT_RELS)):
+            attrs = dict(ATTRIBUTE_RE.findall(tag.group(0)))
+            relationships[attrs.get("Id", "")] = attrs
+        relationship_map: dict[str, str] = {}
+        num_map = self._merge_numbering(part, body)
+        note_map = self._merge_footnotes(part, body)
+        self._merge_styles(part)
+        self._merge_type_defaults(part)
+        overrides = {
+            m.group(1): m.group(0) for m in OVERRIDE_TYPE_RE.finditer(part.text(CONTENT_TYPES))
+        }
+        bookmark_offset = self.next_bookmark
+        drawing_offset = self.next_drawing
+
+        def remap(match: re.Match[str]) -> str:
+            if match.group("rel"):
+                old = match.group("rel_id")
+                if old not in relationship_map:
+                    copied = self._copy_relationship(index, part, relationships.get(old), overrides)
+                    relationship_map[old] = copied or old
+                return match.group("rel") + relationship_map[old]
+            if match.group("num"):
+                old_num = match.group("num_id")
+                return match.group("num") + num_map.get(old_num, old_num)
+            if match.group("note"):
+                old_note = match.group("note_id")
+                return match.group("note") + note_map.get(old_note, old_note)
+            if match.group("mark"):
+                new_id = bookmark_offset + int(match.group("mark_id"))
+                self.next_bookmark = max(self.next_bookmark, new_id + 1)
+                return match.group("mark") + str(new_id)
+            new_id = drawing_offset + int(match.group("drawing_id"))
+            self.next_drawing = max(self.next_drawing, new_id + 1)
+            return match.group("drawing") + str(new_id)
+
+        return BODY_REFERENCE_RE.sub(remap, body)
+
+    def _copy_relationship(
+        self, index: int, part: _Package, attrs: dict[str, str] | None, overrides: dict[str, str]
+    ) -> str | None:
+        if attrs is None:
+            return None
+        new_id = f"rId{self.next_relationship}"
+        self.next_relationship += 1
+        target = attrs.get("Target", "")
+        if attrs.get("TargetMode") != "External":
+            source = _part_name(target)
+            if not part.has(source):
+                raise DocxMergeError(f"{part.path.name} references missing {source}")
+            directory, name = posixpath.split(target)
+            target = posixpath.join(directory, f"part{index}-{name}")
+            destination = _part_name(target)
+            self.base.set_bytes(destination, part.entries[source])
+            override = overrides.get(f"/{source}")
+            if override is not None:
+                self.new_types.append(override.replace(f'"/{source}"', f'"/{destination}"'))
+        extra = ' TargetMode="External"' if attrs.get("TargetMode") == "External" else ""
+        self.new_relationships.append(
+            f'<Relationship Id="{new_id}" Type="{attrs.get("Type", "")}" Target="{target}"{extra}/>'
+        )
+        return new_id
+
+    def _merge_numbering(self, part: _Package, body: str) -> dict[str, str]:
+        if "<w:numId " not in body or not part.has(NUMBERING_PART):
+            return {}
+        if self.numbering is None:
+            raise DocxMergeError(f"{part.path.name} uses list numbering but the first part has no {NUMBERING_PART}")
+        numbering = part.text(NUMBERING_PART)
+        abstract_map: dict[str, str] = {}
+        for match in ABSTRACT_NUM_RE.finditer(numbering):
+            abstract_map[match.group(1)] = str(self.next_abstract_num)
+            old_id, new_id = f'w:abstractNumId="{match.group(1)}"', f'w:abstractNumId="{self.next_abstract_num}"'
+            self.new_abstract_nums.append(match.group(0).replace(old_id, new_id, 1))
+            self.next_abstract_num += 1
+        num_map: dict[str, str] = {"0": "0"}
+        for match in NUM_RE.finditer(numbering):
+            num_map[match.group(1)] = str(self.next_num)
+            element = match.group(0).replace(f'w:numId="{match.group(1)}"', f'w:numId="{self.next_num}"', 1)
+            element = re.sub(
+                r'(<w:abstractNumId w:val=")(\d+)',
+                lambda m: m.group(1) + abstract_map.get(m.group(2), m.group(2)),
+                element,
+            )
+            self.new_nums.append(element)
+            self.next_num += 1
+        return num_map
+
+    def _merge_footnotes(self, part: _Package, body: str) -> dict[str, str]:
+        if "<w:footnoteReference" not in body or not part.has(FOOTNOTES_PART):
+            return {}
+        if self.footnotes is None:
+            raise DocxMergeError(f"{part.path.name} has footnotes but the first part has no {FOOTNOTES_PART}")
+        note_map: dict[str, str] = {}
+        for match in FOOTNOTE_RE.finditer(part.text(FOOTNOTES_PART)):
+            attrs = dict(ATTRIBUTE_RE.findall(match.group(1)))
+            if attrs.get("w:type", "normal") != "normal" or "w:id" not in attrs:
+                continue  # separators are shared
+            note_map[attrs["w:id"]] = str(self.next_footnote)
+            self.new_footnotes.append(
+                match.group(0).replace(f'w:id="{attrs["w:id"]}"', f'w:id="{self.next_footnote}"', 1)
+            )
+            self.next_footnote += 1
+        return note_map
+
+    def _merge_styles(self, part: _Package) -> None:
+        if self.styles is None or not part.has(STYLES_PART):
+            return
+        for match in STYLE_RE.finditer(part.text(STYLES_PART)):
+            if match.group(1) not in self.style_ids:
+                self.style_ids.add(match.group(1))
+                self.new_styles.append(match.group(0))
+
+    def _merge_type_defaults(self, part: _Package) -> None:
+        for match in DEFAULT_TYPE_RE.finditer(part.text(CONTENT_TYPES)):
+            if match.group(1).lower() not in self.type_defaults:
+                self.type_defaults.add(match.group(1).lower())
+                self.new_types.append(match.group(0))
+
+    def finish(self) -> None:
+        """Write the collected relationships, numbering, footnotes, styles and content types into the base."""
+        if self.new_relationships:
+            relationships = _insert_before(self.relationships, "</Relationships>", self.new_relationships)
+            self.base.set_text(DOCUMENT_RELS, relationships)
+        if self.numbering is not None and self.new_nums:
+            numbering = self.numbering
+            # Schema order: every abstractNum precedes every num.
+            first_num = NUM_RE.search(numbering)
+            anchor = first_num.start() if first_num else numbering.rfind("</w:numbering>")
+            numbering = numbering[:anchor] + "".join(self.new_abstract_nums) + numbering[anchor:]
+            anchor_tag = "<w:numIdMacAtCleanup" if "<w:numIdMacAtCleanup" in numbering else "</w:numbering>"
+            numbering = _insert_before(numbering, anchor_tag, self.new_nums)
+            self.base.set_text(NUMBERING_PART, numbering)
+        if self.footnotes is not None and self.new_footnotes:
+            self.base.set_text(FOOTNOTES_PART, _insert_before(self.footnotes, "</w:footnotes>", self.new_footnotes))
+        if self.styles is not None and self.new_styles:
+            self.base.set_text(STYLES_PART, _insert_before(self.styles, "</w:styles>", self.new_styles))
+        if self.new_types:
+            self.base.set_text(CONTENT_TYPES, _insert_before(self.content_types, "</Types>", self.new_types))
+
+
+def _part_name(target: str) -> str:
+    """Package part name of a relationship target of word/document.xml."""
+    return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("word", target))
+
+
+def _insert_before(text: str, anchor: str, elements: list[str]) -> str:
+    position = text.rfind(anchor) if anchor.startswith("</") else text.find(anchor)
+    if position == -1:
+        raise DocxMergeError(f"missing {anchor} in merged part")
+    return text[:position] + "".join(elements) + text[position:]
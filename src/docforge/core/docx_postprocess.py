@@ -0,0 +1,505 @@
+from __future__ import annotations
+
+import codecs
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+from xml.sax.saxutils import escape
+
+from docforge.core.docx_merge import ATTRIBUTE_RE, CONTENT_TYPES, DOCUMENT_PART, DOCUMENT_RELS, STYLE_RE, STYLES_PART
+
+# Bumped whenever the edits change, so outputs made by an older post-processor are rebuilt.
+POSTPROCESS_VERSION = "1"
+CHUNK_SIZE = 1 << 20
+# Media that deflate cannot shrink; copied as stored entries instead of being compressed again.
+PRECOMPRESSED_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif"}
+# Values up to this are multiples of single spacing (1.5), larger ones points (28).
+MAX_LINE_MULTIPLE = 5.0
+PLACEHOLDERS = ("page", "pages", "title")
+
+PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+WORDML_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+PART_TYPES = {
+    "header": (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml",
+        f"{RELATIONSHIPS_NS}/header",
+    ),
+    "footer": (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.footer+xml",
+        f"{RELATIONSHIPS_NS}/footer",
+    ),
+}
+
+# A complete start, end or empty tag; quoted attribute values may contain ``>``.
+TAG_RE = re.compile(r"""<(/?)([A-Za-z_][\w:.-]*)(?:[^>"']|"[^"]*"|'[^']*')*?(/?)>""")
+HEADING1_RE = re.compile(r'\s*<w:p\b[^>]*>\s*<w:pPr>\s*<w:pStyle w:val="Heading1"\s*/>')
+TOC_GALLERY = 'w:docPartGallery w:val="Table of Contents"'
+TOC_HEADING_RE = re.compile(r'(<w:pStyle w:val=")TOCHeading("\s*/>)')
+SECT_PR_RE = re.compile(r"\s*<w:sectPr\b[^>]*?(/?)>")
+STYLES_OPEN_RE = re.compile(r"<w:styles\b[^>]*>")
+PLACEHOLDER_RE = re.compile(r"\{(" + "|".join(PLACEHOLDERS) + r")\}")
+# Elements of a paragraph's properties that come after w:spacing in the schema.
+AFTER_SPACING_RE = re.compile(
+    r"<w:(?:ind|contextualSpacing|mirrorIndents|suppressOverlap|jc|textDirection|textAlignment|"
+    r"textboxTightWrap|outlineLvl|divId|cnfStyle|rPr|sectPr|pPrChange)\b"
+)
+
+
+class DocxPostprocessError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class HeaderFooterProfile:
+    """Header and footer text of a ``header_footer_profiles`` entry.
+
+    ``{page}``, ``{pages}`` and ``{title}`` become the page number, the page
+    count and the document title; an empty text adds no part.
+    """
+
+    name: str
+    header: str = ""
+    footer: str = ""
+    align: str = "center"
+
+    @classmethod
+    def from_config(cls, name: str, config: dict[str, Any]) -> "HeaderFooterProfile":
+        profiles = config.get("header_footer_profiles")
+        entry = profiles.get(name) if isinstance(profiles, dict) else None
+        if not isinstance(entry, dict):
+            raise DocxPostprocessError(f"Unknown header_footer_profile '{name}'")
+        align = str(entry.get("align") or "center").strip().lower()
+        if align not in {"left", "center", "right"}:
+            raise DocxPostprocessError(f"Invalid align '{align}' in header_footer_profile '{name}'")
+        header, footer = str(entry.get("header") or ""), str(entry.get("footer") or "")
+        return cls(name=name, header=header, footer=footer, align=align)
+
+
+@dataclass(frozen=True)
+class DocxProfile:
+    """What the post-processor does to one build's DOCX.
+
+    ``page_break_h1`` puts every H1 but the first on a new page,
+    ``toc_enabled`` keeps the table of contents on its own page, and the
+    template fields set the default font, the line spacing, the style of the
+    contents title and the header and footer.
+    """
+
+    page_break_h1: bool = True
+    toc_enabled: bool = True
+    default_font: str = ""
+    line_spacing: float | None = None
+    toc_style: str = ""
+    header_footer: HeaderFooterProfile | None = None
+
+    @classmethod
+    def from_config(
+        cls, template_cfg: dict[str, Any], config: dict[str, Any], page_break_h1: bool, toc_enabled: bool
+    ) -> "DocxProfile":
+        """The profile of a ``templates`` entry; raises ``DocxPostprocessError`` for invalid fields."""
+        raw_spacing = template_cfg.get("line_spacing")
+        line_spacing: float | None = None
+        if raw_spacing not in (None, ""):
+            try:
+                line_spacing = float(raw_spacing)
+            except (TypeError, ValueError):
+                raise DocxPostprocessError(f"Invalid line_spacing '{raw_spacing}'") from None
+            if line_spacing <= 0:
+                raise DocxPostprocessError(f"Invalid line_spacing '{raw_spacing}'")
+        profile_name = str(template_cfg.get("header_footer_profile") or "").strip()
+        return cls(
+            page_break_h1=page_break_h1,
+            toc_enabled=toc_enabled,
+            default_font=str(template_cfg.get("default_font") or "").strip(),
+            line_spacing=line_spacing,
+            toc_style=str(template_cfg.get("toc_style") or "").strip(),
+            header_footer=HeaderFooterProfile.from_config(profile_name, config) if profile_name else None,
+        )
+
+    def settings(self) -> dict[str, Any]:
+        """Part of the build fingerprint: changing any of these rebuilds the output."""
+        header_footer = self.header_footer
+        return {
+            "version": POSTPROCESS_VERSION,
+            "default_font": self.default_font,
+            "line_spacing": self.line_spacing,
+            "toc_style": self.toc_style,
+            "header_footer": header_footer.__dict__ if header_footer is not None else None,
+        }
+
+
+@dataclass
+class PostprocessReport:
+    page_breaks: int = 0
+    toc_isolated: bool = False
+    styles: list[str] = field(default_factory=list)
+    parts: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "page_breaks": self.page_breaks,
+            "toc_isolated": self.toc_isolated,
+            "styles": self.styles,
+            "parts": self.parts,
+        }
+
+
+def postprocess_docx(path: Path, profile: DocxProfile, title: str = "") -> PostprocessReport:
+    """Apply ``profile`` to the DOCX at ``path`` in one streaming pass and replace it.
+
+    ``word/document.xml`` is tokenized incrementally and written back one
+    top-level body block at a time, so memory stays at one block however
+    large the document is. The small styles, relationships and content-type
+    parts are rewritten in memory. Every other entry is streamed across
+    (decompressed and compressed again, since ``zipfile`` cannot copy raw
+    entries); already-compressed media (PNG, JPEG, GIF) is stored without
+    deflating it a second time. The result is written next to ``path`` and
+    swapped in atomically.
+    """
+    try:
+        source = zipfile.ZipFile(path)
+    except (OSError, zipfile.BadZipFile) as exc:
+        raise DocxPostprocessError(f"cannot read {path}: {exc}") from exc
+    report = PostprocessReport()
+    fd, temp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    os.close(fd)
+    try:
+        with source, zipfile.ZipFile(temp_name, "w", zipfile.ZIP_DEFLATED) as target:
+            names = set(source.namelist())
+            if DOCUMENT_PART not in names:
+                raise DocxPostprocessError(f"{path.name} has no {DOCUMENT_PART}")
+            editor = _PackageEditor(source, profile, title, report)
+            for info in source.infolist():
+                if info.filename == DOCUMENT_PART:
+                    with source.open(info) as reader, target.open(_copy_info(info), "w", force_zip64=True) as writer:
+                        for piece in editor.document(reader):
+                            writer.write(piece.encode("utf-8"))
+                elif info.filename in editor.edited:
+                    target.writestr(_copy_info(info), editor.edited[info.filename])
+                else:
+                    copy = _copy_info(info)
+                    if Path(info.filename).suffix.lower() in PRECOMPRESSED_SUFFIXES:
+                        copy.compress_type = zipfile.ZIP_STORED
+                    with source.open(info) as reader, target.open(copy, "w", force_zip64=True) as writer:
+                        shutil.copyfileobj(reader, writer, CHUNK_SIZE)
+            for name, data in editor.added.items():
+                if name in names:
+                    raise DocxPostprocessError(f"{path.name} already has {name}")
+                target.writestr(zipfile.ZipInfo(name, date_time=source.infolist()[0].date_time), data)
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+    return report
+
+
+def iter_body_blocks(chunks: Iterator[str]) -> Iterator[tuple[str, str]]:
+    """Split streamed ``word/document.xml`` text into ``(kind, text)`` pieces.
+
+    ``head`` is everything up to and including ``<w:body>``, each ``block`` a
+    top-level body element with the whitespace before it, and ``tail`` the
+    rest. Only the current block is buffered.
+    """
+    # Scanned text of the current piece is collected in ``parts`` and joined once per piece;
+    # ``buffer`` only holds the new chunk plus a tag left incomplete at the end of the previous one.
+    parts: list[str] = []
+    buffer = ""
+    depth = 0
+    in_body = False
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        start = 0
+        while True:
+            match = TAG_RE.search(buffer, pos)
+            if match is None:
+                break
+            pos = match.end()
+            closing, name, empty = match.group(1), match.group(2), match.group(3)
+            if not in_body:
+                if name == "w:body" and not closing:
+                    in_body = True
+                    parts.append(buffer[start:pos])
+                    yield "head", "".join(parts)
+                    parts = []
+                    start = pos
+                continue
+            if closing and name == "w:body" and depth == 0:
+                parts.append(buffer[start:])
+                yield "tail", "".join(parts) + "".join(chunks)
+                return
+            if closing:
+                depth -= 1
+            elif not empty:
+                depth += 1
+            if depth == 0:
+                parts.append(buffer[start:pos])
+                yield "block", "".join(parts)
+                parts = []
+                start = pos
+        partial = buffer.rfind("<", pos)
+        keep = len(buffer) if partial == -1 else partial
+        parts.append(buffer[start:keep])
+        buffer = buffer[keep:]
+    raise DocxPostprocessError(f"{DOCUMENT_PART} has no complete body")
+
+
+class _PackageEditor:
+    """The edits of one ``postprocess_docx`` run; ``edited`` holds the rewritten small parts."""
+
+    def __init__(self, source: zipfile.ZipFile, profile: DocxProfile, title: str, report: PostprocessReport) -> None:
+        self.source = source
+        self.profile = profile
+        self.title = title
+        self.report = report
+        self.edited: dict[str, bytes] = {}
+        self.new_parts: dict[str, str] = {}  # "header"/"footer" -> relationship id
+        self.styles = self._read(STYLES_PART)
+        if self.styles is not None:
+            styles = self._edit_styles(self.styles)
+            if styles != self.styles:
+                self.edited[STYLES_PART] = styles.encode("utf-8")
+        self.added: dict[str, bytes] = {}
+        if profile.header_footer is not None:
+            self._add_header_footer(profile.header_footer)
+
+    def _read(self, name: str) -> str | None:
+        try:
+            return self.source.read(name).decode("utf-8")
+        except KeyError:
+            return None
+
+    def document(self, reader: Any) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+
+        def chunks() -> Iterator[str]:
+            while True:
+                data = reader.read(CHUNK_SIZE)
+                if not data:
+                    tail = decoder.decode(b"", final=True)
+                    if tail:
+                        yield tail
+                    return
+                yield decoder.decode(data)
+
+        seen_h1 = 0
+        toc_pending = self.profile.toc_enabled
+        for kind, text in iter_body_blocks(chunks()):
+            if kind != "block":
+                yield text
+                continue
+            if self.profile.page_break_h1 and HEADING1_RE.match(text):
+                seen_h1 += 1
+                # The first H1 follows the title page or the contents, which already end a page.
+                if seen_h1 > 1:
+                    self.report.page_breaks += 1
+                    yield PAGE_BREAK
+            elif toc_pending and text.lstrip().startswith("<w:sdt") and TOC_GALLERY in text:
+                toc_pending = False
+                self.report.toc_isolated = True
+                if self.profile.toc_style:
+                    style_id = _attribute(self.profile.toc_style)
+                    text = TOC_HEADING_RE.sub(lambda m: m.group(1) + style_id + m.group(2), text, count=1)
+                yield text + PAGE_BREAK
+                continue
+            elif self.new_parts and SECT_PR_RE.match(text):
+                text = self._reference_parts(text)
+            yield text
+
+    def _reference_parts(self, sect_pr: str) -> str:
+        """The body's section properties with references to the new header and footer parts."""
+        references = "".join(
+            f'<w:{kind}Reference xmlns:r="{RELATIONSHIPS_NS}" w:type="default" r:id="{relationship_id}"/>'
+            for kind, relationship_id in self.new_parts.items()
+        )
+        match = SECT_PR_RE.match(sect_pr)
+        assert match is not None
+        if match.group(1):  # <w:sectPr/>
+            return sect_pr[: match.start(1)].rstrip() + ">" + references + "</w:sectPr>"
+        return sect_pr[: match.end()] + references + sect_pr[match.end() :]
+
+    def _add_header_footer(self, header_footer: HeaderFooterProfile) -> None:
+        """Prepare the profile's header and footer parts and register them in the relationships and content types.
+
+        A reference document with a header (or footer) of its own keeps it.
+        """
+        relationships = self._read(DOCUMENT_RELS)
+        content_types = self._read(CONTENT_TYPES)
+        if relationships is None or content_types is None:
+            raise DocxPostprocessError(f"DOCX package has no {DOCUMENT_RELS} or {CONTENT_TYPES}")
+        next_id = 1 + max((int(m.group(1)) for m in re.finditer(r'\bId="rId(\d+)"', relationships)), default=0)
+        new_relationships = []
+        new_types = []
+        for kind, text in (("header", header_footer.header), ("footer", header_footer.footer)):
+            content_type, relationship_type = PART_TYPES[kind]
+            if not text or f'Type="{relationship_type}"' in relationships:
+                continue
+            name = f"docforge_{kind}.xml"
+            relationship_id = f"rId{next_id}"
+            next_id += 1
+            self.new_parts[kind] = relationship_id
+            self.added[f"word/{name}"] = self._header_footer_xml(kind, text, header_footer.align).encode("utf-8")
+            new_relationships.append(
+                f'<Relationship Id="{relationship_id}" Type="{relationship_type}" Target="{name}"/>'
+            )
+            new_types.append(f'<Override PartName="/word/{name}" ContentType="{content_type}"/>')
+            self.report.parts.append(kind)
+        if new_relationships:
+            relationships = _append_children(relationships, "Relationships", new_relationships)
+            self.edited[DOCUMENT_RELS] = relationships.encode("utf-8")
+            self.edited[CONTENT_TYPES] = _append_children(content_types, "Types", new_types).encode("utf-8")
+
+    def _header_footer_xml(self, kind: str, text: str, align: str) -> str:
+        runs = []
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(text):
+            runs.append(_text_run(text[position : match.start()]))
+            if match.group(1) == "title":
+                runs.append(_text_run(self.title))
+            else:
+                instruction = "PAGE" if match.group(1) == "page" else "NUMPAGES"
+                runs.append(f'<w:fldSimple w:instr=" {instruction} "><w:r><w:t>1</w:t></w:r></w:fldSimple>')
+            position = match.end()
+        runs.append(_text_run(text[position:]))
+        root = "w:hdr" if kind == "header" else "w:ftr"
+        style = "Header" if kind == "header" else "Footer"
+        style_ref = f'<w:pStyle w:val="{style}"/>' if style in self._style_ids_of(self.styles or "") else ""
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<{root} xmlns:w="{WORDML_NS}" xmlns:r="{RELATIONSHIPS_NS}">'
+            f'<w:p><w:pPr>{style_ref}<w:jc w:val="{align}"/></w:pPr>{"".join(runs)}</w:p></{root}>'
+        )
+
+    def _edit_styles(self, styles: str) -> str:
+        profile = self.profile
+        if profile.default_font:
+            font = _attribute(profile.default_font)
+            fonts = f'<w:rFonts w:ascii="{font}" w:hAnsi="{font}" w:eastAsia="{font}" w:cs="{font}"/>'
+            styles = _set_default(styles, "rPr", "rFonts", fonts)
+            styles = _set_default_style_fonts(styles, fonts)
+            self.report.styles.append("default_font")
+        if profile.line_spacing is not None:
+            if profile.line_spacing <= MAX_LINE_MULTIPLE:
+                line, rule = round(profile.line_spacing * 240), "auto"
+            else:
+                # "atLeast" rather than "exact": exact spacing clips inline images such as diagrams.
+                line, rule = round(profile.line_spacing * 20), "atLeast"
+            styles = _set_default(styles, "pPr", "spacing", {"w:line": str(line), "w:lineRule": rule})
+            self.report.styles.append("line_spacing")
+        style_id = _attribute(profile.toc_style)
+        if profile.toc_enabled and profile.toc_style and style_id not in self._style_ids_of(styles):
+            styles = _append_children(
+                styles,
+                "w:styles",
+                [
+                    f'<w:style w:type="paragraph" w:customStyle="1" w:styleId="{style_id}">'
+                    f'<w:name w:val="{style_id}"/><w:basedOn w:val="TOCHeading"/><w:next w:val="Normal"/>'
+                    "<w:qFormat/></w:style>"
+                ],
+            )
+            self.report.styles.append("toc_style")
+        return styles
+
+    @staticmethod
+    def _style_ids_of(styles: str) -> set[str]:
+        return {m.group(1) for m in STYLE_RE.finditer(styles)}
+
+
+def _copy_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    copy = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    copy.compress_type = info.compress_type
+    copy.external_attr = info.external_attr
+    return copy
+
+
+def _attribute(value: str) -> str:
+    """``value`` escaped for a double-quoted XML attribute."""
+    return escape(value, {'"': "&quot;"})
+
+
+def _text_run(text: str) -> str:
+    if not text:
+        return ""
+    return f'<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r>'
+
+
+def _append_children(text: str, root: str, elements: list[str]) -> str:
+    """``text`` with ``elements`` appended to its ``root`` element, which may be empty (``<Relationships/>``)."""
+    position = text.rfind(f"</{root}>")
+    if position != -1:
+        return text[:position] + "".join(elements) + text[position:]
+    empty = re.search(rf"<{re.escape(root)}\b[^>]*?/>", text)
+    if empty is None:
+        raise DocxPostprocessError(f"missing <{root}> element")
+    opening = text[: empty.end() - 2].rstrip() + ">"
+    return opening + "".join(elements) + f"</{root}>" + text[empty.end() :]
+
+
+def _set_default(styles: str, props: str, element: str, value: str | dict[str, str]) -> str:
+    """``styles`` with ``element`` of the ``docDefaults`` run (``rPr``) or paragraph (``pPr``) properties set.
+
+    A string ``value`` replaces the element; a dict updates its attributes.
+    Missing ``docDefaults``, ``rPrDefault``/``pPrDefault`` and property
+    elements are created.
+    """
+    default = f"{props}Default"
+    block = re.search(rf"<w:{default}>.*?</w:{default}>|<w:{default}/>", styles, re.DOTALL)
+    if block is None:
+        defaults = re.search(r"<w:docDefaults>.*?</w:docDefaults>|<w:docDefaults/>", styles, re.DOTALL)
+        fresh = f"<w:{default}><w:{props}></w:{props}></w:{default}>"
+        if defaults is None:
+            opening = STYLES_OPEN_RE.search(styles)
+            if opening is None:
+                raise DocxPostprocessError(f"{STYLES_PART} has no w:styles element")
+            styles = styles[: opening.end()] + f"<w:docDefaults>{fresh}</w:docDefaults>" + styles[opening.end() :]
+        elif defaults.group(0) == "<w:docDefaults/>":
+            styles = styles[: defaults.start()] + f"<w:docDefaults>{fresh}</w:docDefaults>" + styles[defaults.end() :]
+        else:
+            # rPrDefault comes first in docDefaults, pPrDefault second.
+            if props == "rPr":
+                at = defaults.start() + len("<w:docDefaults>")
+            else:
+                at = defaults.end() - len("</w:docDefaults>")
+            styles = styles[:at] + fresh + styles[at:]
+        block = re.search(rf"<w:{default}>.*?</w:{default}>", styles, re.DOTALL)
+        assert block is not None
+    inner = block.group(0)
+    if inner == f"<w:{default}/>" or f"<w:{props}>" not in inner and f"<w:{props}/>" not in inner:
+        inner = f"<w:{default}><w:{props}></w:{props}></w:{default}>"
+    inner = inner.replace(f"<w:{props}/>", f"<w:{props}></w:{props}>")
+    return styles[: block.start()] + _set_property(inner, props, element, value) + styles[block.end() :]
+
+
+def _set_property(container: str, props: str, element: str, value: str | dict[str, str]) -> str:
+    existing = re.search(rf"<w:{element}\b[^>]*?/>", container)
+    if isinstance(value, dict):
+        attrs = dict(ATTRIBUTE_RE.findall(existing.group(0))) if existing else {}
+        attrs.update(value)
+        value = f"<w:{element} " + " ".join(f'{k}="{v}"' for k, v in attrs.items()) + "/>"
+    if existing is not None:
+        return container[: existing.start()] + value + container[existing.end() :]
+    start = container.index(f"<w:{props}>") + len(f"<w:{props}>")
+    end = container.index(f"</w:{props}>")
+    if element == "spacing":
+        later = AFTER_SPACING_RE.search(container, start, end)
+        at = later.start() if later else end
+    else:
+        at = start  # rFonts is the first run property
+    return container[:at] + value + container[at:]
+
+
+def _set_default_style_fonts(styles: str, fonts: str) -> str:
+    """The default paragraph style's own fonts, when it sets any, would hide the document default."""
+    for match in STYLE_RE.finditer(styles):
+        style = match.group(0)
+        opening = style[: style.index(">") + 1]
+        if 'w:type="paragraph"' in opening and re.search(r'w:default="(?:1|true|on)"', opening):
+            updated = re.sub(r"<w:rFonts\b[^>]*?/>", lambda _: fonts, style, count=1)
+            return styles[: match.start()] + updated + styles[match.end() :]
+    return styles
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import errno
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+if os.name == "nt":  # pragma: no cover - exercised on Windows hosts only
+    import msvcrt
+else:
+    import fcntl
+
+_THREAD_LOCKS: dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+# msvcrt's blocking mode gives up after ~10 s; a render lock is held for a whole render, so poll instead.
+WINDOWS_LOCK_POLL_SECONDS = 0.05
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Exclusive lock on ``path`` across threads and processes; the file is created if missing.
+
+    ``flock``/``msvcrt.locking`` coordinate processes, a per-path thread lock
+    coordinates threads of this process (Windows byte-range locks are not
+    reliable between handles of one process). Both wait without a time limit.
+    The lock file is never deleted, so there is no window where two holders
+    lock different inodes.
+    """
+    key = os.path.abspath(path)
+    with _THREAD_LOCKS_GUARD:
+        thread_lock = _THREAD_LOCKS.setdefault(key, threading.Lock())
+    with thread_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.name == "nt":  # pragma: no cover
+                _lock_windows(fd)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == "nt":  # pragma: no cover
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+def _lock_windows(fd: int) -> None:  # pragma: no cover - Windows only
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return
+        except OSError as exc:
+            if exc.errno not in (errno.EACCES, errno.EDEADLK):
+                raise
+        time.sleep(WINDOWS_LOCK_POLL_SECONDS)
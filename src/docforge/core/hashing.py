@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+from pathlib import Path
+
+READ_CHUNK_BYTES = 1024 * 1024
+MMAP_MIN_BYTES = 8 * 1024 * 1024
+
+
+def sha256_file(path: Path) -> str:
+    """SHA-256 of a file: mapped into memory when large, otherwise read in 1 MiB chunks into one reused buffer."""
+    h = hashlib.sha256()
+    with path.open("rb") as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if size >= MMAP_MIN_BYTES:
+            try:
+                with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    h.update(mapped)
+                return h.hexdigest()
+            except (OSError, ValueError):  # e.g. file systems that cannot map; fall back to reads
+                fh.seek(0)
+                h = hashlib.sha256()
+        buffer = bytearray(READ_CHUNK_BYTES)
+        view = memoryview(buffer)
+        while True:
+            read = fh.readinto(buffer)
+            if not read:
+                break
+            h.update(view[:read])
+    return h.hexdigest()
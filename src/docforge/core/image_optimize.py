@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+from docforge.core.hashing import sha256_file
+from docforge.core.markdown_scan import FENCE_RE, iter_lines
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: pip install "docforge[images]"
+    Image = None
+    ImageOps = None
+
+IMAGE_RE = re.compile(r'!\[(?P<alt>[^\]\n]*)\]\(\s*(?P<target><[^>\n]+>|[^\s)]+)(?P<title>\s+"[^"\n]*")?\s*\)')
+OPTIMIZABLE_SUFFIXES = {".png", ".jpg", ".jpeg"}
+DEFAULT_MAX_DPI = 220.0
+DEFAULT_PAGE_WIDTH_INCHES = 6.5
+DEFAULT_JPEG_QUALITY = 85
+DEFAULT_WORKERS = 4
+# pandoc's assumption for images without density information.
+PANDOC_DEFAULT_DPI = 96.0
+# Distinct colours above which an opaque PNG counts as a photo for ``photos_to_jpeg``.
+PHOTO_MIN_COLORS = 4096
+CACHE_SCHEMA_VERSION = "1"
+KEEP_SUFFIX = ".keep"
+
+
+class ImageOptimizeError(Exception):
+    pass
+
+
+@dataclass
+class ImageReport:
+    """What the stage did to one document; written to ``build_meta.json`` under ``images``."""
+
+    references: int = 0
+    images: int = 0
+    optimized: int = 0
+    deduplicated: int = 0
+    cache_hits: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    # "<file>: <reason>" for images embedded as is because optimizing them failed.
+    failures: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        saved = self.bytes_before - self.bytes_after
+        return {
+            "references": self.references,
+            "images": self.images,
+            "optimized": self.optimized,
+            "deduplicated": self.deduplicated,
+            "cache_hits": self.cache_hits,
+            "failed": len(self.failures),
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "saved_bytes": saved,
+            "saved_ratio": round(saved / self.bytes_before, 4) if self.bytes_before else None,
+        }
+
+
+@dataclass(frozen=True)
+class _Optimized:
+    path: Path
+    size: int
+    optimized: bool
+    cache_hit: bool
+    error: str | None = None
+
+
+@dataclass(frozen=True)
+class ImageOptimizer:
+    """Shrinks the local PNG/JPEG images a document references before pandoc embeds them.
+
+    Images wider than ``max_dpi`` at their displayed size (capped at the page
+    width) are downscaled, with their density metadata adjusted so the size in
+    the document does not change. PNGs are recompressed losslessly and,
+    with ``photos_to_jpeg``, opaque many-colour PNGs become JPEGs. References
+    to identical files share one copy. Results live in ``cache_dir`` keyed by
+    content hash and settings; when optimizing does not make a file smaller
+    the original is used.
+    """
+
+    cache_dir: Path
+    max_dpi: float = DEFAULT_MAX_DPI
+    page_width_in: float = DEFAULT_PAGE_WIDTH_INCHES
+    photos_to_jpeg: bool = False
+    jpeg_quality: int = DEFAULT_JPEG_QUALITY
+    workers: int = DEFAULT_WORKERS
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any], base_dir: Path) -> "ImageOptimizer | None":
+        """The optimizer ``images.optimize: true`` asks for, or None.
+
+        Raises ``ImageOptimizeError`` when the stage is enabled but Pillow is not installed.
+        """
+        images_cfg = config.get("images") if isinstance(config, dict) else None
+        if not isinstance(images_cfg, dict) or images_cfg.get("optimize") is not True:
+            return None
+        if Image is None:
+            raise ImageOptimizeError("images.optimize is enabled but Pillow is not installed")
+        cache_dir = Path(str(images_cfg.get("cache_dir") or ".cache/images")).expanduser()
+        if not cache_dir.is_absolute():
+            cache_dir = base_dir / cache_dir
+        try:
+            return cls(
+                cache_dir=cache_dir.resolve(),
+                max_dpi=float(images_cfg.get("max_dpi") or DEFAULT_MAX_DPI),
+                page_width_in=float(images_cfg.get("page_width_in") or DEFAULT_PAGE_WIDTH_INCHES),
+                photos_to_jpeg=images_cfg.get("photos_to_jpeg") is True,
+                jpeg_quality=int(images_cfg.get("jpeg_quality") or DEFAULT_JPEG_QUALITY),
+                workers=max(1, int(images_cfg.get("workers") or DEFAULT_WORKERS)),
+            )
+        except (TypeError, ValueError) as exc:
+            raise ImageOptimizeError(f"invalid images settings: {exc}") from exc
+
+    def settings(self) -> dict[str, Any]:
+        """Everything that changes the optimized bytes; part of the cache key and the build fingerprint."""
+        return {
+            "schema_version": CACHE_SCHEMA_VERSION,
+            "pillow": _pillow_version(),
+            "max_dpi": self.max_dpi,
+            "page_width_in": self.page_width_in,
+            "photos_to_jpeg": self.photos_to_jpeg,
+            "jpeg_quality": self.jpeg_quality,
+        }
+
+    def rewrite(self, markdown_text: str, search_dirs: list[Path]) -> tuple[str, ImageReport]:
+        """Point every local image reference outside fenced code at its optimized copy."""
+        report = ImageReport()
+        if "![" not in markdown_text:
+            return markdown_text, report
+
+        # Pass 1: resolve references and group them by content.
+        sources: dict[str, Path | None] = {}
+        for target in self._targets(markdown_text):
+            if target not in sources:
+                sources[target] = self._resolve(target, search_dirs)
+        by_sha: dict[str, Path] = {}
+        path_sha: dict[Path, str] = {}
+        for path in dict.fromkeys(p for p in sources.values() if p is not None):
+            try:
+                sha = sha256_file(path)
+            except OSError as exc:
+                report.failures.append(f"{path.name}: {exc}")
+                continue
+            path_sha[path] = sha
+            if sha in by_sha:
+                report.deduplicated += 1
+            else:
+                by_sha[sha] = path
+
+        # Pass 2: optimize each distinct image (Pillow releases the GIL while encoding).
+        settings = self.settings()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(by_sha) or 1))) as pool:
+            outcomes = pool.map(lambda item: self._optimize(item[0], item[1], settings), by_sha.items())
+            results = dict(zip(by_sha, outcomes))
+        for sha, result in results.items():
+            report.images += 1
+            report.bytes_before += _size_of(by_sha[sha])
+            report.bytes_after += result.size
+            if result.error is not None:
+                report.failures.append(f"{by_sha[sha].name}: {result.error}")
+            report.optimized += result.optimized
+            report.cache_hits += result.cache_hit
+
+        # Pass 3: substitute.
+        replacements = {
+            target: results[path_sha[path]].path for target, path in sources.items() if path in path_sha
+        }
+
+        def substitute(match: re.Match[str]) -> str:
+            report.references += 1
+            new_path = replacements.get(match.group("target"))
+            if new_path is None:
+                return match.group(0)
+            return f"![{match.group('alt')}]({new_path.as_uri()}{match.group('title') or ''})"
+
+        return self._map_outside_fences(markdown_text, lambda line: IMAGE_RE.sub(substitute, line)), report
+
+    def _targets(self, markdown_text: str) -> list[str]:
+        targets: list[str] = []
+
+        def collect(line: str) -> str:
+            targets.extend(match.group("target") for match in IMAGE_RE.finditer(line))
+            return line
+
+        self._map_outside_fences(markdown_text, collect)
+        return targets
+
+    @staticmethod
+    def _map_outside_fences(markdown_text: str, func: Any) -> str:
+        out: list[str] = []
+        fence: tuple[str, int] | None = None
+        for line in iter_lines(markdown_text):
+            content = line.rstrip("\r\n")
+            match = FENCE_RE.match(content) if content.lstrip(" \t")[:1] in ("`", "~") else None
+            if fence is not None:
+                closing = match and match.group(2)[0] == fence[0] and len(match.group(2)) >= fence[1]
+                if closing and not match.group(3).strip():
+                    fence = None
+                out.append(line)
+            elif match and not (match.group(2)[0] == "`" and "`" in match.group(3)):
+                fence = (match.group(2)[0], len(match.group(2)))
+                out.append(line)
+            else:
+                out.append(func(line) if "![" in line else line)
+        return "".join(out)
+
+    @staticmethod
+    def _resolve(target: str, search_dirs: list[Path]) -> Path | None:
+        """The local file ``target`` names, searched like pandoc's resource path; None for URLs and missing files."""
+        target = target[1:-1] if target.startswith("<") and target.endswith(">") else target
+        parsed = urlparse(target)
+        if parsed.scheme == "file":
+            candidates = [Path(url2pathname(parsed.path))]
+        elif parsed.scheme and len(parsed.scheme) > 1:  # http:, data:, ...; one letter is a Windows drive
+            return None
+        else:
+            names = [target] if unquote(target) == target else [target, unquote(target)]
+            candidates = [Path(name) if Path(name).is_absolute() else d / name for name in names for d in search_dirs]
+        for candidate in candidates:
+            if candidate.suffix.lower() in OPTIMIZABLE_SUFFIXES and candidate.is_file():
+                return candidate.resolve()
+        return None
+
+    def _optimize(self, sha: str, path: Path, settings: dict[str, Any]) -> _Optimized:
+        """The copy to embed for ``path``; the original, with the reason, when resizing, encoding or caching fails."""
+        try:
+            return self._optimize_cached(sha, path, settings)
+        except (OSError, ValueError, MemoryError) as exc:
+            return _Optimized(path, _size_of(path), False, False, error=str(exc) or type(exc).__name__)
+
+    def _optimize_cached(self, sha: str, path: Path, settings: dict[str, Any]) -> _Optimized:
+        original_size = path.stat().st_size
+        key = hashlib.sha256(json.dumps({"sha256": sha, **settings}, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+        for suffix in (".png", ".jpg", KEEP_SUFFIX):
+            cached = self.cache_dir / f"{key}{suffix}"
+            if cached.exists():
+                if suffix == KEEP_SUFFIX:
+                    return _Optimized(path, original_size, False, True)
+                return _Optimized(cached, cached.stat().st_size, True, True)
+
+        encoded = self._encode(path)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if encoded is None or len(encoded[0]) >= original_size:
+            self._write(self.cache_dir / f"{key}{KEEP_SUFFIX}", b"")
+            return _Optimized(path, original_size, False, False)
+        data, suffix = encoded
+        final = self.cache_dir / f"{key}{suffix}"
+        self._write(final, data)
+        return _Optimized(final, len(data), True, False)
+
+    def _encode(self, path: Path) -> tuple[bytes, str] | None:
+        """Optimized bytes and suffix for ``path``, or None when there is nothing worth doing."""
+        try:
+            with Image.open(path) as opened:
+                fmt = opened.format
+                dpi = _density(opened.info.get("dpi"))
+                image = ImageOps.exif_transpose(opened)
+                image.load()
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+
+        shown_in = min(image.width / dpi, self.page_width_in)
+        target_px = max(1, math.ceil(shown_in * self.max_dpi))
+        resized = image.width > target_px
+        if resized:
+            height = max(1, round(image.height * target_px / image.width))
+            image = image.resize((target_px, height), Image.Resampling.LANCZOS)
+            dpi = target_px / shown_in
+
+        buffer = io.BytesIO()
+        if fmt == "JPEG":
+            if not resized:
+                return None  # re-encoding an unscaled JPEG only loses quality
+            image.convert("RGB").save(
+                buffer, "JPEG", quality=self.jpeg_quality, optimize=True, progressive=True, dpi=(dpi, dpi)
+            )
+            return buffer.getvalue(), ".jpg"
+        if self.photos_to_jpeg and _is_photo(image):
+            image.convert("RGB").save(
+                buffer, "JPEG", quality=self.jpeg_quality, optimize=True, progressive=True, dpi=(dpi, dpi)
+            )
+            return buffer.getvalue(), ".jpg"
+        image.save(buffer, "PNG", optimize=True, dpi=(dpi, dpi))
+        return buffer.getvalue(), ".png"
+
+    def _write(self, final: Path, data: bytes) -> None:
+        with NamedTemporaryFile("wb", dir=self.cache_dir, prefix=".img.", suffix=".tmp", delete=False) as tmp:
+            tmp_path = Path(tmp.name)
+            try:
+                tmp.write(data)
+            except OSError:
+                tmp.close()
+                tmp_path.unlink(missing_ok=True)
+                raise
+        try:
+            os.replace(tmp_path, final)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+
+def _size_of(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _density(dpi: Any) -> float:
+    try:
+        value = float(dpi[0])
+    except (TypeError, ValueError, IndexError):
+        return PANDOC_DEFAULT_DPI
+    return value if value > 1 else PANDOC_DEFAULT_DPI
+
+
+def _is_photo(image: Any) -> bool:
+    if image.mode not in ("RGB", "RGBA"):
+        return False
+    if image.mode == "RGBA" and image.getchannel("A").getextrema() != (255, 255):
+        return False
+    return image.getcolors(maxcolors=PHOTO_MIN_COLORS) is None
+
+
+def _pillow_version() -> str:
+    try:
+        import PIL
+
+        return PIL.__version__
+    except (ImportError, AttributeError):
+        return "unavailable"
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from docforge.core.markdown_scan import scan_markdown
+
+# Text of the placeholder headings that carry H1 numbering and pagination into later parts.
+SPLIT_MARKER = "docforge-split-offset"
+
+
+@dataclass
+class DocumentPart:
+    """One slice of a document in large-document mode.
+
+    ``h1_before`` counts the level-1 headings of all earlier parts. Pandoc
+    numbers sections and places H1 page breaks per conversion, so the part is
+    converted with that many placeholder headings in front (see ``source``);
+    ``merge_docx`` drops them again via ``SPLIT_MARKER``.
+    """
+
+    index: int
+    text: str
+    h1_before: int = 0
+
+    @property
+    def source(self) -> str:
+        return f"# {SPLIT_MARKER}\n\n" * self.h1_before + self.text
+
+
+def split_at_h1(markdown_text: str, parts: int) -> list[DocumentPart]:
+    """Cut a Markdown body at level-1 headings into at most ``parts`` slices of similar size.
+
+    Headings inside code fences never count. Text before the first H1 stays
+    with the first part. Documents with fewer than two H1 sections come back
+    as a single part.
+    """
+    h1_starts = [heading.start for heading in scan_markdown(markdown_text).headings if heading.level == 1]
+    # The first H1 is not a cut point: the preamble (title page text, abstract) stays with chapter one.
+    cut_points = h1_starts[1:]
+    parts = min(max(1, parts), len(cut_points) + 1)
+    if parts == 1:
+        return [DocumentPart(index=0, text=markdown_text)]
+
+    cuts: list[int] = []
+    target = len(markdown_text) / parts
+    candidate = 0
+    for part in range(1, parts):
+        goal = target * part
+        # Nearest remaining H1 to the ideal cut, leaving one cut point per part still to come.
+        last_allowed = len(cut_points) - (parts - part)
+        while candidate < last_allowed and abs(cut_points[candidate + 1] - goal) <= abs(cut_points[candidate] - goal):
+            candidate += 1
+        cuts.append(cut_points[candidate])
+        candidate += 1
+
+    result: list[DocumentPart] = []
+    bounds = [0, *cuts, len(markdown_text)]
+    for index in range(parts):
+        start, end = bounds[index], bounds[index + 1]
+        result.append(
+            DocumentPart(index=index, text=markdown_text[start:end], h1_before=bisect_left(h1_starts, start))
+        )
+    return result
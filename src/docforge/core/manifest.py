@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any
+
+from docforge.core.hashing import sha256_file
+
+MANIFEST_SCHEMA_VERSION = "1.0"
+
+
+class BuildManifest:
+    """Persistent record of the fingerprint and output hash of every build.
+
+    One small JSON entry per output path keeps parallel builds from contending
+    on a shared file. The optional store keeps a copy of each output keyed by
+    fingerprint so an identical build can be restored without running pandoc.
+    """
+
+    def __init__(self, root: Path, store_enabled: bool = False) -> None:
+        self.root = root
+        self.entries_dir = root / "entries"
+        self.store_dir = root / "store"
+        self.store_enabled = store_enabled
+
+    def entry_path(self, output_path: Path) -> Path:
+        key = hashlib.sha256(str(output_path).encode("utf-8")).hexdigest()
+        return self.entries_dir / f"{key}.json"
+
+    def store_path(self, fingerprint: str) -> Path:
+        return self.store_dir / f"{fingerprint}.docx"
+
+    def load(self, output_path: Path) -> dict[str, Any] | None:
+        try:
+            with self.entry_path(output_path).open("r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def is_up_to_date(self, output_path: Path, fingerprint: str) -> bool:
+        entry = self.load(output_path)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return False
+        try:
+            stat = output_path.stat()
+        except OSError:
+            return False
+        if stat.st_size != entry.get("output_size"):
+            return False
+        if stat.st_mtime_ns == entry.get("output_mtime_ns"):
+            return True
+        # Touched but possibly unchanged: fall back to the recorded hash, if the build recorded one.
+        recorded = entry.get("output_sha256")
+        return bool(recorded) and sha256_file(output_path) == recorded
+
+    def restore(self, output_path: Path, fingerprint: str) -> bool:
+        if not self.store_enabled:
+            return False
+        stored = self.store_path(fingerprint)
+        if not stored.exists():
+            return False
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(stored, output_path)
+        entry = self.load(output_path) or {}
+        self.record(output_path, fingerprint, entry.get("output_sha256") or sha256_file(output_path), entry.get("inputs"))
+        return True
+
+    def record(
+        self,
+        output_path: Path,
+        fingerprint: str,
+        output_sha256: str | None,
+        inputs: dict[str, Any] | None = None,
+    ) -> None:
+        stat = output_path.stat()
+        entry = {
+            "schema_version": MANIFEST_SCHEMA_VERSION,
+            "output": str(output_path),
+            "fingerprint": fingerprint,
+            "output_sha256": output_sha256,
+            "output_size": stat.st_size,
+            "output_mtime_ns": stat.st_mtime_ns,
+            "inputs": inputs or {},
+        }
+        _atomic_write_json(self.entry_path(output_path), entry)
+        if self.store_enabled:
+            stored = self.store_path(fingerprint)
+            if not stored.exists():
+                stored.parent.mkdir(parents=True, exist_ok=True)
+                with NamedTemporaryFile(dir=stored.parent, suffix=".tmp", delete=False) as tmp:
+                    tmp_path = Path(tmp.name)
+                shutil.copyfile(output_path, tmp_path)
+                os.replace(tmp_path, stored)
+
+    def attach_output_sha(self, output_path: Path, fingerprint: str, output_sha256: str, stat: os.stat_result) -> bool:
+        """Add a hash computed after ``record``; only if the entry and the file are still the ones that were hashed."""
+        entry = self.load(output_path)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return False
+        try:
+            current = output_path.stat()
+        except OSError:
+            return False
+        recorded = (entry.get("output_size"), entry.get("output_mtime_ns"))
+        if not (recorded == (stat.st_size, stat.st_mtime_ns) == (current.st_size, current.st_mtime_ns)):
+            return False
+        _atomic_write_json(self.entry_path(output_path), {**entry, "output_sha256": output_sha256})
+        return True
+
+
+def _atomic_write_json(path: Path, payload: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False, encoding="utf-8") as tmp:
+        json.dump(payload, tmp, indent=2, ensure_ascii=False)
+        tmp_path = Path(tmp.name)
+    os.replace(tmp_path, path)
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import heapq
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from docforge.core.models import BuildWarning
+
+# Any indent, so fences inside list items and other containers are found too.
+FENCE_RE = re.compile(r"^([ \t]*)(`{3,}|~{3,})(.*)$")
+ATX_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]|$)")
+SETEXT_H1_RE = re.compile(r"^ {0,3}=+[ \t]*$")
+TABLE_TAG_RE = re.compile(r"<(/?)table\b", re.IGNORECASE)
+CELL_SPAN_RE = re.compile(r"<t[dh]\b[^>]*\b(?:rowspan|colspan)\s*=", re.IGNORECASE)
+# A cell tag whose attributes continue on the next line.
+OPEN_CELL_RE = re.compile(r"<t[dh]\b[^>]*$", re.IGNORECASE)
+WIDE_ROW_CHARS = 160
+HTML_CANDIDATE_RE = re.compile(r"<(?:/?table|t[dh])\b", re.IGNORECASE)
+LONG_LINE_WINDOW_CHARS = 1 << 20
+
+
+@dataclass
+class MermaidBlock:
+    number: int
+    line: int
+    start: int
+    end: int
+    source: str
+
+
+@dataclass
+class Heading:
+    level: int
+    line: int
+    start: int
+
+
+@dataclass
+class ScanResult:
+    mermaid_blocks: list[MermaidBlock] = field(default_factory=list)
+    headings: list[Heading] = field(default_factory=list)
+    code_blocks: int = 0
+    html_tables: int = 0
+    lines: int = 0
+    warnings: list[BuildWarning] = field(default_factory=list)
+
+
+class MarkdownScanner:
+    """Single pass, fence-aware walk over a Markdown document.
+
+    Fenced code blocks follow CommonMark: three or more backticks or tildes,
+    closed by a fence of the same character that is at least as long. Fences
+    may be indented any amount, so blocks nested in list items are found (an
+    indented code block showing a fence counts as one, as it always has).
+    Nothing inside a fence counts as a table or Mermaid block, so a
+    ``mermaid`` fence shown inside a longer fence stays code. Mermaid block
+    offsets run from the opening fence (after its indent) to the end of the
+    closing fence (before its newline), in characters of the text fed, so
+    callers can splice images into the same string and keep the indent.
+
+    Feed a stream line by line with ``feed``; ``scan_markdown`` drives the same
+    state machine over an in-memory string but only visits candidate lines.
+    """
+
+    def __init__(self, first_line: int = 1) -> None:
+        self.result = ScanResult()
+        self._line = first_line - 1
+        self._offset = 0
+        self._text: str | None = None
+        # (fence char, fence length, is mermaid, block start, body start, line, indent)
+        self._fence: tuple[str, int, bool, int, int, int, str] | None = None
+        self._fence_lines: list[str] = []
+        # (content, start) of the previous line; only ``feed`` keeps it, ``scan_markdown`` looks back in the text.
+        self._previous: tuple[str, int] | None = None
+        self._table_depth = 0
+        self._span_reported = False
+        self._nested_reported = False
+        # (tag text so far, line) of a cell tag still open at the end of the previous line; ``feed`` only.
+        self._open_cell: tuple[str, int] | None = None
+
+    def feed(self, line: str) -> None:
+        """Consume one line including its trailing newline, if any."""
+        self._line += 1
+        self.result.lines += 1
+        start = self._offset
+        self._offset += len(line)
+        in_mermaid = self._fence is not None and self._fence[2]
+        closed = self._handle(line.rstrip("\r\n"), self._line, start, self._offset)
+        if in_mermaid and not closed:
+            self._fence_lines.append(line)
+        self._previous = (line.rstrip("\r\n"), start)
+
+    def finish(self) -> ScanResult:
+        # An unclosed fence runs to the end of the document; it is code, never a diagram.
+        self._fence = None
+        self._fence_lines = []
+        return self.result
+
+    def _handle(self, content: str, line_no: int, start: int, next_start: int) -> bool:
+        """Process one line; returns True when it closed a fence."""
+        head = content[:4]
+        fence = FENCE_RE.match(content) if content.lstrip(" \t")[:1] in ("`", "~") else None
+
+        if self._fence is not None:
+            char, length, is_mermaid, block_start, body_start, block_line, indent = self._fence
+            if not (fence and fence.group(2)[0] == char and len(fence.group(2)) >= length and not fence.group(3).strip()):
+                return False
+            if is_mermaid:
+                body = self._text[body_start:start] if self._text is not None else "".join(self._fence_lines)
+                if indent:
+                    body = _outdent(body, len(indent))
+                self.result.mermaid_blocks.append(
+                    MermaidBlock(
+                        number=len(self.result.mermaid_blocks) + 1,
+                        line=block_line,
+                        start=block_start,
+                        end=start + len(content),
+                        source=body.strip() + "\n",
+                    )
+                )
+            self._fence = None
+            self._fence_lines = []
+            return True
+
+        if fence and not (fence.group(2)[0] == "`" and "`" in fence.group(3)):
+            info = fence.group(3).strip().split()
+            is_mermaid = bool(info) and info[0].lower() == "mermaid"
+            indent = fence.group(1)
+            self._fence = (fence.group(2)[0], len(fence.group(2)), is_mermaid, start + len(indent), next_start, line_no, indent)
+            self.result.code_blocks += 1
+            return False
+
+        if self._open_cell is not None:
+            self._continue_cell(content)
+
+        if "#" in head:
+            heading = ATX_HEADING_RE.match(content)
+            if heading:
+                self.result.headings.append(Heading(level=len(heading.group(1)), line=line_no, start=start))
+                return False
+        if "=" in head and SETEXT_H1_RE.match(content):
+            paragraph_start = self._paragraph_line_start(start)
+            if paragraph_start is not None:
+                self.result.headings.append(Heading(level=1, line=line_no - 1, start=paragraph_start))
+                return False
+        if "<" in content:
+            self._scan_html(content, line_no, start)
+        if len(content) > WIDE_ROW_CHARS and "|" in content:
+            self.result.warnings.append(
+                BuildWarning(
+                    code="TABLE_POSSIBLY_WIDE",
+                    message=f"Line {line_no} looks like a wide table row (>{WIDE_ROW_CHARS} chars); Word layout may wrap.",
+                )
+            )
+        return False
+
+    def _paragraph_line_start(self, start: int) -> int | None:
+        """Start of the line before ``start`` when it is paragraph text a setext underline applies to."""
+        if self._text is not None:
+            if start == 0:
+                return None
+            previous_start = self._text.rfind("\n", 0, start - 1) + 1
+            previous = self._text[previous_start:start].rstrip("\r\n")
+        elif self._previous is not None:
+            previous, previous_start = self._previous
+        else:
+            return None
+        if not previous.strip() or previous.startswith("    ") or previous.startswith("\t"):
+            return None
+        if FENCE_RE.match(previous) or ATX_HEADING_RE.match(previous) or SETEXT_H1_RE.match(previous):
+            return None
+        return previous_start
+
+    def _scan_html(self, content: str, line_no: int, start: int) -> None:
+        for tag in TABLE_TAG_RE.finditer(content):
+            if tag.group(1):
+                self._table_depth = max(0, self._table_depth - 1)
+                continue
+            if self._table_depth > 0 and not self._nested_reported:
+                self._nested_reported = True
+                self.result.warnings.append(
+                    BuildWarning(
+                        code="TABLE_UNSUPPORTED_NESTED",
+                        message=f"Detected nested HTML table (line {line_no}); MVP does not support nested tables.",
+                    )
+                )
+            self._table_depth += 1
+            self.result.html_tables += 1
+        if self._span_reported:
+            return
+        if CELL_SPAN_RE.search(content):
+            self._report_span(line_no)
+            return
+        cell = OPEN_CELL_RE.search(content)
+        if cell is None:
+            return
+        if self._text is None:
+            self._open_cell = (cell.group(0), line_no)
+            return
+        # The attribute lines are not candidates of ``scan_markdown``; read the whole tag from the text.
+        tag_start = start + cell.start()
+        tag_end = self._text.find(">", tag_start)
+        if CELL_SPAN_RE.match(self._text, tag_start, len(self._text) if tag_end == -1 else tag_end + 1):
+            self._report_span(line_no)
+
+    def _continue_cell(self, content: str) -> None:
+        tag, line_no = self._open_cell
+        tag += "\n" + content.split(">", 1)[0]
+        self._open_cell = None if ">" in content else (tag, line_no)
+        if CELL_SPAN_RE.match(tag):
+            self._open_cell = None
+            self._report_span(line_no)
+
+    def _report_span(self, line_no: int) -> None:
+        self._span_reported = True
+        self.result.warnings.append(
+            BuildWarning(
+                code="TABLE_UNSUPPORTED_SPAN",
+                message=f"Detected rowspan/colspan in HTML table (line {line_no}); MVP does not support merged cells.",
+            )
+        )
+
+
+def _outdent(body: str, width: int) -> str:
+    """Remove up to ``width`` leading spaces or tabs from every line of a fence body."""
+    lines = body.split("\n")
+    for i, line in enumerate(lines):
+        prefix = line[:width]
+        lines[i] = line[len(prefix) - len(prefix.lstrip(" \t")) :]
+    return "\n".join(lines)
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """Lines of ``text`` with their newlines, without materializing a list."""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find("\n", start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start : end + 1]
+        start = end + 1
+
+
+def scan_lines(lines: Iterable[str], first_line: int = 1) -> ScanResult:
+    scanner = MarkdownScanner(first_line=first_line)
+    for line in lines:
+        scanner.feed(line)
+    return scanner.finish()
+
+
+def scan_markdown(text: str, first_line: int = 1) -> ScanResult:
+    """Scan an in-memory document, visiting only lines that can matter.
+
+    Candidate lines (possible fences and headings, table markup, lines
+    longer than a wide row) are located with ``str.find``/regex searches and window-wise line
+    lengths, all of which run in C; they then go through the same state
+    machine ``feed`` uses, in document order.
+    """
+    scanner = MarkdownScanner(first_line=first_line)
+    scanner._text = text
+    line_no = first_line
+    line_start = 0
+    previous = -1
+    candidates = heapq.merge(
+        _marker_line_starts(text, "```", max_indent=None),
+        _marker_line_starts(text, "~~~", max_indent=None),
+        _marker_line_starts(text, "#"),
+        _marker_line_starts(text, "="),
+        (text.rfind("\n", 0, match.start()) + 1 for match in HTML_CANDIDATE_RE.finditer(text)),
+        _long_line_starts(text, WIDE_ROW_CHARS),
+    )
+    for start in candidates:
+        if start == previous:
+            continue
+        previous = start
+        line_no += text.count("\n", line_start, start)
+        line_start = start
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+        scanner._handle(text[start:end].rstrip("\r"), line_no, start, end + 1)
+    scanner.result.lines = text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+    return scanner.finish()
+
+
+def _marker_line_starts(text: str, marker: str, max_indent: int | None = 3) -> Iterator[int]:
+    """Starts of lines where ``marker`` follows at most ``max_indent`` spaces (any spaces or tabs for None)."""
+    pos = text.find(marker)
+    while pos != -1:
+        start = text.rfind("\n", 0, pos) + 1
+        if max_indent is None:
+            if not text[start:pos].strip(" \t"):
+                yield start
+        elif pos - start <= max_indent and not text[start:pos].strip(" "):
+            yield start
+        line_end = text.find("\n", pos)
+        if line_end == -1:
+            return
+        pos = text.find(marker, line_end + 1)
+
+
+def _long_line_starts(text: str, limit: int) -> Iterator[int]:
+    """Starts of lines longer than ``limit``, checked one window of whole lines at a time."""
+    pos = 0
+    length = len(text)
+    while pos < length:
+        window_end = text.find("\n", min(pos + LONG_LINE_WINDOW_CHARS, length))
+        if window_end == -1:
+            window_end = length
+        lines = text[pos:window_end].split("\n")
+        if max(map(len, lines)) > limit:
+            offset = pos
+            for line in lines:
+                if len(line) > limit:
+                    yield offset
+                offset += len(line) + 1
+        pos = window_end + 1
+
+
+def scan_file(path: Path, first_line: int = 1) -> ScanResult:
+    """Scan a document straight from disk; offsets count characters, as for ``scan_markdown``."""
+    with path.open("r", encoding="utf-8", newline="") as fh:
+        return scan_lines(fh, first_line=first_line)
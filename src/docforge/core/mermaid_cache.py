@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any, ContextManager
+
+from docforge.core.file_lock import file_lock
+
+INDEX_NAME = "index.json"
+INDEX_SCHEMA_VERSION = "1.0"
+PROFILE_SETTINGS_NAME = "settings.json"
+IMAGE_SUFFIXES = {".png", ".svg"}
+LOCKS_DIR_NAME = ".locks"
+PRUNE_LOCK_NAME = "prune.lock"
+PINS_DIR_NAME = ".pins"
+# Pin files this old belong to a build that died without releasing them.
+PIN_STALE_SECONDS = 24 * 3600
+# Staging files older than this are leftovers of a crashed render, not one in progress.
+STAGING_STALE_SECONDS = 3600
+# Render locks are striped over this many files so the lock directory stays bounded;
+# two different diagrams share a stripe with probability ~1/4096.
+RENDER_LOCK_STRIPES_HEX = 3
+
+
+class CacheConfigError(ValueError):
+    pass
+
+
+class MermaidCache:
+    """Content-addressed store of rendered Mermaid images.
+
+    Images are written to a staging name and renamed into place, so a crashed
+    render never leaves a half-written entry behind. ``index.json`` records
+    size and last use of every entry; it is merged rather than overwritten on
+    flush so several hosts can share one cache directory.
+
+    Concurrent renders of one entry are collapsed by ``render_lock``: the
+    first build renders, the others wait and ``adopt`` its image.
+
+    Every entry a build looks up, adopts or commits is pinned in a file under
+    ``.pins/`` until ``release``; ``prune`` never evicts pinned entries, so a
+    build's images stay on disk until pandoc has embedded them.
+    """
+
+    def __init__(self, root: Path, max_bytes: int | None = None, max_age_seconds: float | None = None) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self._lock = threading.Lock()
+        self._index: dict[str, dict[str, Any]] | None = None
+        self._dirty: set[str] = set()
+        self._pins: set[str] = set()
+        self._pin_path: Path | None = None
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any], base_dir: Path) -> "MermaidCache":
+        cache_cfg = config.get("cache") if isinstance(config, dict) else None
+        if not isinstance(cache_cfg, dict):
+            cache_cfg = {}
+        root = Path(str(cache_cfg.get("mermaid_dir") or ".cache/mermaid")).expanduser()
+        if not root.is_absolute():
+            root = base_dir / root
+        max_mb = _limit(cache_cfg, "max_size_mb")
+        max_days = _limit(cache_cfg, "max_age_days")
+        return cls(
+            root.resolve(),
+            max_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+            max_age_seconds=max_days * 86400 if max_days else None,
+        )
+
+    def register_profile(self, settings: dict[str, Any]) -> str:
+        """Name the subdirectory holding images rendered with ``settings``.
+
+        Each renderer configuration gets its own directory, so entries for
+        several themes or tool versions live side by side instead of evicting
+        each other.
+        """
+        profile = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        settings_path = self.root / profile / PROFILE_SETTINGS_NAME
+        if not settings_path.exists():
+            settings_path.parent.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(
+                "w", dir=settings_path.parent, prefix=".settings.", suffix=".tmp", delete=False, encoding="utf-8"
+            ) as tmp:
+                json.dump(settings, tmp, indent=2, sort_keys=True)
+                tmp_path = Path(tmp.name)
+            os.replace(tmp_path, settings_path)
+        return profile
+
+    @staticmethod
+    def _entry_name(digest: str, image_ext: str, profile: str) -> str:
+        name = f"{digest}.{image_ext}"
+        return f"{profile}/{name}" if profile else name
+
+    def image_path(self, digest: str, image_ext: str, profile: str = "") -> Path:
+        return self.root / self._entry_name(digest, image_ext, profile)
+
+    def lookup(self, digest: str, image_ext: str, profile: str = "") -> Path | None:
+        name = self._entry_name(digest, image_ext, profile)
+        # Pin before the existence check: a prune that starts afterwards keeps the file.
+        self._pin(name)
+        index = self._load_index()
+        path = self.root / name
+        with self._lock:
+            known = name in index
+        if not known and not path.exists():
+            with self._lock:
+                self.misses += 1
+            return None
+        if known and not path.exists():
+            # Pruned by another host since our index snapshot.
+            with self._lock:
+                index.pop(name, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            entry = index.setdefault(name, {"size": _size_of(path), "created": time.time()})
+            entry["last_used"] = time.time()
+            self._dirty.add(name)
+            self.hits += 1
+        return path
+
+    def staging_path(self, digest: str, image_ext: str, profile: str = "") -> Path:
+        """A unique file next to the final entry that keeps the real extension (mmdc infers the format from it)."""
+        directory = self.image_path(digest, image_ext, profile).parent
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f".{digest}.{uuid.uuid4().hex}.tmp.{image_ext}"
+
+    def render_lock_path(self, digest: str, image_ext: str, profile: str = "") -> Path:
+        name = self._entry_name(digest, image_ext, profile)
+        stripe = hashlib.sha256(name.encode("utf-8")).hexdigest()[:RENDER_LOCK_STRIPES_HEX]
+        return self.root / LOCKS_DIR_NAME / f"{stripe}.lock"
+
+    def render_lock(self, digest: str, image_ext: str, profile: str = "") -> ContextManager[None]:
+        """Single-flight guard for one entry, shared by every thread and process using this directory.
+
+        Hold it from the final cache check through ``commit``; a build that
+        had to wait should call ``adopt`` before rendering itself.
+        """
+        return file_lock(self.render_lock_path(digest, image_ext, profile))
+
+    def adopt(self, digest: str, image_ext: str, profile: str = "") -> bool:
+        """True when the entry appeared after our lookup missed, i.e. a concurrent build rendered it."""
+        name = self._entry_name(digest, image_ext, profile)
+        self._pin(name)
+        path = self.root / name
+        if not path.exists():
+            return False
+        index = self._load_index()
+        now = time.time()
+        with self._lock:
+            entry = index.setdefault(name, {"size": _size_of(path), "created": now})
+            entry["last_used"] = now
+            self._dirty.add(name)
+            self.joined += 1
+        return True
+
+    def commit(self, staging: Path, digest: str, image_ext: str, profile: str = "") -> Path:
+        name = self._entry_name(digest, image_ext, profile)
+        self._pin(name)
+        final = self.root / name
+        os.replace(staging, final)
+        now = time.time()
+        index = self._load_index()
+        with self._lock:
+            index[name] = {"size": _size_of(final), "created": now, "last_used": now}
+            self._dirty.add(name)
+        return final
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "dir": str(self.root),
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+    def disk_stats(self) -> dict[str, Any]:
+        entries = self._scan()
+        sizes = [e["size"] for e in entries.values()]
+        used = [e.get("last_used", 0) for e in entries.values()]
+        return {
+            "dir": str(self.root),
+            "entries": len(entries),
+            "total_bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age_seconds,
+            "oldest_use": min(used) if used else None,
+            "newest_use": max(used) if used else None,
+        }
+
+    def flush(self) -> None:
+        """Merge our index changes to disk."""
+        if self._index is None:
+            return
+        with self._lock:
+            dirty = {name: dict(self._index[name]) for name in self._dirty if name in self._index}
+            self._dirty.clear()
+        if not dirty:
+            return
+        on_disk = self._read_index()
+        for name, entry in dirty.items():
+            previous = on_disk.get(name, {})
+            entry["last_used"] = max(entry.get("last_used", 0), previous.get("last_used", 0))
+            on_disk[name] = entry
+        self._write_index(on_disk)
+        with self._lock:
+            self._index = on_disk
+
+    def release(self) -> dict[str, int]:
+        """Unpin this build's entries, then enforce the size/age limits.
+
+        Call once the build no longer needs its images, i.e. after conversion.
+        """
+        with self._lock:
+            pin_path, self._pin_path = self._pin_path, None
+            self._pins.clear()
+        if pin_path is None:
+            return {"removed": 0, "freed_bytes": 0}
+        pin_path.unlink(missing_ok=True)
+        if self._over_limits(self._read_index()):
+            return self.prune()
+        return {"removed": 0, "freed_bytes": 0}
+
+    def _over_limits(self, entries: dict[str, dict[str, Any]]) -> bool:
+        # Cheap check on the index so the directory is only scanned when eviction is due.
+        if self.max_bytes is not None and sum(e.get("size", 0) for e in entries.values()) > self.max_bytes:
+            return True
+        if self.max_age_seconds is not None and entries:
+            oldest = min(e.get("last_used", 0) for e in entries.values())
+            return time.time() - oldest > self.max_age_seconds
+        return False
+
+    def prune(self, max_bytes: int | None = None, max_age_seconds: float | None = None) -> dict[str, int]:
+        """Evict entries older than the age limit, then least recently used ones until under the size limit.
+
+        Entries pinned by a build in progress are kept (and still count towards the size limit).
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age_seconds = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        with file_lock(self._prune_lock_path()):
+            entries = self._scan()
+            pinned = self._pinned()
+            now = time.time()
+            victims: list[str] = []
+            if max_age_seconds is not None:
+                victims.extend(
+                    n for n, e in entries.items() if n not in pinned and now - e.get("last_used", 0) > max_age_seconds
+                )
+            if max_bytes is not None:
+                remaining = sorted(
+                    ((e.get("last_used", 0), n) for n, e in entries.items() if n not in victims),
+                    reverse=True,
+                )
+                total = 0
+                for _used, name in remaining:
+                    total += entries[name]["size"]
+                    if total > max_bytes and name not in pinned:
+                        victims.append(name)
+            return self._remove(victims, entries)
+
+    def clear(self) -> dict[str, int]:
+        """Remove every entry except those pinned by a build in progress, which are counted as ``kept``."""
+        with file_lock(self._prune_lock_path()):
+            entries = self._scan()
+            pinned = self._pinned()
+            result = self._remove([n for n in entries if n not in pinned], entries)
+            # Staging leftovers of crashed renders and the .mmd sources older cache layouts kept beside images.
+            now = time.time()
+            for staging in [*self.root.glob(".*.tmp.*"), *self.root.glob("*/.*.tmp.*")]:
+                try:
+                    if now - staging.stat().st_mtime > STAGING_STALE_SECONDS:
+                        staging.unlink()
+                except OSError:
+                    continue
+            for source in self.root.glob("*.mmd"):
+                source.unlink(missing_ok=True)
+            for profile_dir in [p for p in self.root.iterdir() if p.is_dir()]:
+                if any(p.suffix in IMAGE_SUFFIXES for p in profile_dir.iterdir()):
+                    continue
+                (profile_dir / PROFILE_SETTINGS_NAME).unlink(missing_ok=True)
+                try:
+                    profile_dir.rmdir()
+                except OSError:
+                    pass
+        return {**result, "kept": len(entries)}
+
+    def _remove(self, names: list[str], entries: dict[str, dict[str, Any]]) -> dict[str, int]:
+        freed = 0
+        for name in names:
+            try:
+                (self.root / name).unlink()
+            except FileNotFoundError:
+                pass
+            freed += entries[name]["size"]
+            entries.pop(name, None)
+        self._write_index(entries)
+        with self._lock:
+            self._index = entries
+        return {"removed": len(names), "freed_bytes": freed}
+
+    def _prune_lock_path(self) -> Path:
+        return self.root / LOCKS_DIR_NAME / PRUNE_LOCK_NAME
+
+    def _pin(self, name: str) -> None:
+        # Written under the prune lock, so a running prune either sees the pin or finishes first.
+        with file_lock(self._prune_lock_path()):
+            with self._lock:
+                if name in self._pins:
+                    return
+                if self._pin_path is None:
+                    self._pin_path = self.root / PINS_DIR_NAME / f"{uuid.uuid4().hex}.pin"
+                pin_path = self._pin_path
+            pin_path.parent.mkdir(parents=True, exist_ok=True)
+            with pin_path.open("a", encoding="utf-8") as fh:
+                fh.write(name + "\n")
+            with self._lock:
+                self._pins.add(name)
+
+    def _pinned(self) -> set[str]:
+        """Entries pinned by any build using this directory; stale pin files are removed."""
+        names: set[str] = set()
+        pins_dir = self.root / PINS_DIR_NAME
+        if not pins_dir.is_dir():
+            return names
+        now = time.time()
+        for pin_path in pins_dir.glob("*.pin"):
+            try:
+                if now - pin_path.stat().st_mtime > PIN_STALE_SECONDS:
+                    pin_path.unlink()
+                    continue
+                names.update(pin_path.read_text(encoding="utf-8").split())
+            except OSError:
+                continue
+        return names
+
+    def _scan(self) -> dict[str, dict[str, Any]]:
+        """Index entries reconciled with the files actually present."""
+        indexed = self._read_index()
+        entries: dict[str, dict[str, Any]] = {}
+        if not self.root.is_dir():
+            return entries
+        for path in self._image_files():
+            name = path.relative_to(self.root).as_posix()
+            entry = indexed.get(name)
+            if entry is None:
+                stat = path.stat()
+                entry = {"size": stat.st_size, "created": stat.st_mtime, "last_used": stat.st_atime}
+            entries[name] = entry
+        return entries
+
+    def _image_files(self) -> list[Path]:
+        # Flat entries from the original layout plus one level of profile directories.
+        files: list[Path] = []
+        for path in self.root.iterdir():
+            if path.is_dir() and not path.name.startswith("."):
+                files.extend(
+                    p for p in path.iterdir() if not p.name.startswith(".") and p.suffix in IMAGE_SUFFIXES
+                )
+            elif not path.name.startswith(".") and path.suffix in IMAGE_SUFFIXES:
+                files.append(path)
+        return files
+
+    def _load_index(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            if self._index is None:
+                self._index = self._read_index()
+            return self._index
+
+    def _read_index(self) -> dict[str, dict[str, Any]]:
+        try:
+            with (self.root / INDEX_NAME).open("r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        entries = data.get("entries") if isinstance(data, dict) else None
+        return entries if isinstance(entries, dict) else {}
+
+    def _write_index(self, entries: dict[str, dict[str, Any]]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        payload = {"schema_version": INDEX_SCHEMA_VERSION, "entries": entries}
+        with NamedTemporaryFile("w", dir=self.root, prefix=".index.", suffix=".tmp", delete=False, encoding="utf-8") as tmp:
+            json.dump(payload, tmp)
+            tmp_path = Path(tmp.name)
+        os.replace(tmp_path, self.root / INDEX_NAME)
+
+
+def _limit(cache_cfg: dict[str, Any], key: str) -> float | None:
+    """``cache.<key>`` as a positive number, None when unset or zero."""
+    value = cache_cfg.get(key)
+    if not value:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise CacheConfigError(f"cache.{key} must be a number, got {value!r}") from None
+    if not math.isfinite(number) or number < 0:
+        raise CacheConfigError(f"cache.{key} must be a non-negative number, got {value!r}")
+    return number or None
+
+
+def _size_of(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
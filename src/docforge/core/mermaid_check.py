@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import re
+from typing import Iterator
+
+# First keyword of every diagram type Mermaid 10/11 understands.
+DIAGRAM_TYPES = {
+    "graph",
+    "flowchart",
+    "flowchart-elk",
+    "sequenceDiagram",
+    "classDiagram",
+    "classDiagram-v2",
+    "stateDiagram",
+    "stateDiagram-v2",
+    "erDiagram",
+    "journey",
+    "gantt",
+    "pie",
+    "quadrantChart",
+    "requirementDiagram",
+    "gitGraph",
+    "mindmap",
+    "timeline",
+    "zenuml",
+    "sankey-beta",
+    "xychart-beta",
+    "block-beta",
+    "packet-beta",
+    "architecture-beta",
+    "kanban",
+    "radar-beta",
+    "C4Context",
+    "C4Container",
+    "C4Component",
+    "C4Dynamic",
+    "C4Deployment",
+}
+FLOWCHART_DIRECTIONS = {"TB", "TD", "BT", "RL", "LR"}
+SEQUENCE_BLOCKS = {"loop", "alt", "opt", "par", "critical", "break", "rect", "box"}
+QUOTED_RE = re.compile(r'"[^"]*"')
+HTML_TAG_RE = re.compile(r"</?[A-Za-z][^<>]*>")
+# Entity codes such as #59; are label text, not statement separators.
+ENTITY_RE = re.compile(r"#\w+;")
+STATEMENT_RE = re.compile(r'(?:"[^"]*"?|[^;"])+')
+# A link with nothing after it (optionally after its |label|).
+DANGLING_EDGE_RE = re.compile(r"(?:--+|==+|-\.+-|~~~)[>ox]?\s*(?:\|[^|]*\|)?$")
+BRACKET_PAIRS = {")": "(", "]": "[", "}": "{"}
+
+
+def check_mermaid(source: str) -> list[tuple[int, str]]:
+    """Cheap structural check of a Mermaid diagram; returns ``(line, problem)`` pairs, lines 1-based.
+
+    This is not Mermaid's grammar: it catches what breaks most diagrams in
+    practice (unknown diagram type, bad flowchart direction, unbalanced
+    brackets or links without a target on flowchart lines,
+    ``subgraph``/``loop``/``alt`` blocks without ``end``) in microseconds,
+    without a browser. Statements separated by ``;`` are checked like
+    separate lines, including those after the header. A diagram that passes
+    can still fail to render.
+    """
+    lines = source.splitlines()
+    index = _skip_preamble(lines)
+    if index >= len(lines):
+        return [(max(1, len(lines)), "empty diagram")]
+
+    head, _, rest = lines[index].partition(";")
+    header = head.split()
+    kind = header[0]
+    if kind not in DIAGRAM_TYPES:
+        return [(index + 1, f"unknown diagram type '{kind}'")]
+
+    problems: list[tuple[int, str]] = []
+    if kind in {"graph", "flowchart", "flowchart-elk"}:
+        if len(header) > 1 and header[1] not in FLOWCHART_DIRECTIONS:
+            problems.append((index + 1, f"unknown flowchart direction '{header[1]}'"))
+        problems.extend(_check_blocks(_statements(lines, index, rest), {"subgraph"}, brackets=True))
+    elif kind == "sequenceDiagram":
+        problems.extend(_check_blocks(_statements(lines, index, rest), SEQUENCE_BLOCKS, brackets=False))
+    return problems
+
+
+def _skip_preamble(lines: list[str]) -> int:
+    """Index of the diagram header, past blank lines, ``%%`` comments/directives and YAML front matter."""
+    index = 0
+    if lines and lines[0].strip() == "---":
+        closing = next((i for i in range(1, len(lines)) if lines[i].strip() == "---"), None)
+        if closing is not None:
+            index = closing + 1
+    while index < len(lines) and (not lines[index].strip() or lines[index].lstrip().startswith("%%")):
+        index += 1
+    return index
+
+
+def _statements(lines: list[str], header: int, rest: str) -> Iterator[tuple[int, str]]:
+    """``(line, statement)`` pairs after the header line, which may itself end in statements after a ``;``."""
+    for number, raw in enumerate([rest, *lines[header + 1 :]], start=header + 1):
+        if raw.lstrip().startswith("%%"):
+            continue
+        for statement in STATEMENT_RE.findall(ENTITY_RE.sub("#", raw)):
+            if statement.strip():
+                yield number, statement.strip()
+
+
+def _check_blocks(statements: Iterator[tuple[int, str]], openers: set[str], brackets: bool) -> list[tuple[int, str]]:
+    problems: list[tuple[int, str]] = []
+    open_blocks: list[tuple[int, str]] = []
+    for number, line in statements:
+        keyword = line.split()[0]
+        if keyword in openers:
+            open_blocks.append((number, keyword))
+        elif keyword == "end":
+            if not open_blocks:
+                problems.append((number, "'end' without an open block"))
+            else:
+                open_blocks.pop()
+        elif brackets:
+            problem = _bracket_problem(line)
+            if problem:
+                problems.append((number, problem))
+    for number, keyword in open_blocks:
+        problems.append((number, f"'{keyword}' is never closed with 'end'"))
+    return problems
+
+
+def _bracket_problem(line: str) -> str | None:
+    """Unbalanced node shapes or edge labels, or a link without a target, in one flowchart statement."""
+    stack: list[str] = []
+    # Quoted and HTML label content is text, whatever brackets it holds.
+    text = HTML_TAG_RE.sub("", QUOTED_RE.sub("", line))
+    position = 0
+    while position < len(text):
+        char = text[position]
+        if char in "([{":
+            stack.append(char)
+        elif char in BRACKET_PAIRS:
+            if not stack or stack[-1] != BRACKET_PAIRS[char]:
+                return f"unbalanced '{char}'"
+            stack.pop()
+        elif stack:
+            pass  # label text inside a node shape
+        elif char == "|":
+            close = text.find("|", position + 1)
+            if close == -1:
+                return "unclosed '|'"
+            position = close  # skip the edge label
+        elif char == ">" and position and (text[position - 1].isalnum() or text[position - 1] == "_"):
+            stack.append("[")  # asymmetric node shape: id>label]
+        position += 1
+    if stack:
+        return f"unclosed '{stack[-1]}'"
+    if line.count('"') % 2:
+        return "unclosed '\"'"
+    if DANGLING_EDGE_RE.search(text.rstrip()):
+        return "link without a target node"
+    return None
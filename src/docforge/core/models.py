@@ -11,6 +11,11 @@ EXIT_CONVERT_ERROR = 2
 EXIT_TEMPLATE_ERROR = 3
 EXIT_MERMAID_ERROR = 4
 
+STATUS_BUILT = "BUILT"
+STATUS_SKIPPED_UP_TO_DATE = "SKIPPED_UP_TO_DATE"
+STATUS_RESTORED_FROM_STORE = "RESTORED_FROM_STORE"
+STATUS_CHECKED = "CHECKED"
+
 
 @dataclass
 class BuildWarning:
@@ -34,7 +39,11 @@ class BuildOptions:
     template_dir: Path | None = None
     enable_mermaid: bool = True
     mermaid_format: str | None = None
+    mermaid_workers: int | None = None
+    split: bool | None = None
+    output_hash: str | None = None  # sync | deferred | off; None uses defaults.output_hash
     verbose: bool = False
+    force: bool = False
 
 
 @dataclass
@@ -45,3 +54,32 @@ class BuildResult:
     error: BuildError | None = None
     meta_path: Path | None = None
     sha_path: Path | None = None
+    status: str = STATUS_BUILT
+    timings: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BatchItemResult:
+    input_path: Path
+    output_path: Path
+    exit_code: int
+    status: str = STATUS_BUILT
+    elapsed_seconds: float = 0.0
+    error: str | None = None
+    warnings: list[str] = field(default_factory=list)
+    timings: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BatchReport:
+    items: list[BatchItemResult] = field(default_factory=list)
+    started_at: str = ""
+    elapsed_seconds: float = 0.0
+    workers: int = 1
+
+    @property
+    def exit_code(self) -> int:
+        for item in self.items:
+            if item.exit_code != EXIT_OK:
+                return item.exit_code
+        return EXIT_OK
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+try:
+    import cairosvg
+except ImportError:  # optional: pip install "docforge[raster]"
+    cairosvg = None
+
+RASTER_MODES = {"browser", "local"}
+DEFAULT_PNG_DPI = 192.0
+DEFAULT_PNG_SCALE = 1.0
+CSS_DPI = 96.0
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+FOREIGN_OBJECT_TAG = b"<foreignObject"
+
+
+class RasterizeError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class SvgRasterizer:
+    """Derives PNG diagrams from cached SVG renders in-process, without a browser.
+
+    ``scale`` sets the displayed size relative to the SVG and ``dpi`` the pixel
+    density: the PNG gets ``scale * dpi / 96`` pixels per SVG pixel and a
+    ``pHYs`` chunk declaring ``dpi``, so pandoc places it at ``scale`` times
+    the SVG's size however sharp it is.
+    """
+
+    dpi: float = DEFAULT_PNG_DPI
+    scale: float = DEFAULT_PNG_SCALE
+
+    @classmethod
+    def from_config(cls, tools_cfg: Any) -> "SvgRasterizer | None":
+        """The rasterizer ``tools.mermaid_raster: local`` asks for, or None when the browser renders PNGs.
+
+        Raises ``RasterizeError`` when local rasterization is requested but CairoSVG is not installed.
+        """
+        cfg = tools_cfg if isinstance(tools_cfg, dict) else {}
+        mode = str(cfg.get("mermaid_raster") or "browser").strip().lower()
+        if mode != "local":
+            return None
+        if cairosvg is None:
+            raise RasterizeError("tools.mermaid_raster is 'local' but CairoSVG is not installed")
+        try:
+            dpi = float(cfg.get("mermaid_png_dpi") or DEFAULT_PNG_DPI)
+            scale = float(cfg.get("mermaid_png_scale") or DEFAULT_PNG_SCALE)
+        except (TypeError, ValueError):
+            dpi, scale = DEFAULT_PNG_DPI, DEFAULT_PNG_SCALE
+        return cls(dpi=dpi if dpi > 0 else DEFAULT_PNG_DPI, scale=scale if scale > 0 else DEFAULT_PNG_SCALE)
+
+    def settings(self) -> dict[str, str]:
+        """Part of the cache profile: changing any of these re-derives the PNGs (the SVGs are kept)."""
+        version = getattr(cairosvg, "__version__", "unknown") if cairosvg is not None else "unavailable"
+        return {"png_rasterizer": f"cairosvg {version}", "png_dpi": f"{self.dpi:g}", "png_scale": f"{self.scale:g}"}
+
+    def rasterize(self, svg_path: Path, png_path: Path) -> None:
+        if cairosvg is None:
+            raise RasterizeError("CairoSVG is not installed")
+        try:
+            data = cairosvg.svg2png(url=str(svg_path), scale=self.scale * self.dpi / CSS_DPI)
+        except Exception as exc:  # CairoSVG raises plain ValueError/KeyError/... on SVGs it cannot handle
+            raise RasterizeError(f"{type(exc).__name__}: {exc}") from exc
+        png_path.write_bytes(with_png_dpi(data, self.dpi))
+
+
+def uses_foreign_object(svg_path: Path) -> bool:
+    """Whether the SVG draws labels as HTML inside ``<foreignObject>``, which CairoSVG leaves blank."""
+    return FOREIGN_OBJECT_TAG in svg_path.read_bytes()
+
+
+def with_png_dpi(data: bytes, dpi: float) -> bytes:
+    """``data`` with its ``pHYs`` chunk (pixel density) set to ``dpi``, inserted after ``IHDR`` if missing."""
+    if not data.startswith(PNG_SIGNATURE):
+        raise RasterizeError("not a PNG image")
+    per_metre = round(dpi / 0.0254)
+    body = struct.pack(">IIB", per_metre, per_metre, 1)
+    phys = struct.pack(">I", len(body)) + b"pHYs" + body + struct.pack(">I", zlib.crc32(b"pHYs" + body))
+    out = [PNG_SIGNATURE]
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        kind = data[pos + 4 : pos + 8]
+        end = pos + 12 + length
+        if kind != b"pHYs":
+            out.append(data[pos:end])
+        if kind == b"IHDR":
+            out.append(phys)
+        pos = end
+    return b"".join(out)
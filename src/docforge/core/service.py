@@ -5,13 +5,30 @@ import hashlib
 import json
 import os
 import re
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
 from pathlib import Path
-from tempfile import NamedTemporaryFile
-from typing import Any
+from typing import Any, Callable
 
 import yaml
 
-from docforge.adapters.tool_runner import SubprocessToolRunner, ToolRunner, ToolRunnerError
+from docforge import __version__
+from docforge.adapters.mermaid_batch import MermaidBatchToolRunner
+from docforge.adapters.pandoc_server import PandocServerToolRunner
+from docforge.adapters.tool_runner import (
+    CompletedProcessLike,
+    SubprocessToolRunner,
+    ToolRunner,
+    ToolRunnerError,
+    ToolTimeoutError,
+    scratch_input_file,
+)
+from docforge.core.build_log import BuildLog, LogConfigError
+from docforge.core.config_cache import CachedConfig, ConfigCache, parse_config
 from docforge.core.models import (
     BuildError,
     BuildOptions,
@@ -22,18 +39,375 @@ from docforge.core.models import (
     EXIT_MERMAID_ERROR,
     EXIT_OK,
     EXIT_TEMPLATE_ERROR,
+    STATUS_CHECKED,
+    STATUS_RESTORED_FROM_STORE,
+    STATUS_SKIPPED_UP_TO_DATE,
 )
+from docforge.core.docx_merge import DocxMergeError, merge_docx
+from docforge.core.docx_postprocess import DocxPostprocessError, DocxProfile, postprocess_docx
+from docforge.core.hashing import sha256_file
+from docforge.core.image_optimize import ImageOptimizeError, ImageOptimizer
+from docforge.core.large_document import SPLIT_MARKER, split_at_h1
+from docforge.core.manifest import BuildManifest
+from docforge.core.markdown_scan import MermaidBlock, ScanResult, scan_markdown
+from docforge.core.mermaid_check import check_mermaid
+from docforge.core.mermaid_cache import CacheConfigError, MermaidCache
+from docforge.core.rasterize import RasterizeError, SvgRasterizer, uses_foreign_object
+from docforge.core.timing import PhaseTimer
 
-MERMAID_BLOCK_RE = re.compile(r"```mermaid[ \t]*\n(.*?)```", re.DOTALL)
 META_SCHEMA_VERSION = "1.0"
+DEFAULT_MERMAID_WORKERS = 4
+DEFAULT_SPLIT_WORKERS = 4
+MERMAID_BACKENDS = {"mmdc", "batch"}
+PANDOC_BACKENDS = {"subprocess", "server"}
+OUTPUT_HASH_MODES = {"sync", "deferred", "off"}
+DEFAULT_PANDOC_TIMEOUT_SECONDS = 600.0
+DEFAULT_MERMAID_TIMEOUT_SECONDS = 120.0
+DEFAULT_MERMAID_RETRIES = 2
+DEFAULT_MERMAID_RETRY_BACKOFF_SECONDS = 1.0
+# Renderer messages meaning the diagram itself is wrong: a retry would fail the same way.
+DIAGRAM_ERROR_RE = re.compile(r"(parse|lexical|syntax) error|UnknownDiagramError|no diagram type detected", re.I)
+DEFAULT_VERSION_CACHE = ".cache/tool_versions.json"
+
+
+@dataclass
+class _ResolvedInputs:
+    """Configuration, document and template settings of one build, before any tool or cache is touched."""
+
+    cached_config: CachedConfig
+    config: dict[str, Any]
+    defaults: dict[str, Any]
+    tools_cfg: Any
+    input_path: Path
+    output_path: Path
+    config_path: Path
+    input_sha: str
+    front_matter: dict[str, Any]
+    markdown_body: str
+    scan: ScanResult
+    selected_type: str
+    reference_doc_path: Path
+    toc_enabled: bool
+    number_sections: bool
+    page_break_h1: bool
+    mermaid_enabled: bool
+    mermaid_format: str
+    output_hash: str
+    docx_profile: DocxProfile
+
+
+@dataclass
+class _PreparedBuild:
+    """State handed from the preparation stage to rendering, conversion and bookkeeping."""
+
+    options: BuildOptions
+    runner: ToolRunner
+    input_path: Path
+    output_path: Path
+    config_path: Path
+    reference_doc_path: Path
+    build_log: BuildLog
+    input_sha: str
+    scan: ScanResult
+    front_matter: dict[str, Any]
+    markdown_body: str
+    selected_type: str
+    toc_enabled: bool
+    number_sections: bool
+    page_break_h1: bool
+    mermaid_enabled: bool
+    mermaid_format: str
+    output_hash: str
+    mermaid_workers: int
+    mermaid_cache: MermaidCache
+    mermaid_profile: str
+    mermaid_retry: MermaidRetryPolicy
+    split_parts: int
+    versions: dict[str, str]
+    manifest: BuildManifest
+    fingerprint: str
+    fingerprint_inputs: dict[str, Any]
+    docx_profile: DocxProfile
+    warnings: list[BuildWarning] = field(default_factory=list)
+    mermaid_derive: DerivedPng | None = None
+    image_optimizer: ImageOptimizer | None = None
+    image_report: dict[str, Any] | None = None
+
+
+@dataclass(frozen=True)
+class DerivedPng:
+    """PNG diagrams made locally from the SVG renders kept under ``svg_profile``."""
+
+    rasterizer: SvgRasterizer
+    svg_profile: str
+
+
+@dataclass(frozen=True)
+class MermaidRetryPolicy:
+    """Bounded retries with exponential backoff for Mermaid renders that failed for reasons outside the diagram.
+
+    Timeouts, browser launch failures and crashed helpers are retried; parse
+    errors are not. Missing or unstartable tools fail at once either way.
+    """
+
+    retries: int = 0
+    backoff_seconds: float = DEFAULT_MERMAID_RETRY_BACKOFF_SECONDS
+
+    def next_delay(self, attempt: int, error: str) -> float | None:
+        """Seconds to wait after failed ``attempt`` (1-based) before the next one, or None to give up."""
+        if attempt > self.retries or DIAGRAM_ERROR_RE.search(error):
+            return None
+        return self.backoff_seconds * 2 ** (attempt - 1)
 
 
 class BuildService:
-    def __init__(self, base_dir: Path, tool_runner: ToolRunner | None = None) -> None:
+    def __init__(
+        self,
+        base_dir: Path,
+        tool_runner: ToolRunner | None = None,
+        config_cache: ConfigCache | None = None,
+    ) -> None:
         self.base_dir = base_dir.resolve()
         self.tool_runner = tool_runner
+        # Parsed config, template paths, tool runners and input hashes, reused until their files change.
+        self.config_cache = config_cache or ConfigCache()
+        self._hash_pool: ThreadPoolExecutor | None = None
+        self._deferred: set[Future[None]] = set()
+        self._deferred_lock = threading.Lock()
 
     def run(self, options: BuildOptions) -> BuildResult:
+        started = time.perf_counter()
+        result = self._build(options)
+        self._journal(options, result, time.perf_counter() - started)
+        return result
+
+    def _build(self, options: BuildOptions) -> BuildResult:
+        timer = PhaseTimer()
+        prepared = self._prepare(options, timer)
+        if isinstance(prepared, BuildResult):
+            return prepared
+        try:
+            markdown_body = prepared.markdown_body
+            mermaid_rendered = 0
+            if prepared.mermaid_enabled:
+                with timer.phase("mermaid"):
+                    result = self._replace_mermaid_with_image(
+                        markdown_body,
+                        prepared.mermaid_cache,
+                        prepared.runner,
+                        prepared.mermaid_format,
+                        workers=prepared.mermaid_workers,
+                        profile=prepared.mermaid_profile,
+                        timer=timer,
+                        blocks=prepared.scan.mermaid_blocks,
+                        retry=prepared.mermaid_retry,
+                        derive=prepared.mermaid_derive,
+                    )
+                    prepared.mermaid_cache.flush()
+                fallback = self._raster_fallback_warning(timer)
+                if fallback is not None:
+                    prepared.warnings.append(fallback)
+                if isinstance(result, BuildError):
+                    return BuildResult(exit_code=result.code, error=result, warnings=prepared.warnings)
+                markdown_body, mermaid_rendered = result
+
+            if prepared.image_optimizer is not None:
+                with timer.phase("images"):
+                    markdown_body = self._optimize_images(prepared, markdown_body)
+
+            try:
+                with timer.phase("pandoc"):
+                    pandoc_proc = self._convert(prepared, markdown_body, timer)
+            except ToolRunnerError as exc:
+                return self._tool_failure(exc, timer)
+            return self._finish(prepared, pandoc_proc, mermaid_rendered, timer)
+        finally:
+            # Eviction waits until pandoc has embedded this build's diagrams.
+            prepared.mermaid_cache.release()
+
+    def validate(self, options: BuildOptions) -> BuildResult:
+        """Preflight check: would this document build?
+
+        Runs the config, template, front-matter and scan stages of ``run`` and
+        checks each Mermaid block structurally (``check_mermaid``). No tool is
+        started, nothing is rendered or written, and ``output_path`` is not
+        used. Returns status ``CHECKED`` with the build's warnings, or the error
+        the build would stop with; every Mermaid problem is listed under
+        ``error.details["mermaid"]``.
+        """
+        timer = PhaseTimer()
+        resolved = self._resolve(options, timer)
+        if isinstance(resolved, BuildResult):
+            resolved.status = STATUS_CHECKED
+            return resolved
+        warnings = list(resolved.scan.warnings)
+        if not zipfile.is_zipfile(resolved.reference_doc_path):
+            result = self._fail(EXIT_TEMPLATE_ERROR, f"Template file is not a DOCX package: {resolved.reference_doc_path}")
+            result.status = STATUS_CHECKED
+            return result
+
+        problems: list[str] = []
+        if resolved.mermaid_enabled:
+            with timer.phase("mermaid_check"):
+                for block in resolved.scan.mermaid_blocks:
+                    for line, problem in check_mermaid(block.source):
+                        problems.append(f"Mermaid block #{block.number} (line {block.line + line}): {problem}")
+        elif resolved.scan.mermaid_blocks:
+            warnings.append(self._mermaid_skipped_warning())
+        error = BuildError(EXIT_MERMAID_ERROR, problems[0], {"mermaid": problems}) if problems else None
+        return BuildResult(
+            exit_code=error.code if error else EXIT_OK,
+            warnings=warnings,
+            error=error,
+            status=STATUS_CHECKED,
+            timings=timer.as_dict(),
+        )
+
+    def _prepare(
+        self,
+        options: BuildOptions,
+        timer: PhaseTimer,
+        build_runner: Callable[[Any], ToolRunner] | None = None,
+    ) -> _PreparedBuild | BuildResult:
+        """Everything up to Mermaid rendering: config, inputs, fingerprint and the up-to-date check.
+
+        Returns a finished ``BuildResult`` for failures and skipped builds.
+        """
+        resolved = self._resolve(options, timer)
+        if isinstance(resolved, BuildResult):
+            return resolved
+        defaults = resolved.defaults
+        tools_cfg = resolved.tools_cfg
+        scan = resolved.scan
+        output_path = resolved.output_path
+
+        runner = self.tool_runner
+        if runner is None:
+            with timer.phase("tool_resolution"):
+                runner = self.config_cache.tool_runner(resolved.cached_config, build_runner or self._build_tool_runner)
+
+        try:
+            build_log = BuildLog.from_config(resolved.config, self.base_dir)
+            mermaid_cache = MermaidCache.from_config(resolved.config, self.base_dir)
+        except (LogConfigError, CacheConfigError) as exc:
+            return self._fail(EXIT_ARG_ERROR, f"Invalid config: {exc}")
+        cache_dir = mermaid_cache.root
+        build_log.root.mkdir(parents=True, exist_ok=True)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        warnings = list(scan.warnings)
+
+        mermaid_workers = self._mermaid_workers(options, tools_cfg)
+        split_parts = self._split_parts(options, defaults, tools_cfg, scan)
+        with timer.phase("get_versions"):
+            versions = runner.get_versions()
+
+        mermaid_settings: dict[str, str] = {}
+        mermaid_profile = ""
+        mermaid_derive: DerivedPng | None = None
+        if resolved.mermaid_enabled and scan.mermaid_blocks:
+            with timer.phase("mermaid_settings"):
+                renderer_settings = runner.mermaid_settings()
+                mermaid_settings = {**renderer_settings, "format": resolved.mermaid_format}
+                if resolved.mermaid_format == "png":
+                    try:
+                        rasterizer = SvgRasterizer.from_config(tools_cfg)
+                    except RasterizeError as exc:
+                        rasterizer = None
+                        warnings.append(
+                            BuildWarning(code="MERMAID_RASTER_UNAVAILABLE", message=f"{exc}; the browser renders PNGs.")
+                        )
+                    if rasterizer is not None:
+                        # The SVG profile is exactly what an SVG build registers, so both formats share renders.
+                        svg_profile = mermaid_cache.register_profile({**renderer_settings, "format": "svg"})
+                        mermaid_derive = DerivedPng(rasterizer, svg_profile)
+                        mermaid_settings.update(rasterizer.settings())
+                mermaid_profile = mermaid_cache.register_profile(mermaid_settings)
+
+        try:
+            image_optimizer = ImageOptimizer.from_config(resolved.config, self.base_dir)
+        except ImageOptimizeError as exc:
+            image_optimizer = None
+            warnings.append(
+                BuildWarning(code="IMAGE_OPTIMIZE_UNAVAILABLE", message=f"{exc}; images are embedded as is.")
+            )
+
+        manifest = BuildManifest(
+            (self.base_dir / ".cache" / "builds").resolve(),
+            store_enabled=self._as_bool(defaults.get("build_store"), False),
+        )
+        with timer.phase("fingerprint"):
+            fingerprint, fingerprint_inputs = self._build_fingerprint(
+                input_sha=resolved.input_sha,
+                config_sha=resolved.cached_config.sha256,
+                reference_doc_path=resolved.reference_doc_path,
+                versions=versions,
+                postprocess=resolved.docx_profile.settings(),
+                build_options={
+                    "template_type": resolved.selected_type,
+                    "toc": resolved.toc_enabled,
+                    "number_sections": resolved.number_sections,
+                    "page_break_h1": resolved.page_break_h1,
+                    "mermaid": resolved.mermaid_enabled,
+                    "mermaid_format": resolved.mermaid_format,
+                    "mermaid_settings": mermaid_settings,
+                    "split": split_parts > 1,
+                    # Only when enabled, so fingerprints of builds without the stage stay as they were.
+                    **({"images": image_optimizer.settings()} if image_optimizer is not None else {}),
+                },
+            )
+        if not options.force:
+            with timer.phase("up_to_date_check"):
+                up_to_date = manifest.is_up_to_date(output_path, fingerprint)
+                restored = not up_to_date and manifest.restore(output_path, fingerprint)
+            if up_to_date or restored:
+                return BuildResult(
+                    exit_code=EXIT_OK,
+                    output_path=output_path,
+                    warnings=warnings,
+                    status=STATUS_SKIPPED_UP_TO_DATE if up_to_date else STATUS_RESTORED_FROM_STORE,
+                    timings=timer.as_dict(),
+                )
+
+        if not resolved.mermaid_enabled and scan.mermaid_blocks:
+            warnings.append(self._mermaid_skipped_warning())
+
+        return _PreparedBuild(
+            options=options,
+            runner=runner,
+            input_path=resolved.input_path,
+            output_path=output_path,
+            config_path=resolved.config_path,
+            reference_doc_path=resolved.reference_doc_path,
+            build_log=build_log,
+            input_sha=resolved.input_sha,
+            scan=scan,
+            front_matter=resolved.front_matter,
+            markdown_body=resolved.markdown_body,
+            selected_type=resolved.selected_type,
+            toc_enabled=resolved.toc_enabled,
+            number_sections=resolved.number_sections,
+            page_break_h1=resolved.page_break_h1,
+            mermaid_enabled=resolved.mermaid_enabled,
+            mermaid_format=resolved.mermaid_format,
+            output_hash=resolved.output_hash,
+            mermaid_workers=mermaid_workers,
+            mermaid_cache=mermaid_cache,
+            mermaid_profile=mermaid_profile,
+            mermaid_retry=self._mermaid_retry(tools_cfg),
+            split_parts=split_parts,
+            versions=versions,
+            manifest=manifest,
+            fingerprint=fingerprint,
+            fingerprint_inputs=fingerprint_inputs,
+            docx_profile=resolved.docx_profile,
+            warnings=warnings,
+            mermaid_derive=mermaid_derive,
+            image_optimizer=image_optimizer,
+        )
+
+    def _resolve(self, options: BuildOptions, timer: PhaseTimer) -> _ResolvedInputs | BuildResult:
+        """Config, input, front matter, template and scan: the stages that need no tools and write nothing."""
         input_path = options.input_path.expanduser().resolve()
         output_path = options.output_path.expanduser().resolve()
 
@@ -49,59 +423,25 @@ class BuildService:
             return self._fail(EXIT_ARG_ERROR, f"Config not found: {config_path}")
 
         try:
-            config = self._load_yaml(config_path)
+            with timer.phase("config_load"):
+                cached_config = self.config_cache.load(config_path)
         except Exception as exc:
             return self._fail(EXIT_ARG_ERROR, f"Invalid config YAML: {exc}")
 
-        templates = config.get("templates", {})
-        defaults = config.get("defaults", {})
-        tools_cfg = config.get("tools", {})
+        config = cached_config.config
+        templates = cached_config.templates
+        defaults = cached_config.defaults
+        tools_cfg = cached_config.tools
         if not isinstance(templates, dict) or not templates:
             return self._fail(EXIT_ARG_ERROR, "templates config is empty or invalid")
 
-        runner = self.tool_runner
-        if runner is None:
-            pandoc_path = self._resolve_tool_path(tools_cfg, "pandoc")
-            mmdc_path = self._resolve_tool_path(tools_cfg, "mmdc")
-            browser_executable = self._resolve_tool_path(tools_cfg, "browser_executable")
-            puppeteer_cache_dir = self._resolve_tool_path(tools_cfg, "puppeteer_cache_dir")
-            edge_fallback = self._as_bool(
-                tools_cfg.get("edge_fallback") if isinstance(tools_cfg, dict) else None,
-                True,
-            )
-            if edge_fallback and not browser_executable:
-                browser_executable = self._detect_windows_edge_path()
-            mmdc_config_path: str | None = None
-            puppeteer_config_path: str | None = None
-            if isinstance(tools_cfg, dict) and tools_cfg.get("mmdc_config"):
-                mmdc_cfg = Path(str(tools_cfg.get("mmdc_config")))
-                if not mmdc_cfg.is_absolute():
-                    mmdc_cfg = (self.base_dir / mmdc_cfg).resolve()
-                mmdc_config_path = str(mmdc_cfg)
-            else:
-                default_cfg = (self.base_dir / "config" / "mermaid.json").resolve()
-                if default_cfg.exists():
-                    mmdc_config_path = str(default_cfg)
-            if isinstance(tools_cfg, dict) and tools_cfg.get("puppeteer_config"):
-                pptr_cfg = Path(str(tools_cfg.get("puppeteer_config")))
-                if not pptr_cfg.is_absolute():
-                    pptr_cfg = (self.base_dir / pptr_cfg).resolve()
-                puppeteer_config_path = str(pptr_cfg)
-            else:
-                default_pptr_cfg = (self.base_dir / "config" / "puppeteer.json").resolve()
-                if default_pptr_cfg.exists():
-                    puppeteer_config_path = str(default_pptr_cfg)
-            runner = SubprocessToolRunner(
-                pandoc_path=pandoc_path,
-                mmdc_path=mmdc_path,
-                mmdc_config_path=mmdc_config_path,
-                puppeteer_config_path=puppeteer_config_path,
-                browser_executable_path=browser_executable,
-                puppeteer_cache_dir=puppeteer_cache_dir,
-            )
-
-        raw_markdown = input_path.read_text(encoding="utf-8")
-        front_matter, markdown_body = self._parse_front_matter(raw_markdown)
+        with timer.phase("input_read"):
+            raw_bytes = input_path.read_bytes()
+            input_sha = hashlib.sha256(raw_bytes).hexdigest()
+            raw_markdown = raw_bytes.decode("utf-8")
+        with timer.phase("front_matter"):
+            front_matter, markdown_body = self._parse_front_matter(raw_markdown)
+            body_first_line = raw_markdown.count("\n", 0, len(raw_markdown) - len(markdown_body)) + 1
 
         selected_type = options.template_type or front_matter.get("template") or defaults.get("type", "tech")
         if selected_type not in templates:
@@ -113,7 +453,8 @@ class BuildService:
         if not reference_doc:
             return self._fail(EXIT_TEMPLATE_ERROR, f"Missing reference_doc for template '{selected_type}'")
 
-        reference_doc_path = Path(reference_doc)
+        reference_key = (str(reference_doc), str(options.template_dir or ""), str(self.base_dir))
+        reference_doc_path = cached_config.reference_docs.get(reference_key) or Path(reference_doc)
         if not reference_doc_path.is_absolute():
             if options.template_dir is not None:
                 template_dir = options.template_dir
@@ -134,7 +475,9 @@ class BuildService:
                     reference_doc_path = candidate_from_base
 
         if not reference_doc_path.exists():
+            cached_config.reference_docs.pop(reference_key, None)
             return self._fail(EXIT_TEMPLATE_ERROR, f"Template file not found: {reference_doc_path}")
+        cached_config.reference_docs[reference_key] = reference_doc_path
 
         toc_enabled = self._as_bool(front_matter.get("toc"), self._as_bool(defaults.get("toc"), True))
         mermaid_enabled = options.enable_mermaid and self._as_bool(
@@ -157,58 +500,134 @@ class BuildService:
                 f"Invalid mermaid format '{mermaid_format}'. Allowed: png, svg",
             )
 
-        logs_dir = (self.base_dir / "logs").resolve()
-        cache_dir = (self.base_dir / ".cache" / "mermaid").resolve()
-        logs_dir.mkdir(parents=True, exist_ok=True)
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        warnings = self._detect_table_warnings(markdown_body)
+        output_hash = str(options.output_hash or defaults.get("output_hash") or "sync").strip().lower()
+        if output_hash not in OUTPUT_HASH_MODES:
+            return self._fail(
+                EXIT_ARG_ERROR,
+                f"Invalid output hash mode '{output_hash}'. Allowed: {', '.join(sorted(OUTPUT_HASH_MODES))}",
+            )
 
-        mermaid_rendered = 0
-        if mermaid_enabled:
-            result = self._replace_mermaid_with_image(markdown_body, cache_dir, runner, mermaid_format)
-            if isinstance(result, BuildError):
-                return BuildResult(exit_code=result.code, error=result, warnings=warnings)
-            markdown_body, mermaid_rendered = result
-        elif MERMAID_BLOCK_RE.search(markdown_body):
-            warnings.append(
-                BuildWarning(
-                    code="MERMAID_SKIPPED",
-                    message="Mermaid blocks detected and kept as code blocks because Mermaid rendering is disabled.",
-                )
+        try:
+            docx_profile = DocxProfile.from_config(
+                template_cfg, config, page_break_h1=page_break_h1, toc_enabled=toc_enabled
             )
+        except DocxPostprocessError as exc:
+            return self._fail(EXIT_TEMPLATE_ERROR, f"Template '{selected_type}': {exc}")
 
-        cmd_args = self._pandoc_args(
-            input_markdown="",
+        with timer.phase("markdown_scan"):
+            scan = scan_markdown(markdown_body, first_line=body_first_line)
+
+        return _ResolvedInputs(
+            cached_config=cached_config,
+            config=config,
+            defaults=defaults if isinstance(defaults, dict) else {},
+            tools_cfg=tools_cfg,
+            input_path=input_path,
             output_path=output_path,
-            reference_doc_path=reference_doc_path,
-            resource_paths=[input_path.parent, self.base_dir, cache_dir],
+            config_path=config_path,
+            input_sha=input_sha,
+            front_matter=front_matter,
+            markdown_body=markdown_body,
+            scan=scan,
             selected_type=selected_type,
+            reference_doc_path=reference_doc_path,
             toc_enabled=toc_enabled,
             number_sections=number_sections,
             page_break_h1=page_break_h1,
+            mermaid_enabled=mermaid_enabled,
+            mermaid_format=mermaid_format,
+            output_hash=output_hash,
+            docx_profile=docx_profile,
+        )
+
+    @staticmethod
+    def _mermaid_skipped_warning() -> BuildWarning:
+        return BuildWarning(
+            code="MERMAID_SKIPPED",
+            message="Mermaid blocks detected and kept as code blocks because Mermaid rendering is disabled.",
+        )
+
+    def _pandoc_input(
+        self,
+        prepared: _PreparedBuild,
+        markdown_body: str,
+        output_path: Path | None = None,
+        first_part: bool = True,
+    ) -> tuple[list[str], str]:
+        """Pandoc arguments and the document text to pass as content.
+
+        Later parts of a split document get neither the front matter (title
+        block) nor the table of contents; the first part carries both.
+        """
+        front_matter = prepared.front_matter if first_part else {}
+        cmd_args = self._pandoc_args(
+            output_path=output_path or prepared.output_path,
+            reference_doc_path=prepared.reference_doc_path,
+            resource_paths=[prepared.input_path.parent, self.base_dir, prepared.mermaid_cache.root],
+            selected_type=prepared.selected_type,
+            toc_enabled=prepared.toc_enabled and first_part,
+            number_sections=prepared.number_sections,
             front_matter=front_matter,
         )
 
-        with NamedTemporaryFile("w", suffix=".md", delete=False, encoding="utf-8") as tmp:
-            tmp_path = Path(tmp.name)
-            if front_matter:
-                tmp.write("---\n")
-                tmp.write(yaml.safe_dump(front_matter, sort_keys=False, allow_unicode=True))
-                tmp.write("---\n\n")
-            tmp.write(markdown_body)
+        document = markdown_body
+        if front_matter:
+            header = yaml.safe_dump(front_matter, sort_keys=False, allow_unicode=True)
+            document = f"---\n{header}---\n\n{markdown_body}"
+        return cmd_args, document
 
-        cmd_args[0] = str(tmp_path)
+    def _convert(self, prepared: _PreparedBuild, markdown_body: str, timer: PhaseTimer) -> CompletedProcessLike:
+        """Run pandoc over the document, or over its H1 parts in parallel in large-document mode."""
+        if prepared.split_parts <= 1:
+            cmd_args, document = self._pandoc_input(prepared, markdown_body)
+            return prepared.runner.run_pandoc(cmd_args, input_text=document)
+        with tempfile.TemporaryDirectory(prefix=".docforge-parts-", dir=prepared.output_path.parent) as work_dir:
+            inputs = self._part_inputs(prepared, markdown_body, Path(work_dir))
+            with ThreadPoolExecutor(max_workers=len(inputs)) as pool:
+                procs = list(pool.map(lambda item: prepared.runner.run_pandoc(item[0], input_text=item[1]), inputs))
+            return self._merge_parts(prepared, [part_path for _, _, part_path in inputs], procs, timer)
 
-        try:
-            pandoc_proc = runner.run_pandoc(cmd_args)
-        except ToolRunnerError as exc:
-            tmp_path.unlink(missing_ok=True)
-            return self._fail(EXIT_CONVERT_ERROR, str(exc))
+    def _part_inputs(
+        self, prepared: _PreparedBuild, markdown_body: str, work_dir: Path
+    ) -> list[tuple[list[str], str, Path]]:
+        """Pandoc arguments, content and part output path for each slice of a split document."""
+        parts = split_at_h1(markdown_body, prepared.split_parts)
+        prepared.split_parts = len(parts)
+        inputs = []
+        for part in parts:
+            part_path = work_dir / f"part-{part.index:04d}.docx"
+            cmd_args, document = self._pandoc_input(prepared, part.source, part_path, first_part=part.index == 0)
+            inputs.append((cmd_args, document, part_path))
+        return inputs
 
-        tmp_path.unlink(missing_ok=True)
+    @staticmethod
+    def _merge_parts(
+        prepared: _PreparedBuild,
+        part_paths: list[Path],
+        procs: list[CompletedProcessLike],
+        timer: PhaseTimer,
+    ) -> CompletedProcessLike:
+        """Merge converted parts into the output; the first failed conversion is reported as is."""
+        for proc in procs:
+            if proc.returncode != 0:
+                return proc
+        try:
+            with timer.phase("pandoc.merge"):
+                merge_docx(part_paths, prepared.output_path, lead_marker=SPLIT_MARKER)
+        except DocxMergeError as exc:
+            return CompletedProcessLike(1, "", f"DOCX merge failed: {exc}")
+        return CompletedProcessLike(0, "".join(p.stdout for p in procs), "".join(p.stderr for p in procs))
 
+    def _finish(
+        self,
+        prepared: _PreparedBuild,
+        pandoc_proc: CompletedProcessLike,
+        mermaid_rendered: int,
+        timer: PhaseTimer,
+    ) -> BuildResult:
+        """Check the pandoc result, then write the checksum, manifest entry and the build's metadata."""
+        warnings = prepared.warnings
+        output_path = prepared.output_path
         if pandoc_proc.returncode != 0:
             details = {"stderr": pandoc_proc.stderr.strip(), "stdout": pandoc_proc.stdout.strip()}
             return BuildResult(
@@ -216,45 +635,76 @@ class BuildService:
                 warnings=warnings,
                 error=BuildError(EXIT_CONVERT_ERROR, "pandoc conversion failed", details),
             )
+        try:
+            with timer.phase("postprocess"):
+                title = str(prepared.front_matter.get("title") or "")
+                postprocess = postprocess_docx(output_path, prepared.docx_profile, title=title)
+        except DocxPostprocessError as exc:
+            return BuildResult(
+                exit_code=EXIT_CONVERT_ERROR,
+                warnings=warnings,
+                error=BuildError(EXIT_CONVERT_ERROR, f"DOCX post-processing failed: {exc}"),
+            )
 
-        output_sha = self._sha256_file(output_path)
-        sha_file = logs_dir / "SHA256SUMS"
-        with sha_file.open("a", encoding="utf-8") as fh:
-            fh.write(f"{output_sha}  {output_path}\n")
-
-        versions = runner.get_versions()
+        output_sha: str | None = None
+        sha_file: Path | None = None
+        if prepared.output_hash == "sync":
+            with timer.phase("output_sha"):
+                output_sha = sha256_file(output_path)
+        with timer.phase("records"):
+            if output_sha:
+                sha_file = prepared.build_log.append_checksum(output_sha, output_path)
+            prepared.manifest.record(output_path, prepared.fingerprint, output_sha, prepared.fingerprint_inputs)
+        if prepared.output_hash == "deferred":
+            sha_file = prepared.build_log.checksums_path
+            self._defer_output_hash(prepared)
 
         build_meta = {
             "schema_version": META_SCHEMA_VERSION,
-            "input": str(input_path),
+            "input": str(prepared.input_path),
             "output": str(output_path),
-            "input_sha256": self._sha256_file(input_path),
+            "input_sha256": prepared.input_sha,
             "output_sha256": output_sha,
-            "template_type": selected_type,
-            "reference_doc": str(reference_doc_path),
-            "config": str(config_path),
+            "output_hash": prepared.output_hash,
+            "template_type": prepared.selected_type,
+            "reference_doc": str(prepared.reference_doc_path),
+            "config": str(prepared.config_path),
             "options": {
-                "toc": toc_enabled,
-                "number_sections": number_sections,
-                "page_break_h1": page_break_h1,
-                "mermaid": mermaid_enabled,
-                "mermaid_format": mermaid_format,
-                "verbose": options.verbose,
+                "toc": prepared.toc_enabled,
+                "number_sections": prepared.number_sections,
+                "page_break_h1": prepared.page_break_h1,
+                "mermaid": prepared.mermaid_enabled,
+                "mermaid_format": prepared.mermaid_format,
+                "split_parts": prepared.split_parts,
+                "verbose": prepared.options.verbose,
+            },
+            "front_matter": self._json_safe(prepared.front_matter),
+            "markdown": {
+                "lines": prepared.scan.lines,
+                "code_blocks": prepared.scan.code_blocks,
+                "html_tables": prepared.scan.html_tables,
             },
-            "front_matter": self._json_safe(front_matter),
             "mermaid": {
-                "blocks_detected": len(MERMAID_BLOCK_RE.findall(raw_markdown)),
+                "blocks_detected": len(prepared.scan.mermaid_blocks),
                 "blocks_rendered": mermaid_rendered,
-                "cache_dir": str(cache_dir),
+                "cache_dir": str(prepared.mermaid_cache.root),
+                "cache": prepared.mermaid_cache.stats(),
+                "cache_profile": prepared.mermaid_profile or None,
+                "workers": prepared.mermaid_workers,
             },
             "warnings": [w.__dict__ for w in warnings],
-            "tool_versions": versions,
+            "tool_versions": prepared.versions,
+            "fingerprint": prepared.fingerprint,
             "generated_at": dt.datetime.now(dt.timezone.utc).isoformat(),
         }
+        build_meta["postprocess"] = postprocess.as_dict()
+        if prepared.image_report is not None:
+            build_meta["images"] = prepared.image_report
+        timings = timer.as_dict()
+        build_meta["timings"] = timings
+        build_meta["events"] = list(timer.events)
 
-        meta_path = logs_dir / "build_meta.json"
-        with meta_path.open("w", encoding="utf-8") as fh:
-            json.dump(build_meta, fh, indent=2, ensure_ascii=False)
+        meta_path = prepared.build_log.write_meta(build_meta, output_path)
 
         return BuildResult(
             exit_code=EXIT_OK,
@@ -262,57 +712,486 @@ class BuildService:
             warnings=warnings,
             meta_path=meta_path,
             sha_path=sha_file,
+            timings=timings,
         )
 
+    def _optimize_images(self, prepared: _PreparedBuild, markdown_body: str) -> str:
+        """Swap local image references for optimized copies; the report goes to ``build_meta.json``."""
+        assert prepared.image_optimizer is not None
+        body, report = prepared.image_optimizer.rewrite(markdown_body, [prepared.input_path.parent, self.base_dir])
+        prepared.image_report = report.as_dict()
+        for failure in report.failures:
+            prepared.warnings.append(
+                BuildWarning(code="IMAGE_OPTIMIZE_FAILED", message=f"{failure}; the image is embedded as is.")
+            )
+        return body
+
+    def _tool_failure(self, exc: ToolRunnerError, timer: PhaseTimer) -> BuildResult:
+        """Conversion failed inside the tool runner; timeouts are recorded as events."""
+        if isinstance(exc, ToolTimeoutError):
+            timer.record_event("pandoc_timeout", message=str(exc))
+        result = self._fail(EXIT_CONVERT_ERROR, str(exc))
+        if timer.events:
+            result.error.details["events"] = list(timer.events)
+        return result
+
+    def wait_for_records(self, timeout: float | None = None) -> bool:
+        """Block until deferred output hashes are recorded; ``False`` if ``timeout`` expired first."""
+        with self._deferred_lock:
+            pending = set(self._deferred)
+        if not pending:
+            return True
+        return not wait(pending, timeout=timeout).not_done
+
+    def _defer_output_hash(self, prepared: _PreparedBuild) -> None:
+        """Hash the output on a background thread, then add its checksum line and manifest hash.
+
+        Nothing is recorded if the output changed while it was hashed (e.g. a
+        newer build replaced it); its manifest entry then simply has no hash
+        and a touched output is rebuilt rather than trusted.
+        """
+        output_path = prepared.output_path
+        stat = output_path.stat()
+
+        def record() -> None:
+            output_sha = sha256_file(output_path)
+            if prepared.manifest.attach_output_sha(output_path, prepared.fingerprint, output_sha, stat):
+                prepared.build_log.append_checksum(output_sha, output_path)
+
+        with self._deferred_lock:
+            if self._hash_pool is None:
+                self._hash_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="docforge-hash")
+            future = self._hash_pool.submit(record)
+            self._deferred.add(future)
+        future.add_done_callback(self._forget_deferred)
+
+    def _forget_deferred(self, future: Future[None]) -> None:
+        with self._deferred_lock:
+            self._deferred.discard(future)
+
+    def _journal(self, options: BuildOptions, result: BuildResult, seconds: float) -> None:
+        """One journal line per run, whatever its outcome; logging never fails a build."""
+        config_path = options.config_path
+        if not config_path.is_absolute():
+            config_path = (self.base_dir / config_path).resolve()
+        try:
+            config = self.config_cache.load(config_path).config
+        except Exception:
+            config = {}
+        entry = {
+            "at": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "status": result.status if result.exit_code == EXIT_OK else "FAILED",
+            "exit_code": result.exit_code,
+            "input": str(options.input_path),
+            "output": str(result.output_path or options.output_path),
+            "meta": str(result.meta_path) if result.meta_path else None,
+            "seconds": round(seconds, 6),
+            "error": result.error.message if result.error else None,
+        }
+        try:
+            BuildLog.from_config(config, self.base_dir).record(entry)
+        except (OSError, LogConfigError):
+            pass
+
+    def _build_fingerprint(
+        self,
+        input_sha: str,
+        config_sha: str,
+        reference_doc_path: Path,
+        versions: dict[str, str],
+        postprocess: dict[str, Any],
+        build_options: dict[str, Any],
+    ) -> tuple[str, dict[str, Any]]:
+        hash_file = self.config_cache.file_sha256
+        inputs: dict[str, Any] = {
+            "docforge": __version__,
+            "input_sha256": input_sha,
+            "config_sha256": config_sha,
+            "reference_doc_sha256": hash_file(reference_doc_path),
+            "postprocess": postprocess,
+            "tool_versions": versions,
+            "options": build_options,
+        }
+        digest = self._sha256_text(json.dumps(inputs, sort_keys=True))
+        return digest, inputs
+
+    def _build_tool_runner(self, tools_cfg: Any) -> ToolRunner:
+        runner_kwargs = self._tool_runner_kwargs(tools_cfg)
+        runner: SubprocessToolRunner
+        if self._mermaid_backend(tools_cfg) == "batch":
+            runner = MermaidBatchToolRunner(**runner_kwargs, node_path=self._resolve_tool_path(tools_cfg, "node"))
+        else:
+            runner = SubprocessToolRunner(**runner_kwargs)
+        if self._pandoc_backend(tools_cfg) == "server":
+            server_url = tools_cfg.get("pandoc_server_url") if isinstance(tools_cfg, dict) else None
+            extra = {"request_timeout": runner_kwargs["pandoc_timeout"]} if runner_kwargs["pandoc_timeout"] else {}
+            return PandocServerToolRunner(runner, server_url=str(server_url) if server_url else None, **extra)
+        return runner
+
+    def _tool_runner_kwargs(self, tools_cfg: Any) -> dict[str, Any]:
+        """Constructor arguments shared by every ``SubprocessToolRunner`` flavour."""
+        pandoc_path = self._resolve_tool_path(tools_cfg, "pandoc")
+        mmdc_path = self._resolve_tool_path(tools_cfg, "mmdc")
+        browser_executable = self._resolve_tool_path(tools_cfg, "browser_executable")
+        puppeteer_cache_dir = self._resolve_tool_path(tools_cfg, "puppeteer_cache_dir")
+        edge_fallback = self._as_bool(
+            tools_cfg.get("edge_fallback") if isinstance(tools_cfg, dict) else None,
+            True,
+        )
+        if edge_fallback and not browser_executable:
+            browser_executable = self._detect_windows_edge_path()
+        mmdc_config_path: str | None = None
+        puppeteer_config_path: str | None = None
+        if isinstance(tools_cfg, dict) and tools_cfg.get("mmdc_config"):
+            mmdc_cfg = Path(str(tools_cfg.get("mmdc_config")))
+            if not mmdc_cfg.is_absolute():
+                mmdc_cfg = (self.base_dir / mmdc_cfg).resolve()
+            mmdc_config_path = str(mmdc_cfg)
+        else:
+            default_cfg = (self.base_dir / "config" / "mermaid.json").resolve()
+            if default_cfg.exists():
+                mmdc_config_path = str(default_cfg)
+        if isinstance(tools_cfg, dict) and tools_cfg.get("puppeteer_config"):
+            pptr_cfg = Path(str(tools_cfg.get("puppeteer_config")))
+            if not pptr_cfg.is_absolute():
+                pptr_cfg = (self.base_dir / pptr_cfg).resolve()
+            puppeteer_config_path = str(pptr_cfg)
+        else:
+            default_pptr_cfg = (self.base_dir / "config" / "puppeteer.json").resolve()
+            if default_pptr_cfg.exists():
+                puppeteer_config_path = str(default_pptr_cfg)
+        pandoc_input = str(tools_cfg.get("pandoc_input") or "stdin") if isinstance(tools_cfg, dict) else "stdin"
+        runner_kwargs: dict[str, Any] = {
+            "pandoc_path": pandoc_path,
+            "mmdc_path": mmdc_path,
+            "mmdc_config_path": mmdc_config_path,
+            "puppeteer_config_path": puppeteer_config_path,
+            "browser_executable_path": browser_executable,
+            "puppeteer_cache_dir": puppeteer_cache_dir,
+            "pandoc_input_mode": pandoc_input.strip().lower(),
+            "pandoc_timeout": self._timeout_setting(tools_cfg, "pandoc_timeout", DEFAULT_PANDOC_TIMEOUT_SECONDS),
+            "mermaid_timeout": self._timeout_setting(tools_cfg, "mermaid_timeout", DEFAULT_MERMAID_TIMEOUT_SECONDS),
+            "version_cache_path": self._resolve_tool_path(
+                {"version_cache": DEFAULT_VERSION_CACHE, **(tools_cfg if isinstance(tools_cfg, dict) else {})},
+                "version_cache",
+            ),
+        }
+        return runner_kwargs
+
+    @staticmethod
+    def _pandoc_backend(tools_cfg: Any) -> str:
+        raw = tools_cfg.get("pandoc_backend") if isinstance(tools_cfg, dict) else None
+        backend = str(raw or "subprocess").strip().lower()
+        return backend if backend in PANDOC_BACKENDS else "subprocess"
+
+    @staticmethod
+    def _mermaid_backend(tools_cfg: Any) -> str:
+        raw = tools_cfg.get("mermaid_backend") if isinstance(tools_cfg, dict) else None
+        backend = str(raw or "mmdc").strip().lower()
+        return backend if backend in MERMAID_BACKENDS else "mmdc"
+
     def _replace_mermaid_with_image(
         self,
         markdown_text: str,
-        cache_dir: Path,
+        cache: MermaidCache,
         runner: ToolRunner,
         image_ext: str,
+        workers: int = 1,
+        profile: str = "",
+        timer: PhaseTimer | None = None,
+        blocks: list[MermaidBlock] | None = None,
+        retry: MermaidRetryPolicy | None = None,
+        derive: DerivedPng | None = None,
     ) -> tuple[str, int] | BuildError:
-        count = 0
-
-        def _replace(match: re.Match[str]) -> str:
-            nonlocal count
-            count += 1
-            source = match.group(1).strip() + "\n"
-            digest = self._sha256_text(f"{image_ext}:{source}")
-            mmd_path = cache_dir / f"{digest}.mmd"
-            image_path = cache_dir / f"{digest}.{image_ext}"
-            if not image_path.exists():
-                mmd_path.write_text(source, encoding="utf-8")
-                try:
-                    mermaid_proc = runner.run_mermaid(mmd_path, image_path)
-                except ToolRunnerError as exc:
-                    raise RuntimeError(str(exc))
-                if mermaid_proc.returncode != 0:
-                    msg = (mermaid_proc.stderr or mermaid_proc.stdout).strip() or "Unknown Mermaid rendering error"
-                    raise RuntimeError(f"Mermaid block #{count}: {msg}")
-            return f"![Mermaid diagram {count}]({image_path.resolve().as_uri()})\n"
+        timer = timer or PhaseTimer()
+        retry = retry or MermaidRetryPolicy()
+        if blocks is None:
+            blocks = scan_markdown(markdown_text).mermaid_blocks
+        pending = self._plan_mermaid(blocks, cache, image_ext, profile, timer)
+
+        if pending:
+            failures: list[tuple[int, str]] = []
+            max_workers = max(1, min(workers, len(pending)))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {
+                    pool.submit(
+                        self._timed_render,
+                        timer,
+                        number,
+                        runner,
+                        cache,
+                        digest,
+                        source,
+                        image_ext,
+                        profile,
+                        retry,
+                        derive,
+                    ): number
+                    for digest, (number, source) in pending.items()
+                }
+                for future in as_completed(futures):
+                    error = future.result()
+                    if error is not None:
+                        failures.append((futures[future], error))
+            if failures:
+                number, error = min(failures)
+                return self._mermaid_failure(number, error, timer)
+
+        return self._substitute_mermaid(markdown_text, blocks, cache, image_ext, profile), len(blocks)
+
+    @staticmethod
+    def _mermaid_failure(number: int, error: str, timer: PhaseTimer) -> BuildError:
+        details = {"events": list(timer.events)} if timer.events else {}
+        return BuildError(EXIT_MERMAID_ERROR, f"Mermaid block #{number}: {error}", details)
+
+    def _plan_mermaid(
+        self,
+        blocks: list[MermaidBlock],
+        cache: MermaidCache,
+        image_ext: str,
+        profile: str,
+        timer: PhaseTimer,
+    ) -> dict[str, tuple[int, str]]:
+        """Pass 1: look every distinct diagram up in the cache.
 
+        Returns the misses to render as ``digest -> (block number, source)``.
+        """
+        seen: set[str] = set()
+        pending: dict[str, tuple[int, str]] = {}
+        for block in blocks:
+            digest = self._mermaid_digest(block, image_ext)
+            if digest in seen:
+                continue
+            seen.add(digest)
+            started = time.perf_counter()
+            hit = cache.lookup(digest, image_ext, profile) is not None
+            elapsed = time.perf_counter() - started
+            timer.add("mermaid.cache_lookup", elapsed)
+            if hit:
+                timer.record_block(block.number, "hit", elapsed)
+            else:
+                pending[digest] = (block.number, block.source)
+        return pending
+
+    @classmethod
+    def _substitute_mermaid(
+        cls,
+        markdown_text: str,
+        blocks: list[MermaidBlock],
+        cache: MermaidCache,
+        image_ext: str,
+        profile: str,
+    ) -> str:
+        """Pass 2: swap every block for its cached image."""
+        parts: list[str] = []
+        cursor = 0
+        for block in blocks:
+            image_path = cache.image_path(cls._mermaid_digest(block, image_ext), image_ext, profile)
+            parts.append(markdown_text[cursor : block.start])
+            parts.append(f"![Mermaid diagram {block.number}]({image_path.resolve().as_uri()})\n")
+            cursor = block.end
+        parts.append(markdown_text[cursor:])
+        return "".join(parts)
+
+    @classmethod
+    def _mermaid_digest(cls, block: MermaidBlock, image_ext: str) -> str:
+        return cls._sha256_text(f"{image_ext}:{block.source}")
+
+    def _timed_render(
+        self,
+        timer: PhaseTimer,
+        number: int,
+        runner: ToolRunner,
+        cache: MermaidCache,
+        digest: str,
+        source: str,
+        image_ext: str,
+        profile: str,
+        retry: MermaidRetryPolicy,
+        derive: DerivedPng | None = None,
+    ) -> str | None:
+        started = time.perf_counter()
+        outcome = "miss"
         try:
-            converted = MERMAID_BLOCK_RE.sub(_replace, markdown_text)
-        except RuntimeError as exc:
-            return BuildError(EXIT_MERMAID_ERROR, str(exc))
+            if derive is not None:
+                outcome, error = self._derive_png(timer, number, runner, cache, digest, source, profile, retry, derive)
+                return error
+            # Another build (thread or process) may be rendering the same diagram right now.
+            with cache.render_lock(digest, image_ext, profile):
+                if cache.adopt(digest, image_ext, profile):
+                    outcome = "joined"
+                    return None
+                return self._render_with_retry(timer, number, runner, cache, digest, source, image_ext, profile, retry)
+        except OSError as exc:
+            # Cache lock or file trouble fails this block, not the whole run.
+            return f"Mermaid cache I/O failed: {exc}"
+        finally:
+            elapsed = time.perf_counter() - started
+            # Nested in "mermaid" and summed across worker threads, so it can exceed that wall time.
+            timer.add("mermaid.render", elapsed)
+            timer.record_block(number, outcome, elapsed)
+
+    def _derive_png(
+        self,
+        timer: PhaseTimer,
+        number: int,
+        runner: ToolRunner,
+        cache: MermaidCache,
+        digest: str,
+        source: str,
+        profile: str,
+        retry: MermaidRetryPolicy,
+        derive: DerivedPng,
+    ) -> tuple[str, str | None]:
+        """Make the PNG entry from the diagram's SVG, rendering the SVG first if it is not cached.
+
+        Returns the block's cache outcome ("derived" when the SVG was reused) and
+        the error, if any. The two locks are taken one after the other, never
+        nested: lock files are striped, so both entries may share one. SVGs
+        with HTML labels are rendered to PNG by the browser instead, since
+        CairoSVG would drop their text.
+        """
+        svg_digest = self._sha256_text(f"svg:{source}")
+        outcome = "derived"
+        if cache.lookup(svg_digest, "svg", derive.svg_profile) is None:
+            with cache.render_lock(svg_digest, "svg", derive.svg_profile):
+                if not cache.adopt(svg_digest, "svg", derive.svg_profile):
+                    outcome = "miss"
+                    error = self._render_with_retry(
+                        timer, number, runner, cache, svg_digest, source, "svg", derive.svg_profile, retry
+                    )
+                    if error is not None:
+                        return outcome, error
+        with cache.render_lock(digest, "png", profile):
+            if cache.adopt(digest, "png", profile):
+                return "joined", None
+            svg_path = cache.image_path(svg_digest, "svg", derive.svg_profile)
+            if uses_foreign_object(svg_path):
+                self._record_raster_fallback(timer, number)
+                error = self._render_with_retry(timer, number, runner, cache, digest, source, "png", profile, retry)
+                return "miss", error
+            error = self._rasterize(timer, cache, svg_path, digest, profile, derive)
+        return outcome, error
 
-        return converted, count
+    @staticmethod
+    def _record_raster_fallback(timer: PhaseTimer, number: int) -> None:
+        message = "SVG has HTML labels (<foreignObject>); the browser renders the PNG"
+        timer.record_event("mermaid_raster_fallback", block=number, message=message)
+
+    @staticmethod
+    def _raster_fallback_warning(timer: PhaseTimer) -> BuildWarning | None:
+        blocks = sorted(event["block"] for event in timer.events if event["event"] == "mermaid_raster_fallback")
+        if not blocks:
+            return None
+        return BuildWarning(
+            code="MERMAID_RASTER_FALLBACK",
+            message=(
+                f"Mermaid block(s) {', '.join(map(str, blocks))} use HTML labels, which CairoSVG cannot draw; "
+                "the browser rendered their PNGs. Set htmlLabels: false in the Mermaid config to derive them locally."
+            ),
+        )
+
+    @staticmethod
+    def _rasterize(
+        timer: PhaseTimer, cache: MermaidCache, svg_path: Path, digest: str, profile: str, derive: DerivedPng
+    ) -> str | None:
+        staging = cache.staging_path(digest, "png", profile)
+        try:
+            with timer.phase("mermaid.rasterize"):
+                derive.rasterizer.rasterize(svg_path, staging)
+            cache.commit(staging, digest, "png", profile)
+        except (RasterizeError, OSError) as exc:
+            return f"PNG rasterization failed: {exc}"
+        finally:
+            staging.unlink(missing_ok=True)
+        return None
+
+    def _render_with_retry(
+        self,
+        timer: PhaseTimer,
+        number: int,
+        runner: ToolRunner,
+        cache: MermaidCache,
+        digest: str,
+        source: str,
+        image_ext: str,
+        profile: str,
+        retry: MermaidRetryPolicy,
+    ) -> str | None:
+        attempt = 1
+        while True:
+            try:
+                error = self._render_mermaid_block(runner, cache, digest, source, image_ext, profile)
+            except ToolTimeoutError as exc:
+                error = str(exc)
+                timer.record_event("mermaid_timeout", block=number, attempt=attempt, message=error)
+            except ToolRunnerError as exc:
+                return str(exc)  # missing or unstartable tool: retrying cannot help
+            if error is None:
+                return None
+            delay = self._plan_retry(timer, number, attempt, error, retry)
+            if delay is None:
+                return error if attempt == 1 else f"{error} (after {attempt} attempts)"
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _plan_retry(
+        timer: PhaseTimer, number: int, attempt: int, error: str, retry: MermaidRetryPolicy
+    ) -> float | None:
+        delay = retry.next_delay(attempt, error)
+        if delay is not None:
+            timer.record_event(
+                "mermaid_retry", block=number, attempt=attempt + 1, delay_seconds=delay, reason=error[:500]
+            )
+        return delay
+
+    @staticmethod
+    def _render_mermaid_block(
+        runner: ToolRunner,
+        cache: MermaidCache,
+        digest: str,
+        source: str,
+        image_ext: str,
+        profile: str = "",
+    ) -> str | None:
+        """One render attempt; ``ToolRunnerError`` (including timeouts) propagates to the retry loop."""
+        staging = cache.staging_path(digest, image_ext, profile)
+        try:
+            with scratch_input_file(source, suffix=".mmd") as mmd_path:
+                mermaid_proc = runner.run_mermaid(mmd_path, staging)
+            return BuildService._commit_render(mermaid_proc, cache, staging, digest, image_ext, profile)
+        finally:
+            staging.unlink(missing_ok=True)
+
+    @staticmethod
+    def _commit_render(
+        mermaid_proc: CompletedProcessLike,
+        cache: MermaidCache,
+        staging: Path,
+        digest: str,
+        image_ext: str,
+        profile: str,
+    ) -> str | None:
+        """Move a successful render into the cache; returns the error message otherwise."""
+        if mermaid_proc.returncode != 0:
+            return (mermaid_proc.stderr or mermaid_proc.stdout).strip() or "Unknown Mermaid rendering error"
+        if not staging.exists():
+            return "Mermaid renderer reported success but produced no image"
+        cache.commit(staging, digest, image_ext, profile)
+        return None
 
     def _pandoc_args(
         self,
-        input_markdown: str,
         output_path: Path,
         reference_doc_path: Path,
         resource_paths: list[Path],
         selected_type: str,
         toc_enabled: bool,
         number_sections: bool,
-        page_break_h1: bool,
         front_matter: dict[str, Any],
     ) -> list[str]:
-        filters_dir = (self.base_dir / "filters").resolve()
         args = [
-            input_markdown,
             "--from",
             "gfm+yaml_metadata_block",
             "--to",
@@ -321,18 +1200,10 @@ class BuildService:
             str(output_path),
             "--reference-doc",
             str(reference_doc_path),
-            "--lua-filter",
-            str(filters_dir / "toc.lua"),
-            "--lua-filter",
-            str(filters_dir / "pagination.lua"),
             "--resource-path",
             self._join_resource_paths(resource_paths),
             "-M",
             f"template_type={selected_type}",
-            "-M",
-            f"page_break_h1={'true' if page_break_h1 else 'false'}",
-            "-M",
-            f"toc_enabled={'true' if toc_enabled else 'false'}",
         ]
         if toc_enabled:
             args.append("--toc")
@@ -360,6 +1231,61 @@ class BuildService:
             return value != 0
         return default
 
+    @staticmethod
+    def _mermaid_workers(options: BuildOptions, tools_cfg: Any) -> int:
+        raw = options.mermaid_workers
+        if raw is None and isinstance(tools_cfg, dict):
+            raw = tools_cfg.get("mermaid_workers")
+        if raw is None:
+            return min(DEFAULT_MERMAID_WORKERS, os.cpu_count() or 1)
+        try:
+            return max(1, int(raw))
+        except (TypeError, ValueError):
+            return 1
+
+    @staticmethod
+    def _mermaid_retry(tools_cfg: Any) -> MermaidRetryPolicy:
+        cfg = tools_cfg if isinstance(tools_cfg, dict) else {}
+        try:
+            retries = max(0, int(cfg.get("mermaid_retries", DEFAULT_MERMAID_RETRIES)))
+            backoff = max(0.0, float(cfg.get("mermaid_retry_backoff", DEFAULT_MERMAID_RETRY_BACKOFF_SECONDS)))
+        except (TypeError, ValueError):
+            return MermaidRetryPolicy(DEFAULT_MERMAID_RETRIES, DEFAULT_MERMAID_RETRY_BACKOFF_SECONDS)
+        return MermaidRetryPolicy(retries, backoff)
+
+    @staticmethod
+    def _timeout_setting(tools_cfg: Any, key: str, default: float) -> float | None:
+        """Seconds from ``tools.<key>``; absent means ``default``, 0 or null means no limit."""
+        if not isinstance(tools_cfg, dict) or key not in tools_cfg:
+            return default
+        raw = tools_cfg.get(key)
+        try:
+            seconds = float(raw) if raw is not None else 0.0
+        except (TypeError, ValueError):
+            return default
+        return seconds if seconds > 0 else None
+
+    @staticmethod
+    def _split_parts(options: BuildOptions, defaults: Any, tools_cfg: Any, scan: ScanResult) -> int:
+        """Parallel pandoc conversions for this document; 1 converts it in a single pass."""
+        enabled = options.split
+        if enabled is None:
+            raw = defaults.get("split_min_lines") if isinstance(defaults, dict) else None
+            try:
+                min_lines = int(raw or 0)
+            except (TypeError, ValueError):
+                min_lines = 0
+            enabled = min_lines > 0 and scan.lines >= min_lines
+        if not enabled or sum(1 for heading in scan.headings if heading.level == 1) < 2:
+            return 1
+        raw = tools_cfg.get("split_workers") if isinstance(tools_cfg, dict) else None
+        if raw is None:
+            return max(2, min(DEFAULT_SPLIT_WORKERS, os.cpu_count() or 1))
+        try:
+            return max(1, int(raw))
+        except (TypeError, ValueError):
+            return 1
+
     def _resolve_tool_path(self, tools_cfg: Any, key: str) -> str | None:
         if not isinstance(tools_cfg, dict):
             return None
@@ -387,26 +1313,24 @@ class BuildService:
 
     @staticmethod
     def _load_yaml(path: Path) -> dict[str, Any]:
-        with path.open("r", encoding="utf-8") as fh:
-            data = yaml.safe_load(fh) or {}
-        if not isinstance(data, dict):
-            raise ValueError("expected mapping")
-        return data
+        return parse_config(path.read_bytes())
 
     @staticmethod
     def _parse_front_matter(raw_text: str) -> tuple[dict[str, Any], str]:
         if not raw_text.startswith("---\n"):
             return {}, raw_text
-        lines = raw_text.splitlines(keepends=True)
-        end = None
-        for idx in range(1, len(lines)):
-            if lines[idx].strip() == "---":
-                end = idx
+        # Walk only the header lines; the body is sliced once instead of split and re-joined.
+        meta_start = cursor = len("---\n")
+        while cursor < len(raw_text):
+            line_end = raw_text.find("\n", cursor)
+            next_line = len(raw_text) if line_end == -1 else line_end + 1
+            if raw_text[cursor:next_line].strip() == "---":
                 break
-        if end is None:
+            cursor = next_line
+        else:
             return {}, raw_text
-        meta_text = "".join(lines[1:end])
-        body = "".join(lines[end + 1 :])
+        meta_text = raw_text[meta_start:cursor]
+        body = raw_text[next_line:]
         metadata = yaml.safe_load(meta_text) or {}
         if not isinstance(metadata, dict):
             metadata = {}
@@ -427,45 +1351,6 @@ class BuildService:
                 unique.append(rp)
         return os.pathsep.join(unique)
 
-    @staticmethod
-    def _sha256_file(path: Path) -> str:
-        h = hashlib.sha256()
-        with path.open("rb") as fh:
-            for chunk in iter(lambda: fh.read(8192), b""):
-                h.update(chunk)
-        return h.hexdigest()
-
-    @staticmethod
-    def _detect_table_warnings(md_text: str) -> list[BuildWarning]:
-        warnings: list[BuildWarning] = []
-        if re.search(r"<(td|th)[^>]*(rowspan|colspan)=", md_text, flags=re.IGNORECASE):
-            warnings.append(
-                BuildWarning(
-                    code="TABLE_UNSUPPORTED_SPAN",
-                    message="Detected rowspan/colspan in HTML table; MVP does not support merged cells.",
-                )
-            )
-
-        if re.search(r"<table", md_text, flags=re.IGNORECASE) and re.search(
-            r"<table[\s\S]*<table", md_text, flags=re.IGNORECASE
-        ):
-            warnings.append(
-                BuildWarning(
-                    code="TABLE_UNSUPPORTED_NESTED",
-                    message="Detected nested HTML table; MVP does not support nested tables.",
-                )
-            )
-
-        for idx, line in enumerate(md_text.splitlines(), start=1):
-            if "|" in line and len(line) > 160:
-                warnings.append(
-                    BuildWarning(
-                        code="TABLE_POSSIBLY_WIDE",
-                        message=f"Line {idx} looks like a wide table row (>160 chars); Word layout may wrap.",
-                    )
-                )
-        return warnings
-
     @staticmethod
     def _fail(code: int, msg: str) -> BuildResult:
         return BuildResult(exit_code=code, error=BuildError(code, msg))
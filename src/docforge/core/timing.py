@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+TIMINGS_SCHEMA_VERSION = "1.0"
+# Phases timed inside each Mermaid worker thread: their seconds add up across threads
+# (CPU-style time), so they can exceed the wall time of the "mermaid" phase around them.
+THREAD_SUM_PHASES = {"mermaid.render", "mermaid.rasterize"}
+
+
+class PhaseTimer:
+    """Accumulates wall time per build phase using a monotonic clock.
+
+    Phases may be entered several times (and from several threads, as the
+    Mermaid renders are); their durations add up.
+    """
+
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+        self.mermaid_blocks: list[dict[str, Any]] = []
+        self.events: list[dict[str, Any]] = []
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record_block(self, number: int, cache: str, seconds: float) -> None:
+        with self._lock:
+            self.mermaid_blocks.append({"block": number, "cache": cache, "seconds": round(seconds, 6)})
+
+    def record_event(self, event: str, **fields: Any) -> None:
+        """Note something that happened during the build (a tool timeout, a retry) with its time offset."""
+        with self._lock:
+            at = round(time.perf_counter() - self._started, 6)
+            self.events.append({"event": event, "at_seconds": at, **fields})
+
+    def as_dict(self) -> dict[str, Any]:
+        with self._lock:
+            blocks = sorted(self.mermaid_blocks, key=lambda b: b["block"])
+            return {
+                "schema_version": TIMINGS_SCHEMA_VERSION,
+                "clock": "monotonic",
+                "total_seconds": round(time.perf_counter() - self._started, 6),
+                "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+                "mermaid_blocks": blocks,
+            }
+
+
+def sum_timings(timings: list[dict[str, Any]]) -> dict[str, Any]:
+    """Add up per-document ``timings`` sections, e.g. for a batch report."""
+    phases: dict[str, float] = {}
+    total = 0.0
+    for entry in timings:
+        total += float(entry.get("total_seconds") or 0.0)
+        for name, seconds in (entry.get("phases") or {}).items():
+            phases[name] = phases.get(name, 0.0) + float(seconds)
+    return {
+        "schema_version": TIMINGS_SCHEMA_VERSION,
+        "clock": "monotonic",
+        "documents": len(timings),
+        "total_seconds": round(total, 6),
+        "phases": {name: round(seconds, 6) for name, seconds in phases.items()},
+    }
+
+
+def format_profile(timings: dict[str, Any]) -> str:
+    """Human readable breakdown, slowest phase first.
+
+    Shares are of the wall-clock total; phases summed across worker threads
+    get no share and are marked ``sum``.
+    """
+    total = float(timings.get("total_seconds") or 0.0)
+    phases = sorted((timings.get("phases") or {}).items(), key=lambda item: item[1], reverse=True)
+    width = max([len(name) for name, _ in phases] + [5])
+    lines = [f"{'phase'.ljust(width)}  {'seconds':>10}  {'share':>6}"]
+    for name, seconds in phases:
+        if name in THREAD_SUM_PHASES:
+            share = "sum"
+        else:
+            share = f"{seconds / total * 100:5.1f}%" if total else "     -"
+        lines.append(f"{name.ljust(width)}  {seconds:10.4f}  {share:>6}")
+    lines.append(f"{'total'.ljust(width)}  {total:10.4f}")
+    if any(name in THREAD_SUM_PHASES for name, _ in phases):
+        lines.append("sum: added up across Mermaid worker threads, may exceed the wall time of 'mermaid'")
+    return "\n".join(lines)
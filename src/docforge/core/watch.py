@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import glob
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable
+
+from docforge.adapters.tool_runner import ToolRunner
+from docforge.core.batch import BatchRunner, _run_with
+from docforge.core.models import BuildOptions, BuildResult
+
+IMAGE_LINK_RE = re.compile(r"!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+[\"'][^)]*[\"'])?\s*\)")
+DEFAULT_DEBOUNCE_SECONDS = 0.3
+DEFAULT_POLL_SECONDS = 0.5
+
+Signature = tuple[int, int] | None
+ResultCallback = Callable[[BuildOptions, BuildResult, float], None]
+
+
+class Watcher:
+    """Rebuilds documents when they or anything they depend on change.
+
+    Dependencies are polled by mtime and size, so no file system notification
+    package is needed. A change to the config or a reference docx affects
+    every document; a change to an input or one of its linked
+    images only affects that document. Changes are collected until nothing
+    has moved for ``debounce`` seconds, then each affected document is built
+    with the warm service. Unchanged outputs are still skipped by the build
+    manifest and unchanged Mermaid blocks come from the image cache, so only
+    what actually changed is redone. A document is never built twice at once;
+    changes arriving mid-build queue one more build after it finishes.
+    """
+
+    def __init__(
+        self,
+        base_dir: Path,
+        config_path: Path,
+        jobs: list[BuildOptions],
+        tool_runner: ToolRunner | None = None,
+        debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+        poll_interval: float = DEFAULT_POLL_SECONDS,
+        workers: int = 1,
+        on_result: ResultCallback | None = None,
+    ) -> None:
+        self.base_dir = base_dir.resolve()
+        self.config_path = config_path if config_path.is_absolute() else self.base_dir / config_path
+        self.jobs = list(jobs)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.on_result = on_result
+        self.service = BatchRunner.create_service(self.base_dir, self.config_path, tool_runner)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="docforge-watch")
+        self._lock = threading.Lock()
+        self._pending: dict[int, bool] = {}  # job index -> force rebuild
+        self._running: dict[int, Future[None]] = {}
+        self._last_change = 0.0
+        self._snapshot: dict[Path, Signature] = {}
+        self._images: dict[int, set[Path]] = {}
+
+    def shared_dependencies(self) -> set[Path]:
+        """Files every document depends on: config and reference docx files."""
+        paths = {self.config_path.resolve()}
+        template_dirs = {self.base_dir / "templates"}
+        for job in self.jobs:
+            if job.template_dir is not None:
+                template_dirs.add(job.template_dir if job.template_dir.is_absolute() else self.base_dir / job.template_dir)
+        for directory in template_dirs:
+            paths.update(Path(p).resolve() for p in glob.glob(str(directory / "**" / "*.docx"), recursive=True))
+        return paths
+
+    def start(self) -> None:
+        """Take the initial snapshot and queue every document once."""
+        for index in range(len(self.jobs)):
+            self._images[index] = linked_images(self.jobs[index].input_path)
+        self._snapshot = self._take_snapshot()
+        with self._lock:
+            for index in range(len(self.jobs)):
+                self._pending[index] = self._pending.get(index, False)
+
+    def check(self) -> set[int]:
+        """Poll once; queue and return the indexes of documents affected by changes."""
+        current = self._take_snapshot()
+        changed = {path for path in set(current) | set(self._snapshot) if current.get(path) != self._snapshot.get(path)}
+        self._snapshot = current
+        if not changed:
+            return set()
+
+        affected: dict[int, bool] = {}
+        # Everything in the snapshot that no single document owns is a shared dependency.
+        if changed - self._owned_paths():
+            affected = {index: False for index in range(len(self.jobs))}
+        for index, job in enumerate(self.jobs):
+            if job.input_path.resolve() in changed:
+                affected[index] = affected.get(index, False)
+                self._images[index] = linked_images(job.input_path)
+            if changed & self._images.get(index, set()):
+                # Linked images are not part of the build fingerprint, so skip the up-to-date check.
+                affected[index] = True
+        if affected:
+            # Start tracking images an edited document links for the first time.
+            for path in self._owned_paths() - set(self._snapshot):
+                self._snapshot[path] = _signature(path)
+            with self._lock:
+                for index, force in affected.items():
+                    self._pending[index] = self._pending.get(index, False) or force
+                self._last_change = time.monotonic()
+        return set(affected)
+
+    def dispatch(self) -> list[Future[None]]:
+        """Start builds for queued documents that are not already building."""
+        started: list[Future[None]] = []
+        with self._lock:
+            for index in sorted(self._pending):
+                if index in self._running:
+                    continue
+                force = self._pending.pop(index)
+                future = self._pool.submit(self._build, index, force)
+                self._running[index] = future
+                started.append(future)
+        return started
+
+    def flush(self) -> None:
+        """Build everything queued, including follow-up builds, and wait for completion."""
+        while True:
+            started = self.dispatch()
+            with self._lock:
+                running = list(self._running.values())
+            if not started and not running:
+                return
+            for future in running or started:
+                future.result()
+
+    def run(self, stop: threading.Event | None = None) -> None:
+        stop = stop or threading.Event()
+        self.start()
+        self.dispatch()
+        try:
+            while not stop.wait(self.poll_interval):
+                self.check()
+                with self._lock:
+                    quiet = time.monotonic() - self._last_change >= self.debounce
+                if quiet:
+                    self.dispatch()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def _build(self, index: int, force: bool) -> None:
+        job = self.jobs[index]
+        try:
+            result, elapsed = _run_with(self.service, replace(job, force=job.force or force))
+            if self.on_result is not None:
+                self.on_result(job, result, elapsed)
+        finally:
+            with self._lock:
+                self._running.pop(index, None)
+
+    def _owned_paths(self) -> set[Path]:
+        owned = {job.input_path.resolve() for job in self.jobs}
+        for images in self._images.values():
+            owned.update(images)
+        return owned
+
+    def _take_snapshot(self) -> dict[Path, Signature]:
+        paths = self.shared_dependencies() | self._owned_paths()
+        return {path: _signature(path) for path in paths}
+
+
+def linked_images(markdown_path: Path) -> set[Path]:
+    """Local image files referenced from a Markdown document."""
+    try:
+        text = markdown_path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return set()
+    images: set[Path] = set()
+    for target in IMAGE_LINK_RE.findall(text):
+        if "://" in target or target.startswith("data:"):
+            continue
+        path = Path(target)
+        if not path.is_absolute():
+            path = markdown_path.resolve().parent / path
+        images.add(path.resolve())
+    return images
+
+
+def _signature(path: Path) -> Signature:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.async_runner import AsyncToolRunner
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.core.async_service import AsyncBuildService
+from docforge.core.mermaid_cache import MermaidCache
+from docforge.core.models import BuildOptions, EXIT_MERMAID_ERROR, EXIT_OK
+from docforge.core.service import BuildService
+
+
+class TrackingRunner(ToolRunner):
+    """Blocking test double that records how many tool calls overlap."""
+
+    def __init__(self, delay: float = 0.0, fail_marker: str | None = None):
+        self.delay = delay
+        self.fail_marker = fail_marker
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.mermaid_calls = 0
+
+    def _enter(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+
+    def run_pandoc(self, args, input_text=None):
+        self._enter()
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        with self.lock:
+            self.mermaid_calls += 1
+        self._enter()
+        if self.fail_marker and self.fail_marker in input_mmd.read_text(encoding="utf-8"):
+            return CompletedProcessLike(1, "", "parse error")
+        output_svg.write_text("<svg></svg>", encoding="utf-8")
+        return CompletedProcessLike(0, "", "")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _options(root: Path, name: str, text: str) -> BuildOptions:
+    (root / f"{name}.md").write_text(text, encoding="utf-8")
+    return BuildOptions(
+        input_path=root / f"{name}.md",
+        output_path=root / "out" / f"{name}.docx",
+        config_path=ROOT / "config" / "templates.yaml",
+        template_dir=ROOT / "templates",
+        mermaid_format="svg",
+        force=True,
+    )
+
+
+def _doc(*sources: str) -> str:
+    return "# Doc\n\n" + "".join(f"```mermaid\n{source}\n```\n\n" for source in sources)
+
+
+def _test_matches_sync_build_meta() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        text = _doc("graph TD; A-->B", "graph TD; B-->C", "graph TD; A-->B")
+        options = _options(root, "doc", text)
+
+        sync_result = BuildService(base_dir=root, tool_runner=TrackingRunner()).run(options)
+        sync_meta = json.loads(sync_result.meta_path.read_text(encoding="utf-8"))
+        async_result = asyncio.run(AsyncBuildService(base_dir=root, tool_runner=TrackingRunner()).run(options))
+        async_meta = json.loads(async_result.meta_path.read_text(encoding="utf-8"))
+
+        assert sync_result.exit_code == async_result.exit_code == EXIT_OK
+        assert async_result.output_path == sync_result.output_path
+        for volatile in ("generated_at", "timings"):
+            sync_meta.pop(volatile)
+            async_meta.pop(volatile)
+        # The second run finds both diagrams in the cache; everything else is identical.
+        assert async_meta["mermaid"].pop("cache")["hits"] == 2
+        sync_meta["mermaid"].pop("cache")
+        assert async_meta == sync_meta
+
+
+def _test_global_limit_and_block_errors() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        runner = TrackingRunner(delay=0.05)
+        service = AsyncBuildService(base_dir=root, tool_runner=runner, max_concurrency=2)
+        jobs = [_options(root, f"d{i}", _doc(f"graph TD; X{i}-->Y", f"graph TD; Y{i}-->Z")) for i in range(3)]
+
+        async def build_all():
+            return await asyncio.gather(*(service.run(job) for job in jobs))
+
+        results = asyncio.run(build_all())
+        assert [r.exit_code for r in results] == [EXIT_OK] * 3
+        assert runner.max_active == 2
+
+        failing = AsyncBuildService(base_dir=root, tool_runner=TrackingRunner(fail_marker="BROKEN"))
+        result = asyncio.run(failing.run(_options(root, "bad", _doc("graph TD; ok-->fine", "BROKEN"))))
+        assert result.exit_code == EXIT_MERMAID_ERROR
+        assert result.error.message == "Mermaid block #2: parse error"
+
+
+def _test_render_lock_failure_fails_the_block() -> None:
+    def failing_lock(cache, digest, image_ext, profile=""):
+        raise OSError(36, "Resource deadlock avoided")
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        original = MermaidCache.render_lock
+        MermaidCache.render_lock = failing_lock
+        service = AsyncBuildService(base_dir=root, tool_runner=TrackingRunner())
+        try:
+            result = asyncio.run(service.run(_options(root, "locked", _doc("graph TD; A-->B"))))
+        finally:
+            MermaidCache.render_lock = original
+        assert result.exit_code == EXIT_MERMAID_ERROR
+        assert result.error.message.startswith("Mermaid block #1: Mermaid cache I/O failed:")
+
+
+def _test_concurrent_builds_share_one_render() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        runner = TrackingRunner(delay=0.3)
+        service = AsyncBuildService(base_dir=root, tool_runner=runner)
+        jobs = [_options(root, f"s{i}", _doc("graph TD; Shared-->Diagram")) for i in range(4)]
+
+        async def build_all():
+            return await asyncio.gather(*(service.run(job) for job in jobs))
+
+        results = asyncio.run(build_all())
+        assert [r.exit_code for r in results] == [EXIT_OK] * 4
+        assert runner.mermaid_calls == 1
+        assert not service._inflight
+        outcomes = [json.loads(r.meta_path.read_text(encoding="utf-8"))["timings"]["mermaid_blocks"] for r in results]
+        states = [blocks[0]["cache"] for blocks in outcomes]
+        assert states.count("miss") == 1 and "joined" in states and set(states) <= {"hit", "joined", "miss"}
+
+
+def _test_async_runner_pandoc_and_cancellation() -> None:
+    echo = "import sys; data = open(sys.argv[1]).read() if len(sys.argv) > 1 else sys.stdin.read(); print(data.upper())"
+    for mode in ("stdin", "file"):
+        runner = AsyncToolRunner(pandoc_path=sys.executable, pandoc_input_mode=mode)
+        cp = asyncio.run(runner.arun_pandoc(["-c", echo], input_text="héllo"))
+        assert cp.returncode == 0, cp.stderr
+        assert cp.stdout.strip() == "HÉLLO"
+
+    if os.name != "posix":
+        return
+    with tempfile.TemporaryDirectory() as td:
+        pid_file = Path(td) / "child.pid"
+        # The tool spawns a grandchild, like mmdc starting a browser.
+        script = (
+            "import subprocess, sys, time; "
+            "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']); "
+            f"open({str(pid_file)!r}, 'w').write(str(p.pid)); time.sleep(60)"
+        )
+        runner = AsyncToolRunner(pandoc_path=sys.executable)
+
+        async def cancel_midway():
+            task = asyncio.create_task(runner.arun_pandoc(["-c", script]))
+            for _ in range(200):
+                if pid_file.exists() and pid_file.read_text():
+                    break
+                await asyncio.sleep(0.02)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                return True
+            return False
+
+        assert asyncio.run(cancel_midway())
+        grandchild = int(pid_file.read_text())
+        for _ in range(100):
+            if not _running(grandchild):
+                break
+            time.sleep(0.02)
+        assert not _running(grandchild)
+
+
+def _running(pid: int) -> bool:
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return False
+        return True
+    # A killed orphan may linger as a zombie until init reaps it.
+    return "\nState:\tZ" not in status
+
+
+def main() -> int:
+    _test_matches_sync_build_meta()
+    _test_global_limit_and_block_errors()
+    _test_concurrent_builds_share_one_render()
+    _test_render_lock_failure_fails_the_block()
+    _test_async_runner_pandoc_and_cancellation()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.cli.main import build_batch_parser
+from docforge.core.batch import BatchRunner, collect_jobs
+from docforge.core.models import BuildOptions, EXIT_ARG_ERROR, EXIT_OK, EXIT_TEMPLATE_ERROR
+
+# A pandoc stand-in for pool workers, which resolve their tools from the config: copies the reference doc.
+STUB_PANDOC = """\
+    import os, shutil, sys
+    args = sys.argv[1:]
+    if "--version" in args:
+        print("pandoc 3.1.stub")
+        raise SystemExit(0)
+    sys.stdin.read()
+    shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+    with open(os.environ["STUB_PANDOC_LOG"], "a", encoding="utf-8") as fh:
+        fh.write(f"{os.getpid()}\\n")
+"""
+
+
+class WritingRunner(ToolRunner):
+    def run_pandoc(self, args, input_text=None):
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        output_svg.write_text("<svg></svg>", encoding="utf-8")
+        return CompletedProcessLike(0, "", "")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _test_batch_continues_after_failure() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        src = root / "src"
+        (src / "nested").mkdir(parents=True)
+        (src / "a.md").write_text("# A\n", encoding="utf-8")
+        (src / "nested" / "b.md").write_text("---\ntemplate: nope\n---\n# B\n", encoding="utf-8")
+        (src / "nested" / "c.md").write_text("# C\n", encoding="utf-8")
+
+        out = root / "out"
+        template = BuildOptions(
+            input_path=Path(),
+            output_path=Path(),
+            config_path=ROOT / "config" / "templates.yaml",
+            template_dir=ROOT / "templates",
+            enable_mermaid=False,
+        )
+        jobs = collect_jobs([str(src / "**" / "*.md")], None, out, template)
+        assert [j.output_path for j in jobs] == [out / "a.docx", out / "nested" / "b.docx", out / "nested" / "c.docx"]
+
+        runner = BatchRunner(base_dir=root, config_path=template.config_path, tool_runner=WritingRunner())
+        report = runner.run(jobs)
+        codes = [item.exit_code for item in report.items]
+        assert codes == [EXIT_OK, EXIT_TEMPLATE_ERROR, EXIT_OK]
+        assert report.exit_code == EXIT_TEMPLATE_ERROR
+        assert (out / "nested" / "c.docx").exists()
+
+        report_path = BatchRunner.write_report(report, out / "batch_report.json")
+        payload = json.loads(report_path.read_text(encoding="utf-8"))
+        assert payload["total"] == 3
+        assert payload["failed"] == 1
+        assert payload["timings"]["documents"] == 2
+        assert "pandoc" in payload["timings"]["phases"]
+
+
+def _test_manifest_entries() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        (root / "x.md").write_text("# X\n", encoding="utf-8")
+        (root / "y.md").write_text("# Y\n", encoding="utf-8")
+        manifest = root / "manifest.yaml"
+        manifest.write_text(
+            "- x.md\n- input: x.md\n  output: gov/x.docx\n  type: gov\n- x.md\n- input: y.md\n  output: x.docx\n",
+            encoding="utf-8",
+        )
+        template = BuildOptions(
+            input_path=Path(),
+            output_path=Path(),
+            template_type="tech",
+            config_path=ROOT / "config" / "templates.yaml",
+            template_dir=ROOT / "templates",
+            enable_mermaid=False,
+            split=build_batch_parser().parse_args(["--split"]).split,
+        )
+        jobs = collect_jobs([], manifest, root / "out", template)
+        assert all(j.split is True for j in jobs)
+        assert build_batch_parser().parse_args([]).split is None
+        # A repeated entry is listed once; another document writing the same output is kept and reported.
+        assert [(j.input_path.name, j.output_path, j.template_type) for j in jobs] == [
+            ("x.md", root / "out" / "x.docx", "tech"),
+            ("x.md", root / "out" / "gov" / "x.docx", "gov"),
+            ("y.md", root / "out" / "x.docx", "tech"),
+        ]
+
+        report = BatchRunner(base_dir=root, config_path=template.config_path, tool_runner=WritingRunner()).run(jobs)
+        assert [item.exit_code for item in report.items] == [EXIT_OK, EXIT_OK, EXIT_ARG_ERROR]
+        assert "also the output of" in report.items[2].error and str(root / "x.md") in report.items[2].error
+
+
+def _test_process_pool_path() -> None:
+    if os.name == "nt":
+        return
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        stub = root / "pandoc"
+        stub.write_text(f"#!{sys.executable}\n" + textwrap.dedent(STUB_PANDOC), encoding="utf-8")
+        stub.chmod(0o755)
+        log = root / "pandoc.log"
+        config = root / "templates.yaml"
+        text = (ROOT / "config" / "templates.yaml").read_text(encoding="utf-8")
+        config.write_text(
+            text.replace("  pandoc: null", f"  pandoc: {stub}").replace("version_cache: .cache", f"version_cache: {root}"),
+            encoding="utf-8",
+        )
+        for name in ("a", "b", "c", "d"):
+            (root / f"{name}.md").write_text(f"# {name}\n", encoding="utf-8")
+        (root / "bad.md").write_text("---\ntemplate: nope\n---\n# Bad\n", encoding="utf-8")
+        template = BuildOptions(
+            input_path=Path(),
+            output_path=Path(),
+            config_path=config,
+            template_dir=ROOT / "templates",
+            enable_mermaid=False,
+        )
+        jobs = collect_jobs([str(root / "*.md")], None, root / "out", template)
+        os.environ["STUB_PANDOC_LOG"] = str(log)
+        try:
+            report = BatchRunner(base_dir=root, config_path=config, workers=2).run(jobs)
+        finally:
+            del os.environ["STUB_PANDOC_LOG"]
+        codes = {item.input_path.name: item.exit_code for item in report.items}
+        assert codes == {"a.md": 0, "b.md": 0, "bad.md": EXIT_TEMPLATE_ERROR, "c.md": 0, "d.md": 0}, report.items
+        assert all((root / "out" / f"{name}.docx").exists() for name in ("a", "b", "c", "d"))
+        # Conversions ran in the pool's worker processes, not in this one.
+        pids = set(log.read_text(encoding="utf-8").split())
+        assert len(log.read_text(encoding="utf-8").split()) == 4 and str(os.getpid()) not in pids
+        assert all(item.timings for item in report.items if item.exit_code == 0)
+
+
+def main() -> int:
+    _test_batch_continues_after_failure()
+    _test_manifest_entries()
+    _test_process_pool_path()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
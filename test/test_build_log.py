@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.core.build_log import BuildLog, LogConfigError
+from docforge.core.models import BuildOptions, EXIT_ARG_ERROR, EXIT_OK, EXIT_TEMPLATE_ERROR
+from docforge.core.service import BuildService
+
+
+class WritingRunner(ToolRunner):
+    def run_pandoc(self, args, input_text=None):
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        raise AssertionError("no diagrams in this test")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _append_many(root: str, worker: int) -> None:
+    log = BuildLog(Path(root), max_bytes=4096, backups=50)
+    for number in range(100):
+        log.record({"worker": worker, "number": number, "padding": "x" * 40})
+        log.append_checksum(f"{worker:02d}{number:062d}", Path(f"/out/{worker}/{number}.docx"))
+
+
+def _test_parallel_appends_stay_whole() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            list(pool.map(_append_many, [td] * 4, range(4)))
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(_append_many, [td] * 4, range(4, 8)))
+
+        journal = sorted(root.glob("build_journal.jsonl*"))
+        assert len(journal) > 2  # rotated
+        records = [json.loads(line) for path in journal for line in path.read_text(encoding="utf-8").splitlines()]
+        assert sorted((r["worker"], r["number"]) for r in records) == [(w, n) for w in range(8) for n in range(100)]
+        assert all(path.stat().st_size <= 4096 for path in journal)
+        sums = [line for path in root.glob("SHA256SUMS*") for line in path.read_text(encoding="utf-8").splitlines()]
+        assert len(sums) == 800 and all(len(line.split("  ")[0]) == 64 for line in sums)
+
+        small = BuildLog(root / "small", max_bytes=100, backups=2)
+        for number in range(10):
+            small.record({"number": number, "padding": "x" * 60})
+        assert sorted(p.name for p in small.root.glob("build_journal.jsonl*")) == [
+            "build_journal.jsonl",
+            "build_journal.jsonl.1",
+            "build_journal.jsonl.2",
+        ]
+        assert json.loads(small.journal_path.read_text(encoding="utf-8"))["number"] == 9
+
+
+def _test_old_build_meta_expires() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        builds = root / "builds"
+        today = dt.datetime.now(dt.timezone.utc).date()
+        old_day = (today - dt.timedelta(days=31)).strftime("%Y-%m-%d")
+        recent_day = (today - dt.timedelta(days=3)).strftime("%Y-%m-%d")
+        for name in (old_day, recent_day, "notes"):
+            (builds / name).mkdir(parents=True)
+            (builds / name / "x.json").write_text("{}", encoding="utf-8")
+
+        log = BuildLog(root, keep_days=30)
+        meta_path = log.write_meta({"output": "a"}, Path("a.docx"))
+        assert sorted(p.name for p in builds.iterdir()) == sorted([recent_day, "notes", meta_path.parent.name])
+        # Later builds of the day do not scan again; keep_days=None keeps everything.
+        (builds / old_day).mkdir()
+        log.write_meta({"output": "b"}, Path("b.docx"))
+        assert (builds / old_day).exists()
+        assert BuildLog(root, keep_days=None).expire_builds() == []
+        assert BuildLog(root, keep_days=30).expire_builds() == [builds / old_day]
+
+        assert BuildLog.from_config({"logs": {"keep_days": 7}}, root).keep_days == 7
+        assert BuildLog.from_config({"logs": {"keep_days": 0}}, root).keep_days is None
+        assert BuildLog.from_config({}, root).keep_days == 30
+
+
+def _test_service_writes_per_build_meta() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        service = BuildService(base_dir=root, tool_runner=WritingRunner())
+
+        def build(name: str, template: str | None = None):
+            src = root / f"{name}.md"
+            src.write_text(f"# {name}\n", encoding="utf-8")
+            return service.run(
+                BuildOptions(
+                    input_path=src,
+                    output_path=root / "out" / f"{name}.docx",
+                    template_type=template,
+                    config_path=ROOT / "config" / "templates.yaml",
+                    template_dir=ROOT / "templates",
+                )
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(build, [f"doc{i}" for i in range(16)]))
+        assert all(r.exit_code == EXIT_OK for r in results)
+        meta_paths = {r.meta_path for r in results}
+        assert len(meta_paths) == 16 and all(p.parent.parent == root / "logs" / "builds" for p in meta_paths)
+        outputs = {json.loads(p.read_text(encoding="utf-8"))["output"] for p in meta_paths}
+        assert outputs == {str((root / "out" / f"doc{i}.docx").resolve()) for i in range(16)}
+        latest = json.loads((root / "logs" / "build_meta.json").read_text(encoding="utf-8"))
+        assert latest["output"] in outputs
+        assert len((root / "logs" / "SHA256SUMS").read_text(encoding="utf-8").splitlines()) == 16
+
+        assert build("doc0").status == "SKIPPED_UP_TO_DATE"
+        assert build("bad", template="nope").exit_code == EXIT_TEMPLATE_ERROR
+        journal = [json.loads(line) for line in (root / "logs" / "build_journal.jsonl").read_text().splitlines()]
+        assert len(journal) == 18
+        assert [entry["status"] for entry in journal[-2:]] == ["SKIPPED_UP_TO_DATE", "FAILED"]
+        assert journal[-1]["exit_code"] == EXIT_TEMPLATE_ERROR and "nope" in journal[-1]["error"]
+
+
+def _test_invalid_limits_are_argument_errors() -> None:
+    for logs_cfg in ({"keep_days": "soon"}, {"keep_days": 1.5}, {"max_size_mb": "big"}, {"backups": -1}):
+        try:
+            BuildLog.from_config({"logs": logs_cfg}, ROOT)
+        except LogConfigError as exc:
+            assert f"logs.{next(iter(logs_cfg))}" in str(exc)
+        else:
+            raise AssertionError(f"expected LogConfigError for {logs_cfg}")
+    assert BuildLog.from_config({"logs": {"keep_days": "14", "max_size_mb": None}}, ROOT).keep_days == 14
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        text = (ROOT / "config" / "templates.yaml").read_text(encoding="utf-8")
+        for section in ("logs:\n  keep_days: soon\n", "cache:\n  max_size_mb: lots\n"):
+            config = root / "templates.yaml"
+            config.write_text(f"{text}\n{section}", encoding="utf-8")
+            src = root / "doc.md"
+            src.write_text("# Doc\n", encoding="utf-8")
+            result = BuildService(base_dir=root, tool_runner=WritingRunner()).run(
+                BuildOptions(
+                    input_path=src,
+                    output_path=root / "doc.docx",
+                    config_path=config,
+                    template_dir=ROOT / "templates",
+                )
+            )
+            assert result.exit_code == EXIT_ARG_ERROR and "Invalid config" in result.error.message
+            assert not (root / "doc.docx").exists()
+
+
+def main() -> int:
+    _test_parallel_appends_stay_whole()
+    _test_old_build_meta_expires()
+    _test_service_writes_per_build_meta()
+    _test_invalid_limits_are_argument_errors()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,15 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import re
+import shutil
 import sys
+import tempfile
+import threading
+import time
+import urllib.request
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -8,13 +17,27 @@ SRC = ROOT / "src"
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
 
-from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
-from docforge.core.models import BuildOptions, EXIT_TEMPLATE_ERROR
+from docforge.adapters.tool_runner import CompletedProcessLike, SubprocessToolRunner, ToolRunner
+from docforge.core.models import (
+    BuildError,
+    BuildOptions,
+    EXIT_ARG_ERROR,
+    EXIT_MERMAID_ERROR,
+    EXIT_OK,
+    EXIT_TEMPLATE_ERROR,
+    STATUS_BUILT,
+    STATUS_SKIPPED_UP_TO_DATE,
+)
+from docforge.core.config_cache import ConfigCache
+from docforge.core.hashing import MMAP_MIN_BYTES, sha256_file
+from docforge.core.manifest import BuildManifest
+from docforge.core.mermaid_cache import MermaidCache
 from docforge.core.service import BuildService
+from docforge.core.timing import PhaseTimer, format_profile
 
 
 class FakeRunner(ToolRunner):
-    def run_pandoc(self, args):
+    def run_pandoc(self, args, input_text=None):
         return CompletedProcessLike(0, "", "")
 
     def run_mermaid(self, input_mmd, output_svg):
@@ -25,7 +48,354 @@ class FakeRunner(ToolRunner):
         return {"pandoc": "fake", "mmdc": "fake"}
 
 
+class CountingRunner(FakeRunner):
+    def __init__(self, fail_marker=None):
+        self.calls = 0
+        self.fail_marker = fail_marker
+        self._lock = threading.Lock()
+
+    def run_mermaid(self, input_mmd, output_svg):
+        with self._lock:
+            self.calls += 1
+        if self.fail_marker and self.fail_marker in input_mmd.read_text(encoding="utf-8"):
+            return CompletedProcessLike(1, "", "parse error")
+        return super().run_mermaid(input_mmd, output_svg)
+
+
+class WritingRunner(FakeRunner):
+    def __init__(self):
+        self.pandoc_calls = 0
+        self.last_args = None
+        self.last_input = None
+
+    def run_pandoc(self, args, input_text=None):
+        self.pandoc_calls += 1
+        self.last_args = args
+        # Support both modes: content passed directly, or a path as first argument.
+        self.last_input = input_text if input_text is not None else Path(args[0]).read_text(encoding="utf-8")
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+
+def _test_document_passed_as_content() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        doc = root / "doc.md"
+        doc.write_text("---\ntitle: Spec\n---\n# Title\n", encoding="utf-8")
+        runner = WritingRunner()
+        svc = BuildService(base_dir=root, tool_runner=runner)
+        res = svc.run(
+            BuildOptions(
+                input_path=doc,
+                output_path=root / "doc.docx",
+                config_path=ROOT / "config" / "templates.yaml",
+                template_dir=ROOT / "templates",
+            )
+        )
+        assert res.exit_code == EXIT_OK
+        assert runner.last_input.startswith("---\ntitle: Spec\n---\n")
+        assert runner.last_input.endswith("# Title\n")
+        assert not any(arg.endswith(".md") for arg in runner.last_args)
+
+
+def _test_subprocess_runner_input_modes() -> None:
+    echo = "import sys; data = open(sys.argv[1]).read() if len(sys.argv) > 1 else sys.stdin.read(); print(data.upper())"
+    for mode in ("stdin", "file"):
+        runner = SubprocessToolRunner(pandoc_path=sys.executable, pandoc_input_mode=mode)
+        cp = runner.run_pandoc(["-c", echo], input_text="héllo")
+        assert cp.returncode == 0, cp.stderr
+        assert cp.stdout.strip() == "HÉLLO"
+
+
+def _test_tool_versions_probed_once() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        log = root / "probes.log"
+        tool = root / "fake-pandoc"
+        tool.write_text(
+            f"#!{sys.executable}\nopen({str(log)!r}, 'a').write('x')\nprint('fake-pandoc 1.0')\n", encoding="utf-8"
+        )
+        tool.chmod(0o755)
+        cache_file = root / "tool_versions.json"
+
+        runner = SubprocessToolRunner(pandoc_path=str(tool), mmdc_path=None, version_cache_path=str(cache_file))
+        assert runner.get_versions() == {"pandoc": "fake-pandoc 1.0", "mmdc": "unavailable"}
+        runner.get_versions()
+        fresh = SubprocessToolRunner(pandoc_path=str(tool), mmdc_path=None, version_cache_path=str(cache_file))
+        assert fresh.get_versions()["pandoc"] == "fake-pandoc 1.0"
+        assert log.read_text() == "x"
+
+        # A changed binary is probed again.
+        tool.write_text(tool.read_text().replace("1.0", "2.0"), encoding="utf-8")
+        upgraded = SubprocessToolRunner(pandoc_path=str(tool), mmdc_path=None, version_cache_path=str(cache_file))
+        assert upgraded.get_versions()["pandoc"] == "fake-pandoc 2.0"
+        assert log.read_text() == "xx"
+
+
+def _test_incremental_build_skips_unchanged() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        doc = root / "doc.md"
+        doc.write_text("# Title\n\nBody\n", encoding="utf-8")
+        runner = WritingRunner()
+        svc = BuildService(base_dir=root, tool_runner=runner)
+
+        def build(**kwargs):
+            return svc.run(
+                BuildOptions(
+                    input_path=doc,
+                    output_path=root / "out" / "doc.docx",
+                    config_path=ROOT / "config" / "templates.yaml",
+                    template_dir=ROOT / "templates",
+                    **kwargs,
+                )
+            )
+
+        first = build()
+        assert first.status == STATUS_BUILT
+        meta = json.loads(first.meta_path.read_text(encoding="utf-8"))
+        assert meta["timings"]["schema_version"] == "1.0"
+        for phase in ("config_load", "front_matter", "markdown_scan", "get_versions", "pandoc", "output_sha"):
+            assert phase in meta["timings"]["phases"], phase
+        second = build()
+        assert second.exit_code == EXIT_OK
+        assert second.status == STATUS_SKIPPED_UP_TO_DATE
+        assert runner.pandoc_calls == 1
+
+        assert build(force=True).status == STATUS_BUILT
+        doc.write_text("# Title\n\nChanged\n", encoding="utf-8")
+        assert build().status == STATUS_BUILT
+        (root / "out" / "doc.docx").write_bytes(b"tampered")
+        assert build().status == STATUS_BUILT
+        assert runner.pandoc_calls == 4
+
+
+def _test_config_cache_reused_and_invalidated() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        doc = root / "doc.md"
+        doc.write_text("# Title\n", encoding="utf-8")
+        config = root / "templates.yaml"
+        config_text = (ROOT / "config" / "templates.yaml").read_text(encoding="utf-8")
+        config.write_text(config_text, encoding="utf-8")
+        cache = ConfigCache()
+        svc = BuildService(base_dir=root, tool_runner=WritingRunner(), config_cache=cache)
+        options = BuildOptions(
+            input_path=doc, output_path=root / "doc.docx", config_path=config, template_dir=ROOT / "templates"
+        )
+
+        assert svc.run(options).status == STATUS_BUILT
+        assert svc.run(options).status == STATUS_SKIPPED_UP_TO_DATE
+        assert cache.misses == 1 and cache.hits >= 1
+        entry = cache.load(config)
+        assert list(entry.reference_docs.values()) == [(ROOT / "templates" / "tech_template_v1.docx").resolve()]
+
+        builds = []
+        build = lambda tools: builds.append(tools) or WritingRunner()  # noqa: E731
+        runner = cache.tool_runner(entry, build)
+        assert cache.tool_runner(entry, build) is runner and len(builds) == 1
+
+        # A touch keeps the parsed entry; an edit replaces it and changes the build fingerprint.
+        os.utime(config, ns=(1, 1))
+        assert cache.load(config) is entry and cache.misses == 1
+        config.write_text(config_text + "\n# edited\n", encoding="utf-8")
+        assert svc.run(options).status == STATUS_BUILT
+        assert cache.misses == 2 and cache.load(config) is not entry
+        cache.tool_runner(cache.load(config), build)
+        assert len(builds) == 2
+
+        blob = root / "blob.bin"
+        blob.write_bytes(b"a")
+        first = cache.file_sha256(blob)
+        blob.write_bytes(b"b")
+        assert cache.file_sha256(blob) != first
+
+
+def _test_output_hash_modes() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        for size in (0, 3, MMAP_MIN_BYTES + 5):
+            blob = root / f"blob{size}"
+            blob.write_bytes(os.urandom(size))
+            assert sha256_file(blob) == hashlib.sha256(blob.read_bytes()).hexdigest()
+
+        doc = root / "doc.md"
+        doc.write_text("# Title\n", encoding="utf-8")
+        svc = BuildService(base_dir=root, tool_runner=WritingRunner())
+        manifest = BuildManifest(root / ".cache" / "builds")
+        sums = root / "logs" / "SHA256SUMS"
+
+        def build(name: str, mode: str):
+            return svc.run(
+                BuildOptions(
+                    input_path=doc,
+                    output_path=root / f"{name}.docx",
+                    config_path=ROOT / "config" / "templates.yaml",
+                    template_dir=ROOT / "templates",
+                    output_hash=mode,
+                )
+            )
+
+        off = build("off", "off")
+        assert off.status == STATUS_BUILT and "output_sha" not in off.timings["phases"]
+        assert json.loads(off.meta_path.read_text(encoding="utf-8"))["output_sha256"] is None
+        assert manifest.load(root / "off.docx")["output_sha256"] is None and not sums.exists()
+        # Without a recorded hash a touched output is rebuilt instead of re-hashed.
+        os.utime(root / "off.docx", ns=(1, 1))
+        assert build("off", "off").status == STATUS_BUILT
+
+        deferred = build("deferred", "deferred")
+        assert "output_sha" not in deferred.timings["phases"]
+        assert svc.wait_for_records(timeout=10)
+        expected = sha256_file(root / "deferred.docx")
+        assert manifest.load(root / "deferred.docx")["output_sha256"] == expected
+        assert sums.read_text(encoding="utf-8") == f"{expected}  {(root / 'deferred.docx').resolve()}\n"
+
+        assert build("bad", "later").exit_code == EXIT_ARG_ERROR
+
+
+def _mermaid_doc(*sources):
+    return "\n".join(f"```mermaid\n{src}\n```\n" for src in sources)
+
+
+def _test_parallel_mermaid_dedupes_blocks() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        runner = CountingRunner()
+        svc = BuildService(base_dir=ROOT, tool_runner=runner)
+        text = _mermaid_doc("graph TD; A-->B", "graph TD; B-->C", "graph TD; A-->B")
+        cache = MermaidCache(Path(td))
+        converted, count = svc._replace_mermaid_with_image(text, cache, runner, "svg", workers=4)
+        assert count == 3
+        assert runner.calls == 2
+        assert "```mermaid" not in converted
+        assert "Mermaid diagram 3" in converted
+
+        assert cache.stats()["misses"] == 2
+
+        # A second pass is served entirely from the cache.
+        svc._replace_mermaid_with_image(text, cache, runner, "svg", workers=4)
+        assert runner.calls == 2
+        assert cache.stats()["hits"] == 2
+        assert not list(Path(td).glob(".*.tmp.*"))
+
+
+class SlowRunner(CountingRunner):
+    def run_mermaid(self, input_mmd, output_svg):
+        time.sleep(0.3)
+        return super().run_mermaid(input_mmd, output_svg)
+
+
+def _test_concurrent_builds_share_one_render() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        runner = SlowRunner()
+        svc = BuildService(base_dir=ROOT, tool_runner=runner)
+        text = _mermaid_doc("graph TD; A-->Shared")
+        timers = [PhaseTimer() for _ in range(3)]
+
+        def build(timer: PhaseTimer) -> None:
+            # Separate cache objects on one directory, as separate processes or hosts would have.
+            svc._replace_mermaid_with_image(text, MermaidCache(Path(td)), runner, "svg", timer=timer)
+
+        threads = [threading.Thread(target=build, args=(timer,)) for timer in timers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert runner.calls == 1
+        outcomes = sorted(timer.mermaid_blocks[0]["cache"] for timer in timers)
+        assert outcomes.count("miss") == 1 and set(outcomes) <= {"hit", "joined", "miss"}
+        assert "joined" in outcomes
+
+
+class ImageCheckingRunner(WritingRunner):
+    def run_mermaid(self, input_mmd, output_svg):
+        output_svg.write_text("<svg>" + "x" * 600 + "</svg>", encoding="utf-8")
+        return CompletedProcessLike(0, "", "")
+
+    def run_pandoc(self, args, input_text=None):
+        result = super().run_pandoc(args, input_text)
+        uris = re.findall(r"\]\((file:[^)]+)\)", self.last_input)
+        self.missing = [uri for uri in uris if not Path(urllib.request.url2pathname(uri[len("file:"):])).exists()]
+        self.images = len(uris)
+        return result
+
+
+def _test_cache_limits_never_evict_images_before_pandoc() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        config = root / "templates.yaml"
+        text = (ROOT / "config" / "templates.yaml").read_text(encoding="utf-8")
+        config.write_text(text.replace("max_size_mb: 512", "max_size_mb: 0.001"), encoding="utf-8")
+        doc = root / "doc.md"
+        doc.write_text("# Diagrams\n\n" + _mermaid_doc("graph TD; A-->B", "graph TD; B-->C", "graph TD; C-->D"), encoding="utf-8")
+        runner = ImageCheckingRunner()
+        result = BuildService(base_dir=root, tool_runner=runner).run(
+            BuildOptions(
+                input_path=doc,
+                output_path=root / "doc.docx",
+                config_path=config,
+                template_dir=ROOT / "templates",
+                mermaid_format="svg",
+            )
+        )
+        assert result.exit_code == EXIT_OK, result.error
+        assert runner.images == 3
+        assert runner.missing == []
+        # The limit is enforced once the build is done with its images.
+        assert MermaidCache(root / ".cache" / "mermaid").disk_stats()["entries"] <= 1
+
+
+class LockFailingCache(MermaidCache):
+    def render_lock(self, digest, image_ext, profile=""):
+        raise OSError(36, "Resource deadlock avoided")
+
+
+def _test_render_lock_failure_fails_the_block() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        runner = CountingRunner()
+        svc = BuildService(base_dir=ROOT, tool_runner=runner)
+        text = _mermaid_doc("graph TD; A-->B", "graph TD; C-->D")
+        result = svc._replace_mermaid_with_image(text, LockFailingCache(Path(td)), runner, "svg", workers=2)
+        assert isinstance(result, BuildError)
+        assert result.code == EXIT_MERMAID_ERROR
+        assert result.message.startswith("Mermaid block #1: Mermaid cache I/O failed:")
+        assert runner.calls == 0
+
+
+def _test_profile_has_no_share_for_thread_sums() -> None:
+    timings = {"total_seconds": 2.0, "phases": {"mermaid": 1.0, "mermaid.render": 3.0, "pandoc": 0.5}}
+    lines = format_profile(timings).splitlines()
+    rows = {line.split()[0]: line.split()[1:] for line in lines[1:4]}
+    assert rows == {"mermaid.render": ["3.0000", "sum"], "mermaid": ["1.0000", "50.0%"], "pandoc": ["0.5000", "25.0%"]}
+    assert lines[-1].startswith("sum:")
+    assert not format_profile({"total_seconds": 1.0, "phases": {"pandoc": 1.0}}).splitlines()[-1].startswith("sum:")
+
+
+def _test_parallel_mermaid_reports_block_number() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        runner = CountingRunner(fail_marker="BROKEN")
+        svc = BuildService(base_dir=ROOT, tool_runner=runner)
+        text = _mermaid_doc("graph TD; A-->B", "graph TD; BROKEN", "graph TD; C-->D")
+        result = svc._replace_mermaid_with_image(text, MermaidCache(Path(td)), runner, "svg", workers=3)
+        assert isinstance(result, BuildError)
+        assert result.code == EXIT_MERMAID_ERROR
+        assert result.message.startswith("Mermaid block #2:")
+
+
 def main() -> int:
+    _test_parallel_mermaid_dedupes_blocks()
+    _test_parallel_mermaid_reports_block_number()
+    _test_render_lock_failure_fails_the_block()
+    _test_concurrent_builds_share_one_render()
+    _test_cache_limits_never_evict_images_before_pandoc()
+    _test_incremental_build_skips_unchanged()
+    _test_document_passed_as_content()
+    _test_subprocess_runner_input_modes()
+    _test_tool_versions_probed_once()
+    _test_config_cache_reused_and_invalidated()
+    _test_output_hash_modes()
+    _test_profile_has_no_share_for_thread_sums()
+
     svc = BuildService(base_dir=ROOT, tool_runner=FakeRunner())
     opts = BuildOptions(
         input_path=ROOT / "examples" / "sample_tech.md",
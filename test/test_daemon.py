@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.core.daemon import BuildDaemon
+from docforge.core.models import BuildOptions, STATUS_BUILT
+
+
+class GatedRunner(ToolRunner):
+    def __init__(self, gate: threading.Event | None = None):
+        self.gate = gate
+        self.entered = threading.Semaphore(0)
+
+    def run_pandoc(self, args, input_text=None):
+        self.entered.release()
+        if self.gate is not None:
+            self.gate.wait(5)
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        output_svg.write_text("<svg></svg>", encoding="utf-8")
+        return CompletedProcessLike(0, "", "")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _call(daemon: BuildDaemon, method: str, path: str, body: dict | None = None) -> tuple[int, dict]:
+    host, port = daemon.address
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+def _daemon(root: Path, runner: ToolRunner, **kwargs) -> BuildDaemon:
+    daemon = BuildDaemon(base_dir=root, config_path=ROOT / "config" / "templates.yaml", tool_runner=runner, **kwargs)
+    daemon.start(port=0)
+    return daemon
+
+
+def _request(root: Path, name: str) -> dict:
+    (root / f"{name}.md").write_text(f"# {name}\n", encoding="utf-8")
+    return {
+        "input": str(root / f"{name}.md"),
+        "output": str(root / "out" / f"{name}.docx"),
+        "template_dir": str(ROOT / "templates"),
+        "no_mermaid": True,
+    }
+
+
+def _test_build_health_and_metrics() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        daemon = _daemon(root, GatedRunner(), workers=2)
+        try:
+            status, body = _call(daemon, "POST", "/build", _request(root, "a"))
+            assert status == 200, body
+            assert body["status"] == STATUS_BUILT
+            assert (root / "out" / "a.docx").exists()
+
+            status, body = _call(daemon, "POST", "/build", {**_request(root, "b"), "type": "nope"})
+            assert status == 422
+            assert "Unknown template type" in body["error"]
+
+            status, body = _call(daemon, "POST", "/build", {"input": "x.md"})
+            assert status == 400
+
+            status, body = _call(daemon, "GET", "/health")
+            assert status == 200 and body["status"] == "ok" and body["workers"] == 2
+
+            status, metrics = _call(daemon, "GET", "/metrics")
+            assert status == 200
+            assert metrics["requests"] == 2
+            assert metrics["succeeded"] == 1 and metrics["failed"] == 1 and metrics["bad_requests"] == 1
+            assert metrics["statuses"][STATUS_BUILT] == 2
+        finally:
+            daemon.shutdown()
+
+
+def _test_backpressure_and_timeout() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        gate = threading.Event()
+        runner = GatedRunner(gate)
+        daemon = _daemon(root, runner, workers=1, queue_size=1, timeout=10)
+        try:
+            first: list[tuple[int, dict]] = []
+            busy = threading.Thread(target=lambda: first.append(daemon.submit(_options(root, "busy"))))
+            busy.start()
+            assert runner.entered.acquire(timeout=5)
+
+            # The single worker is busy; the next request fills the queue and times out waiting.
+            status, body = daemon.submit(_options(root, "queued"), timeout=0.2)
+            assert status == 504, body
+            status, body = _call(daemon, "POST", "/build", _request(root, "rejected"))
+            assert status == 429, body
+
+            gate.set()
+            busy.join(5)
+            assert first[0][0] == 200
+            metrics = daemon.metrics()
+            assert metrics["rejected"] == 1 and metrics["timed_out"] == 1
+            # The abandoned queued build is dropped instead of being run.
+            assert not (root / "out" / "queued.docx").exists()
+        finally:
+            gate.set()
+            daemon.shutdown()
+
+
+def _options(root: Path, name: str) -> BuildOptions:
+    payload = _request(root, name)
+    return BuildOptions(
+        input_path=Path(payload["input"]),
+        output_path=Path(payload["output"]),
+        config_path=ROOT / "config" / "templates.yaml",
+        template_dir=ROOT / "templates",
+        enable_mermaid=False,
+    )
+
+
+def main() -> int:
+    _test_build_health_and_metrics()
+    _test_backpressure_and_timeout()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
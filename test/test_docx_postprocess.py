@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import json
+import re
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+from xml.etree import ElementTree
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+import yaml
+
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.core import docx_postprocess
+from docforge.core.docx_postprocess import (
+    DocxPostprocessError,
+    DocxProfile,
+    HeaderFooterProfile,
+    iter_body_blocks,
+    postprocess_docx,
+)
+from docforge.core.models import BuildOptions, EXIT_OK, EXIT_TEMPLATE_ERROR
+from docforge.core.service import BuildService
+
+WORDML = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W = f'xmlns:w="{WORDML}"'
+R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+IMAGE = b"\x89PNG" + bytes(range(256)) * 40
+BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+def _paragraph(style: str, text: str) -> str:
+    return f'<w:p><w:pPr><w:pStyle w:val="{style}" /></w:pPr><w:r><w:t>{text}</w:t></w:r></w:p>'
+
+
+def _document(toc: bool = True, headings: int = 3) -> str:
+    blocks = [_paragraph("Title", "Report &amp; &lt;Notes&gt;")]
+    if toc:
+        blocks.append(
+            '<w:sdt><w:sdtPr><w:docPartObj><w:docPartGallery w:val="Table of Contents" /><w:docPartUnique />'
+            "</w:docPartObj></w:sdtPr><w:sdtContent>"
+            + _paragraph("TOCHeading", "Table of Contents")
+            + '<w:p><w:r><w:fldChar w:fldCharType="begin" w:dirty="true" /></w:r></w:p></w:sdtContent></w:sdt>'
+        )
+    for number in range(1, headings + 1):
+        blocks.append(_paragraph("Heading1", f"Chapter {number}"))
+        blocks.append(_paragraph("BodyText", "x &gt; y" * 50))
+        # Only top-level headings start pages.
+        blocks.append("<w:tbl><w:tr><w:tc>" + _paragraph("Heading1", "In a table") + "</w:tc></w:tr></w:tbl>")
+    blocks.append('<w:sectPr><w:pgSz w:w="11906" w:h="16838" /></w:sectPr>')
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f"<w:document {W} {R}><w:body>" + "\n".join(blocks) + "</w:body></w:document>"
+    )
+
+
+def _styles() -> str:
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<w:styles {W}>'
+        '<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:asciiTheme="minorHAnsi" /><w:sz w:val="22"/></w:rPr>'
+        "</w:rPrDefault></w:docDefaults>"
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/>'
+        '<w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri"/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Footer"><w:name w:val="footer"/></w:style>'
+        "</w:styles>"
+    )
+
+
+def _write_docx(path: Path, document: str, header: bool = False, styles: bool = True) -> None:
+    relationships = '<Relationship Id="rId1" Type="x/styles" Target="styles.xml"/>' if styles else ""
+    if header:
+        relationships += (
+            '<Relationship Id="rId7" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/header"'
+            ' Target="header1.xml"/>'
+        )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", '<Types xmlns="x"><Default Extension="xml" ContentType="x"/></Types>')
+        archive.writestr("word/document.xml", document)
+        archive.writestr("word/styles.xml", _styles())
+        empty = '<Relationships xmlns="x"/>'
+        rels = f'<Relationships xmlns="x">{relationships}</Relationships>' if relationships else empty
+        archive.writestr("word/_rels/document.xml.rels", rels)
+        archive.writestr("word/media/image1.png", IMAGE)
+        archive.writestr("word/media/image2.emf", IMAGE)
+
+
+def _profile(**overrides) -> DocxProfile:
+    fields = {
+        "default_font": "FangSong",
+        "line_spacing": 28.0,
+        "toc_style": "gov_toc",
+        "header_footer": HeaderFooterProfile("gov_standard", header="{title}", footer="Page {page} of {pages}"),
+    }
+    fields.update(overrides)
+    return DocxProfile(**fields)
+
+
+def _test_body_blocks_stream_across_chunks() -> None:
+    document = _document()
+    expected = list(iter_body_blocks(iter([document])))
+    for size in (1, 7, 64):
+        chunks = iter([document[i : i + size] for i in range(0, len(document), size)])
+        assert list(iter_body_blocks(chunks)) == expected
+    kinds = [kind for kind, _ in expected]
+    assert kinds[0] == "head" and kinds[-1] == "tail" and set(kinds[1:-1]) == {"block"}
+    assert "".join(text for _, text in expected) == document
+    assert len(expected) == 2 + 2 + 3 * 3 + 1
+    try:
+        list(iter_body_blocks(iter([document[:-40]])))
+    except DocxPostprocessError:
+        pass
+    else:
+        raise AssertionError("expected DocxPostprocessError")
+
+
+def _test_postprocess_applies_profile() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "out.docx"
+        _write_docx(path, _document())
+        docx_postprocess.CHUNK_SIZE, chunk_size = 13, docx_postprocess.CHUNK_SIZE
+        try:
+            report = postprocess_docx(path, _profile(), title="Q3 <Report>")
+        finally:
+            docx_postprocess.CHUNK_SIZE = chunk_size
+        assert report.as_dict() == {
+            "page_breaks": 2,
+            "toc_isolated": True,
+            "styles": ["default_font", "line_spacing", "toc_style"],
+            "parts": ["header", "footer"],
+        }
+        assert [p.name for p in Path(td).iterdir()] == ["out.docx"]
+        with zipfile.ZipFile(path) as archive:
+            assert archive.testzip() is None
+            document = archive.read("word/document.xml").decode("utf-8")
+            styles = archive.read("word/styles.xml").decode("utf-8")
+            relationships = archive.read("word/_rels/document.xml.rels").decode("utf-8")
+            types = archive.read("[Content_Types].xml").decode("utf-8")
+            header = archive.read("word/docforge_header.xml").decode("utf-8")
+            footer = archive.read("word/docforge_footer.xml").decode("utf-8")
+            # Compressed media is stored, not deflated again; other entries keep their compression.
+            assert archive.getinfo("word/media/image1.png").compress_type == zipfile.ZIP_STORED
+            assert archive.getinfo("word/media/image2.emf").compress_type == zipfile.ZIP_DEFLATED
+            assert archive.read("word/media/image1.png") == archive.read("word/media/image2.emf") == IMAGE
+        for part in (document, styles, header, footer):
+            ElementTree.fromstring(part.encode("utf-8"))
+
+        # TOC on its own page, no break before the first chapter, one before each later one.
+        assert re.search(r"</w:sdt>" + re.escape(BREAK) + r"\s*<w:p><w:pPr><w:pStyle w:val=\"Heading1\"", document)
+        assert document.count(BREAK) == 3
+        assert document.index(BREAK + "\n" + _paragraph("Heading1", "Chapter 2")) > 0
+        assert '<w:pStyle w:val="gov_toc" />' in document and "TOCHeading" not in document
+        assert '<w:headerReference xmlns:r="' in document and 'w:type="default" r:id="rId2"/>' in document
+        assert 'r:id="rId3"/><w:pgSz' in document
+
+        assert '<w:rFonts w:ascii="FangSong" w:hAnsi="FangSong" w:eastAsia="FangSong" w:cs="FangSong"/>' in styles
+        assert "minorHAnsi" not in styles and "Calibri" not in styles
+        assert '<w:pPrDefault><w:pPr><w:spacing w:line="560" w:lineRule="atLeast"/></w:pPr></w:pPrDefault>' in styles
+        assert '<w:style w:type="paragraph" w:customStyle="1" w:styleId="gov_toc">' in styles
+
+        assert 'Id="rId2"' in relationships and 'Target="docforge_footer.xml"' in relationships
+        assert types.count("<Override ") == 2
+        assert "Q3 &lt;Report&gt;" in header and '<w:pStyle w:val="Header"/>' not in header
+        assert 'w:instr=" PAGE "' in footer and 'w:instr=" NUMPAGES "' in footer
+        assert '<w:pStyle w:val="Footer"/>' in footer
+
+
+def _test_reference_header_and_options_kept() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "out.docx"
+        _write_docx(path, _document(toc=False), header=True)
+        profile = _profile(page_break_h1=False, toc_enabled=False, line_spacing=1.5, default_font="")
+        report = postprocess_docx(path, profile)
+        assert report.as_dict() == {
+            "page_breaks": 0,
+            "toc_isolated": False,
+            "styles": ["line_spacing"],
+            "parts": ["footer"],
+        }
+        with zipfile.ZipFile(path) as archive:
+            document = archive.read("word/document.xml").decode("utf-8")
+            styles = archive.read("word/styles.xml").decode("utf-8")
+            assert "word/docforge_header.xml" not in archive.namelist()
+        assert BREAK not in document and "headerReference" not in document and "footerReference" in document
+        assert 'w:line="360" w:lineRule="auto"' in styles and "gov_toc" not in styles
+
+        # Minimal reference docs have an empty relationships part.
+        _write_docx(path, _document(), styles=False)
+        postprocess_docx(path, _profile())
+        with zipfile.ZipFile(path) as archive:
+            relationships = archive.read("word/_rels/document.xml.rels").decode("utf-8")
+        ElementTree.fromstring(relationships)
+        assert relationships.startswith('<Relationships xmlns="x">') and relationships.count("<Relationship ") == 2
+
+        path.write_bytes(b"PK not a zip")
+        try:
+            postprocess_docx(path, profile)
+        except DocxPostprocessError:
+            pass
+        else:
+            raise AssertionError("expected DocxPostprocessError")
+
+
+def _test_toc_style_is_escaped_not_a_template() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "out.docx"
+        _write_docx(path, _document())
+        postprocess_docx(path, _profile(toc_style='R&D \\1 "toc"'))
+        with zipfile.ZipFile(path) as archive:
+            document = archive.read("word/document.xml").decode("utf-8")
+            styles = archive.read("word/styles.xml").decode("utf-8")
+        ElementTree.fromstring(document.encode("utf-8"))
+        style_id = 'R&amp;D \\1 &quot;toc&quot;'
+        assert f'<w:pStyle w:val="{style_id}" />' in document and f'w:styleId="{style_id}"' in styles
+        root = ElementTree.fromstring(styles.encode("utf-8"))
+        ids = {el.get(f"{{{WORDML}}}styleId") for el in root.iter(f"{{{WORDML}}}style")}
+        assert 'R&D \\1 "toc"' in ids
+
+
+def _test_profile_from_config() -> None:
+    config = yaml.safe_load((ROOT / "config" / "templates.yaml").read_text(encoding="utf-8"))
+    for name, template_cfg in config["templates"].items():
+        profile = DocxProfile.from_config(template_cfg, config, page_break_h1=True, toc_enabled=True)
+        assert profile.default_font and profile.line_spacing and profile.toc_style == f"{name}_toc"
+        assert profile.header_footer is not None and profile.header_footer.footer
+    gov = DocxProfile.from_config(config["templates"]["gov"], config, page_break_h1=False, toc_enabled=True)
+    assert gov.line_spacing == 28.0 and not gov.page_break_h1 and gov.settings()["version"] == "1"
+    for bad in ({"line_spacing": "double"}, {"header_footer_profile": "missing"}):
+        try:
+            DocxProfile.from_config(bad, config, page_break_h1=True, toc_enabled=True)
+        except DocxPostprocessError:
+            pass
+        else:
+            raise AssertionError(f"expected DocxPostprocessError for {bad}")
+
+
+class DocxRunner(ToolRunner):
+    def __init__(self) -> None:
+        self.args: list[list[str]] = []
+
+    def run_pandoc(self, args, input_text=None):
+        self.args.append(list(args))
+        _write_docx(Path(args[args.index("--output") + 1]), _document())
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        raise AssertionError("no diagrams in this test")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _test_service_postprocesses_output() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        src = root / "doc.md"
+        src.write_text("---\ntitle: Spec\n---\n# One\n\n# Two\n", encoding="utf-8")
+        runner = DocxRunner()
+        options = BuildOptions(
+            input_path=src,
+            output_path=root / "doc.docx",
+            config_path=ROOT / "config" / "templates.yaml",
+            template_dir=ROOT / "templates",
+            template_type="tech",
+            enable_mermaid=False,
+        )
+        result = BuildService(base_dir=root, tool_runner=runner).run(options)
+        assert result.exit_code == EXIT_OK, result.error
+        assert not any(arg.startswith("--lua-filter") for arg in runner.args[0])
+        meta = json.loads(result.meta_path.read_text(encoding="utf-8"))
+        assert meta["postprocess"]["page_breaks"] == 2 and meta["postprocess"]["toc_isolated"]
+        assert "postprocess" in meta["timings"]["phases"]
+        with zipfile.ZipFile(root / "doc.docx") as archive:
+            assert b"Spec" in archive.read("word/docforge_header.xml")
+
+        config = root / "templates.yaml"
+        text = (ROOT / "config" / "templates.yaml").read_text(encoding="utf-8")
+        config.write_text(text.replace("header_footer_profile: tech_standard", "header_footer_profile: nope"), "utf-8")
+        options.config_path = config
+        result = BuildService(base_dir=root, tool_runner=runner).run(options)
+        assert result.exit_code == EXIT_TEMPLATE_ERROR and "nope" in result.error.message
+
+
+def main() -> int:
+    _test_body_blocks_stream_across_chunks()
+    _test_postprocess_applies_profile()
+    _test_reference_header_and_options_kept()
+    _test_toc_style_is_escaped_not_a_template()
+    _test_profile_from_config()
+    _test_service_postprocesses_output()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.core import image_optimize
+from docforge.core.image_optimize import ImageOptimizeError, ImageOptimizer
+from docforge.core.models import BuildOptions, EXIT_OK
+from docforge.core.service import BuildService
+
+
+class HalvingOptimizer(ImageOptimizer):
+    """Stands in for the Pillow encoder: PNGs shrink to half, JPEGs are left alone."""
+
+    encoded: list[str] = []
+
+    def _encode(self, path):
+        HalvingOptimizer.encoded.append(path.name)
+        if path.suffix == ".jpg":
+            return None
+        data = path.read_bytes()
+        return data[: len(data) // 2], ".png"
+
+
+class WritingRunner(ToolRunner):
+    def __init__(self):
+        self.documents: list[str] = []
+
+    def run_pandoc(self, args, input_text=None):
+        self.documents.append(input_text)
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        raise AssertionError("no diagrams in this test")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _test_rewrite_dedupes_and_caches() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        (root / "img").mkdir()
+        (root / "img" / "a.png").write_bytes(b"A" * 1000)
+        (root / "img" / "copy of a.png").write_bytes(b"A" * 1000)
+        (root / "photo.jpg").write_bytes(b"J" * 300)
+        text = (
+            "# Doc\n\n"
+            "![first](img/a.png)\n\n"
+            '![again](<img/a.png> "Title")\n\n'
+            "![copy](img/copy%20of%20a.png)\n\n"
+            "![photo](photo.jpg)\n\n"
+            "![remote](https://example.com/x.png) ![gone](missing.png)\n\n"
+            "1. Step\n\n    ```markdown\n    ![listed](img/a.png)\n    ```\n\n"
+            "```markdown\n![code](img/a.png)\n```\n"
+        )
+        optimizer = HalvingOptimizer(cache_dir=root / "cache")
+        HalvingOptimizer.encoded = []
+        body, report = optimizer.rewrite(text, [root, ROOT])
+
+        cached = next((root / "cache").glob("*.png"))
+        assert body.count(f"]({cached.as_uri()}") == 3
+        assert f'({cached.as_uri()} "Title")' in body
+        assert f"![photo]({(root / 'photo.jpg').resolve().as_uri()})" in body
+        assert "![remote](https://example.com/x.png) ![gone](missing.png)" in body
+        assert body.endswith("```markdown\n![code](img/a.png)\n```\n")
+        assert "    ```markdown\n    ![listed](img/a.png)\n    ```\n" in body
+        assert sorted(HalvingOptimizer.encoded) == ["a.png", "photo.jpg"]
+        assert report.as_dict() == {
+            "references": 6,
+            "images": 2,
+            "optimized": 1,
+            "deduplicated": 1,
+            "cache_hits": 0,
+            "failed": 0,
+            "bytes_before": 1300,
+            "bytes_after": 800,
+            "saved_bytes": 500,
+            "saved_ratio": 0.3846,
+        }
+
+        HalvingOptimizer.encoded = []
+        again, report = optimizer.rewrite(text, [root, ROOT])
+        assert again == body and HalvingOptimizer.encoded == [] and report.cache_hits == 2
+
+        # Other settings are other cache entries.
+        HalvingOptimizer(cache_dir=root / "cache", max_dpi=150).rewrite(text, [root])
+        assert len(list((root / "cache").glob("*.png"))) == 2
+
+
+class FailingOptimizer(ImageOptimizer):
+    """Encoding ``bad.png`` fails the way a Pillow resize or save can."""
+
+    def _encode(self, path):
+        if path.name == "bad.png":
+            raise OSError("broken data stream when writing image file")
+        data = path.read_bytes()
+        return data[: len(data) // 2], ".png"
+
+
+def _test_failures_keep_the_original() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        (root / "bad.png").write_bytes(b"B" * 100)
+        (root / "good.png").write_bytes(b"G" * 100)
+        text = "![bad](bad.png) ![good](good.png)\n"
+        body, report = FailingOptimizer(cache_dir=root / "cache").rewrite(text, [root])
+        assert f"![bad]({(root / 'bad.png').resolve().as_uri()})" in body
+        assert f"![good]({next((root / 'cache').glob('*.png')).as_uri()})" in body
+        assert report.failures == ["bad.png: broken data stream when writing image file"]
+        assert report.as_dict()["failed"] == 1 and report.optimized == 1
+        # A failed encode is not cached as "keep the original": the next build tries again.
+        assert not list((root / "cache").glob("*.keep"))
+
+        # The cache directory cannot be created: every image is embedded as is.
+        (root / "blocked").write_text("not a directory", encoding="utf-8")
+        body, report = FailingOptimizer(cache_dir=root / "blocked" / "cache").rewrite(text, [root])
+        assert report.optimized == 0 and len(report.failures) == 2
+        assert f"![good]({(root / 'good.png').resolve().as_uri()})" in body
+
+
+def _test_from_config() -> None:
+    base = Path("/srv/docs")
+    assert ImageOptimizer.from_config({}, base) is None
+    assert ImageOptimizer.from_config({"images": {"optimize": False}}, base) is None
+    enabled = {"images": {"optimize": True, "max_dpi": 150, "cache_dir": "/tmp/img"}}
+    if image_optimize.Image is None:
+        try:
+            ImageOptimizer.from_config(enabled, base)
+        except ImageOptimizeError as exc:
+            assert "Pillow" in str(exc)
+        else:
+            raise AssertionError("expected ImageOptimizeError")
+    else:
+        optimizer = ImageOptimizer.from_config(enabled, base)
+        assert optimizer.max_dpi == 150 and optimizer.cache_dir == Path("/tmp/img").resolve()
+
+
+def _test_pillow_encoding() -> None:
+    if image_optimize.Image is None:
+        return
+    Image = image_optimize.Image
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        # 4000 px at 96 dpi: displayed at page width (6.5 in), so 6.5 * 220 = 1430 px are enough.
+        Image.new("RGB", (4000, 400), (30, 120, 200)).save(root / "wide.png")
+        optimizer = ImageOptimizer(cache_dir=root / "cache")
+        body, report = optimizer.rewrite("![w](wide.png)\n", [root])
+        assert report.optimized == 1 and report.bytes_after < report.bytes_before
+        with Image.open(next((root / "cache").glob("*.png"))) as out:
+            assert out.size == (1430, 143)
+            assert round(out.info["dpi"][0]) == 220
+
+
+def _test_service_reports_savings() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        config = root / "templates.yaml"
+        text = (ROOT / "config" / "templates.yaml").read_text(encoding="utf-8")
+        config.write_text(text.replace("  optimize: false", "  optimize: true"), encoding="utf-8")
+        if image_optimize.Image is None:
+            (root / "pic.png").write_bytes(b"P" * 400)
+        else:
+            image_optimize.Image.new("RGB", (3000, 300), (200, 40, 40)).save(root / "pic.png")
+        src = root / "doc.md"
+        src.write_text("# Doc\n\n![pic](pic.png)\n", encoding="utf-8")
+        runner = WritingRunner()
+        options = BuildOptions(
+            input_path=src, output_path=root / "doc.docx", config_path=config, template_dir=ROOT / "templates"
+        )
+        result = BuildService(base_dir=root, tool_runner=runner).run(options)
+        assert result.exit_code == EXIT_OK
+        meta = json.loads(result.meta_path.read_text(encoding="utf-8"))
+        if image_optimize.Image is None:
+            assert [w.code for w in result.warnings] == ["IMAGE_OPTIMIZE_UNAVAILABLE"]
+            assert "images" not in meta and "](pic.png)" in runner.documents[-1]
+        else:
+            assert meta["images"]["optimized"] == 1 and meta["images"]["saved_bytes"] > 0
+            assert "images" in meta["timings"]["phases"] and "](pic.png)" not in runner.documents[-1]
+
+
+def main() -> int:
+    _test_rewrite_dedupes_and_caches()
+    _test_failures_keep_the_original()
+    _test_from_config()
+    _test_pillow_encoding()
+    _test_service_reports_savings()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import json
+import re
+import sys
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.core.docx_merge import merge_docx
+from docforge.core.large_document import SPLIT_MARKER, split_at_h1
+from docforge.core.models import BuildOptions, EXIT_OK
+from docforge.core.service import BuildService
+
+DOC = """Preamble before the first chapter.
+
+# One
+
+Intro with a note[^a] and ![diagram](pic.png)
+
+- item
+- item
+
+```
+# not a heading
+```
+
+# Two
+
+Second chapter.
+
+Three
+=====
+
+- other list
+
+# Four
+
+Last note[^b] and ![diagram](pic.png)
+"""
+
+
+class DocxRunner(ToolRunner):
+    """Writes a tiny but structurally real DOCX: one paragraph per line, lists, images, notes, bookmarks."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[list[str], str]] = []
+        self.lock = threading.Lock()
+
+    def run_pandoc(self, args, input_text=None):
+        with self.lock:
+            self.calls.append((list(args), input_text or ""))
+        Path(args[args.index("--output") + 1]).write_bytes(_fake_docx(input_text or ""))
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        raise AssertionError("no diagrams in this test")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _fake_docx(markdown: str) -> bytes:
+    paragraphs = []
+    notes = []
+    for number, line in enumerate(line for line in markdown.splitlines() if line.strip()):
+        inner = f"<w:r><w:t>{line}</w:t></w:r>"
+        if line.startswith("# "):
+            inner = f'<w:bookmarkStart w:id="{number}" w:name="h{number}"/>{inner}<w:bookmarkEnd w:id="{number}"/>'
+        if line.startswith("- "):
+            inner = '<w:pPr><w:numPr><w:numId w:val="1"/></w:numPr></w:pPr>' + inner
+        if "![" in line:
+            inner += '<w:r><w:drawing><wp:docPr id="1" name="Picture"/><a:blip r:embed="rId9"/></w:drawing></w:r>'
+        if "[^" in line:
+            notes.append(f'<w:footnote w:id="{len(notes) + 1}"><w:p><w:r><w:t>{line}</w:t></w:r></w:p></w:footnote>')
+            inner += f'<w:r><w:footnoteReference w:id="{len(notes)}"/></w:r>'
+        paragraphs.append(f"<w:p>{inner}</w:p>")
+    files = {
+        "[Content_Types].xml": '<Types><Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/media/rId9.png" ContentType="image/png"/></Types>',
+        "word/document.xml": "<w:document><w:body>"
+        + "".join(paragraphs)
+        + "<w:sectPr><w:pgSz/></w:sectPr></w:body></w:document>",
+        "word/_rels/document.xml.rels": '<Relationships><Relationship Id="rId1" Type="styles" Target="styles.xml"/>'
+        '<Relationship Id="rId9" Type="image" Target="media/rId9.png"/></Relationships>',
+        "word/numbering.xml": '<w:numbering><w:abstractNum w:abstractNumId="1"><w:lvl/></w:abstractNum>'
+        '<w:num w:numId="1"><w:abstractNumId w:val="1"/></w:num></w:numbering>',
+        "word/footnotes.xml": '<w:footnotes><w:footnote w:type="separator" w:id="-1"/>'
+        + "".join(notes)
+        + "</w:footnotes>",
+        "word/styles.xml": '<w:styles><w:style w:styleId="Normal"></w:style></w:styles>',
+        "word/media/rId9.png": b"\x89PNG" + markdown[:8].encode("utf-8"),
+    }
+    target = tempfile.SpooledTemporaryFile()
+    with zipfile.ZipFile(target, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    target.seek(0)
+    return target.read()
+
+
+def _test_split_at_h1() -> None:
+    parts = split_at_h1(DOC, 3)
+    assert "".join(part.text for part in parts) == DOC
+    # The preamble stays with chapter one; the setext "Three" is a cut point, the fenced "# not a heading" is not.
+    assert [part.text.splitlines()[0] for part in parts] == ["Preamble before the first chapter.", "# Two", "Three"]
+    assert [part.h1_before for part in parts] == [0, 1, 2]
+    assert parts[2].source.startswith(f"# {SPLIT_MARKER}\n\n" * 2 + "Three\n=====")
+    assert len(split_at_h1(DOC, 10)) == 4
+    assert [part.text for part in split_at_h1("# Only\n\ntext\n", 4)] == ["# Only\n\ntext\n"]
+
+
+def _test_merge_keeps_references_consistent() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        paths = []
+        for index, part in enumerate(split_at_h1(DOC, 3)):
+            paths.append(root / f"part{index}.docx")
+            paths[-1].write_bytes(_fake_docx(part.source))
+        merged = root / "merged.docx"
+        merge_docx(paths, merged, lead_marker=SPLIT_MARKER)
+
+        with zipfile.ZipFile(merged) as archive:
+            document = archive.read("word/document.xml").decode("utf-8")
+            rels = archive.read("word/_rels/document.xml.rels").decode("utf-8")
+            numbering = archive.read("word/numbering.xml").decode("utf-8")
+            footnotes = archive.read("word/footnotes.xml").decode("utf-8")
+            types = archive.read("[Content_Types].xml").decode("utf-8")
+            names = archive.namelist()
+
+        texts = re.findall(r"<w:t>([^<]*)</w:t>", document)
+        assert texts == [line for line in DOC.splitlines() if line.strip()]
+        assert SPLIT_MARKER not in document
+        assert document.count("<w:sectPr>") == 1 and document.endswith("</w:sectPr></w:body></w:document>")
+
+        starts = re.findall(r'<w:bookmarkStart w:id="(\d+)"', document)
+        # One, Two, Four and the fake runner's fenced "# not a heading"; placeholders are gone.
+        assert len(starts) == len(set(starts)) == 4
+        drawings = re.findall(r'<wp:docPr id="(\d+)"', document)
+        assert len(set(drawings)) == 2
+        for rel_id in re.findall(r'r:embed="([^"]+)"', document):
+            target = re.search(rf'Id="{rel_id}"[^>]*Target="([^"]+)"', rels).group(1)
+            assert f"word/{target}" in names
+            assert f'PartName="/word/{target}"' in types
+        num_ids = re.findall(r'<w:numId w:val="(\d+)"/>', document)
+        assert len(set(num_ids)) == 2
+        for num_id in num_ids:
+            assert f'<w:num w:numId="{num_id}">' in numbering
+        assert numbering.index("</w:abstractNum>", numbering.rindex("<w:abstractNum ")) < numbering.index("<w:num ")
+        note_ids = re.findall(r'<w:footnoteReference w:id="(\d+)"/>', document)
+        assert note_ids == ["1", "2"]
+        assert "Last note[^b]" in re.search(r'<w:footnote w:id="2">.*?</w:footnote>', footnotes).group(0)
+
+
+def _test_service_split_build() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        src = root / "big.md"
+        src.write_text("---\ntitle: Big\n---\n" + DOC, encoding="utf-8")
+        (root / "pic.png").write_bytes(b"\x89PNG")
+        runner = DocxRunner()
+        options = BuildOptions(
+            input_path=src,
+            output_path=root / "big.docx",
+            config_path=ROOT / "config" / "templates.yaml",
+            template_dir=ROOT / "templates",
+            split=True,
+        )
+        result = BuildService(base_dir=root, tool_runner=runner).run(options)
+        assert result.exit_code == EXIT_OK, result.error
+        meta = json.loads(result.meta_path.read_text(encoding="utf-8"))
+        assert meta["options"]["split_parts"] == 4  # tools.split_workers; one part per H1
+        assert "pandoc.merge" in meta["timings"]["phases"]
+
+        calls = sorted(runner.calls, key=lambda call: SPLIT_MARKER in call[1])
+        first_args, first_text = calls[0]
+        assert "--toc" in first_args and "title=Big" in first_args and first_text.startswith("---\ntitle: Big")
+        for args, text in calls[1:]:
+            assert "--toc" not in args and "title=Big" not in args
+            assert "--number-sections" in args and text.startswith(f"# {SPLIT_MARKER}")
+        with zipfile.ZipFile(result.output_path) as archive:
+            texts = re.findall(r"<w:t>([^<]*)</w:t>", archive.read("word/document.xml").decode("utf-8"))
+        assert texts[:2] == ["---", "title: Big"] and texts[-1].startswith("Last note")
+        # No scratch parts are left next to the output.
+        assert sorted(p.name for p in root.iterdir() if p.name.startswith(".docforge-parts")) == []
+
+        # The mode is part of the fingerprint: a single-pass build of the same input is not "up to date".
+        single = BuildService(base_dir=root, tool_runner=runner).run(
+            BuildOptions(**{**options.__dict__, "split": False})
+        )
+        assert single.status == "BUILT" and single.exit_code == EXIT_OK
+
+
+def main() -> int:
+    _test_split_at_h1()
+    _test_merge_keeps_references_consistent()
+    _test_service_split_build()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.core.markdown_scan import iter_lines, scan_file, scan_lines, scan_markdown
+from docforge.core.models import BuildOptions
+from docforge.core.service import BuildService
+
+DOC = """# Guide
+
+```mermaid
+graph TD; A-->B
+```
+
+````markdown
+Shown as an example, not rendered:
+```mermaid
+graph TD; X-->Y
+```
+````
+
+~~~ Mermaid {theme: dark}
+sequenceDiagram
+  A->>B: hi
+~~~
+
+| a | b |
+|---|---|
+| `|` | x |
+"""
+
+
+class FakeRunner(ToolRunner):
+    def run_pandoc(self, args, input_text=None):
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        output_svg.write_text("<svg></svg>", encoding="utf-8")
+        return CompletedProcessLike(0, "", "")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _test_fences_and_offsets() -> None:
+    result = scan_markdown(DOC)
+    assert result.code_blocks == 3
+    assert [(b.number, b.line, b.source) for b in result.mermaid_blocks] == [
+        (1, 3, "graph TD; A-->B\n"),
+        (2, 14, "sequenceDiagram\n  A->>B: hi\n"),
+    ]
+    first = result.mermaid_blocks[0]
+    assert DOC[first.start : first.end] == "```mermaid\ngraph TD; A-->B\n```"
+
+    # An unclosed fence is code to the end of the document, never a diagram.
+    assert scan_markdown("```mermaid\ngraph TD; A-->B\n").mermaid_blocks == []
+    assert scan_markdown("```mermaid\ngraph TD; A-->B\n").code_blocks == 1
+
+
+def _test_fences_nested_in_lists() -> None:
+    text = (
+        "1. Install\n\n"
+        "    ```mermaid\n"
+        "    graph TD\n"
+        "      A-->B\n"
+        "    ```\n\n"
+        "2. Verify\n\n"
+        "   ```\n"
+        "   <td rowspan=\"2\">code, not a table</td>\n"
+        "   ```\n\n"
+        "```mermaid\ngraph TD; C-->D\n```\n"
+    )
+    result = scan_markdown(text)
+    assert result.code_blocks == 3
+    assert [(b.line, b.source) for b in result.mermaid_blocks] == [
+        (3, "graph TD\n  A-->B\n"),
+        (14, "graph TD; C-->D\n"),
+    ]
+    nested = result.mermaid_blocks[0]
+    # The block starts after the list indent, so an image spliced in stays inside the item.
+    assert text[nested.start - 4 : nested.end] == "    ```mermaid\n    graph TD\n      A-->B\n    ```"
+    assert result.warnings == []
+    assert scan_lines(iter_lines(text)) == result
+
+
+def _test_table_diagnostics() -> None:
+    wide = "| " + " | ".join(["cell"] * 40) + " |"
+    text = (
+        "<table><tr><td>a</td></tr></table>\n"
+        "<table>\n"
+        "<tr><td colspan=\"2\">merged</td></tr>\n"
+        "<tr><td><table><tr><td>inner</td></tr></table></td></tr>\n"
+        "</table>\n"
+        "```\n" + wide + "\n```\n" + wide + "\n"
+    )
+    result = scan_markdown(text, first_line=5)
+    codes = [(w.code, w.message) for w in result.warnings]
+    assert result.html_tables == 3
+    assert codes[0] == (
+        "TABLE_UNSUPPORTED_SPAN",
+        "Detected rowspan/colspan in HTML table (line 7); MVP does not support merged cells.",
+    )
+    assert codes[1][0] == "TABLE_UNSUPPORTED_NESTED" and "(line 8)" in codes[1][1]
+    # The wide row inside the code fence is ignored; the real one is reported with its file line.
+    assert codes[2:] == [
+        ("TABLE_POSSIBLY_WIDE", "Line 13 looks like a wide table row (>160 chars); Word layout may wrap."),
+    ]
+    # Sibling tables are not nested.
+    assert scan_markdown("<table></table>\n<table></table>\n").warnings == []
+
+    # Cell attributes spread over several lines.
+    multiline = "<table>\n<tr>\n<td\n  class=\"x\"\n  rowspan=\"2\">a</td>\n</tr>\n</table>\n"
+    for scanned in (scan_markdown(multiline), scan_lines(iter_lines(multiline))):
+        assert [(w.code, "(line 3)" in w.message) for w in scanned.warnings] == [("TABLE_UNSUPPORTED_SPAN", True)]
+    assert scan_markdown("<table><tr><td\n class=\"x\">a</td></tr></table>\n").warnings == []
+
+
+def _test_file_scan_matches_text_scan() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "doc.md"
+        path.write_bytes(DOC.replace("\n", "\r\n").encode("utf-8"))
+        from_file = scan_file(path)
+        from_text = scan_markdown(path.read_bytes().decode("utf-8"))
+        assert from_file == from_text
+        assert [b.source for b in from_file.mermaid_blocks] == ["graph TD; A-->B\n", "sequenceDiagram\r\n  A->>B: hi\n"]
+
+
+def _test_service_uses_file_line_numbers() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        src = root / "doc.md"
+        src.write_text("---\ntitle: T\n---\n# T\n\n" + "|x" * 100 + "\n" + DOC, encoding="utf-8")
+        result = BuildService(base_dir=root, tool_runner=FakeRunner()).run(
+            BuildOptions(
+                input_path=src,
+                output_path=root / "doc.docx",
+                config_path=ROOT / "config" / "templates.yaml",
+                template_dir=ROOT / "templates",
+                mermaid_format="svg",
+            )
+        )
+        assert result.exit_code == 0, result.error
+        assert [w.message.split(" looks")[0] for w in result.warnings] == ["Line 6"]
+        meta = result.meta_path.read_text(encoding="utf-8")
+        assert '"blocks_detected": 2' in meta and '"blocks_rendered": 2' in meta
+
+
+def main() -> int:
+    _test_fences_and_offsets()
+    _test_fences_nested_in_lists()
+    _test_table_diagnostics()
+    _test_file_scan_matches_text_scan()
+    _test_service_uses_file_line_numbers()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
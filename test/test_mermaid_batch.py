@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters import mermaid_batch
+from docforge.adapters.mermaid_batch import MermaidBatchToolRunner, shutdown_batch_renderers
+from docforge.adapters.tool_runner import ToolRunnerError
+
+# Stand-in for mermaid_batch.js speaking the same JSON-lines protocol.
+FAKE_HELPER = r'''
+import json, os, sys
+print(json.dumps({"ready": True, "pid": os.getpid()}), flush=True)
+for line in sys.stdin:
+    req = json.loads(line)
+    src = open(req["input"], encoding="utf-8").read()
+    if "CRASH" in src:
+        sys.exit(1)
+    if "BROKEN" in src:
+        print(json.dumps({"id": req["id"], "ok": False, "error": "Parse error"}), flush=True)
+        continue
+    with open(req["output"], "w", encoding="utf-8") as fh:
+        fh.write("<svg data-pid='%d'></svg>" % os.getpid())
+    print(json.dumps({"id": req["id"], "ok": True}), flush=True)
+'''
+
+
+def _test_batch_runner_reuses_one_helper() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        helper = root / "helper.py"
+        helper.write_text(FAKE_HELPER, encoding="utf-8")
+        original = mermaid_batch.HELPER_SCRIPT
+        mermaid_batch.HELPER_SCRIPT = helper
+        try:
+            outputs = []
+            for idx in range(3):
+                # A fresh runner per build still shares the warm helper.
+                runner = MermaidBatchToolRunner(mmdc_path=None, node_path=sys.executable)
+                mmd = root / f"d{idx}.mmd"
+                mmd.write_text("graph TD; A-->B\n", encoding="utf-8")
+                out = root / f"d{idx}.svg"
+                cp = runner.run_mermaid(mmd, out)
+                assert cp.returncode == 0
+                outputs.append(out.read_text(encoding="utf-8"))
+            assert len(set(outputs)) == 1
+
+            broken = root / "broken.mmd"
+            broken.write_text("BROKEN\n", encoding="utf-8")
+            cp = runner.run_mermaid(broken, root / "broken.svg")
+            assert cp.returncode == 1
+            assert "Parse error" in cp.stderr
+        finally:
+            shutdown_batch_renderers()
+            mermaid_batch.HELPER_SCRIPT = original
+
+
+def _test_crashed_helper_is_restarted_a_bounded_number_of_times() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        helper = root / "helper.py"
+        helper.write_text(FAKE_HELPER, encoding="utf-8")
+        original = mermaid_batch.HELPER_SCRIPT
+        mermaid_batch.HELPER_SCRIPT = helper
+        good = root / "good.mmd"
+        good.write_text("graph TD; A-->B\n", encoding="utf-8")
+        crash = root / "crash.mmd"
+        crash.write_text("CRASH\n", encoding="utf-8")
+        try:
+            runner = MermaidBatchToolRunner(mmdc_path=None, node_path=sys.executable)
+            runner._mmdc_path = None
+            pids = []
+            for attempt in range(mermaid_batch.MAX_RESTARTS + 1):
+                assert runner.run_mermaid(good, root / "good.svg").returncode == 0
+                pids.append((root / "good.svg").read_text(encoding="utf-8"))
+                try:
+                    runner.run_mermaid(crash, root / "crash.svg")
+                except ToolRunnerError:
+                    pass  # the crashed render falls back to the (missing) mmdc
+                else:
+                    raise AssertionError("expected the crashed render to fall back to mmdc")
+            # Every crash got a fresh helper...
+            assert len(set(pids)) == mermaid_batch.MAX_RESTARTS + 1
+            # ...until the restarts are used up.
+            try:
+                runner.run_mermaid(good, root / "good.svg")
+            except ToolRunnerError as exc:
+                assert "mmdc" in str(exc)
+            else:
+                raise AssertionError("expected fallback to mmdc once out of restarts")
+        finally:
+            shutdown_batch_renderers()
+            mermaid_batch.HELPER_SCRIPT = original
+
+
+def _test_batch_runner_falls_back_to_mmdc() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        runner = MermaidBatchToolRunner(mmdc_path=None, node_path=str(root / "missing-node"))
+        runner._mmdc_path = None
+        mmd = root / "d.mmd"
+        mmd.write_text("graph TD; A-->B\n", encoding="utf-8")
+        try:
+            runner.run_mermaid(mmd, root / "d.svg")
+        except ToolRunnerError as exc:
+            assert "mmdc" in str(exc)
+        else:
+            raise AssertionError("expected fallback to mmdc")
+        shutdown_batch_renderers()
+
+
+def main() -> int:
+    _test_batch_runner_reuses_one_helper()
+    _test_crashed_helper_is_restarted_a_bounded_number_of_times()
+    _test_batch_runner_falls_back_to_mmdc()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
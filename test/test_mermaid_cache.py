@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import SubprocessToolRunner
+from docforge.core.mermaid_cache import CacheConfigError, MermaidCache
+
+
+def _put(cache: MermaidCache, digest: str, size: int) -> Path:
+    staging = cache.staging_path(digest, "png")
+    staging.write_bytes(b"x" * size)
+    return cache.commit(staging, digest, "png")
+
+
+def _render_once(root: str) -> str:
+    cache = MermaidCache(Path(root))
+    if cache.lookup("shared", "svg") is not None:
+        return "hit"
+    with cache.render_lock("shared", "svg"):
+        if cache.adopt("shared", "svg"):
+            return "joined"
+        time.sleep(0.3)
+        staging = cache.staging_path("shared", "svg")
+        staging.write_text("<svg></svg>", encoding="utf-8")
+        cache.commit(staging, "shared", "svg")
+        return "rendered"
+
+
+def _test_render_lock_single_flight_across_processes() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            outcomes = list(pool.map(_render_once, [td] * 4))
+        assert outcomes.count("rendered") == 1, outcomes
+        assert outcomes.count("joined") >= 1
+        cache = MermaidCache(Path(td))
+        assert cache.render_lock_path("shared", "svg") == cache.render_lock_path("shared", "svg", "")
+        assert cache.render_lock_path("shared", "svg").parent == Path(td) / ".locks"
+        assert cache.disk_stats()["entries"] == 1
+
+
+def _test_lru_eviction_keeps_recent_entries() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        cache = MermaidCache(Path(td), max_bytes=250)
+        for digest in ("a", "b", "c"):
+            _put(cache, digest, 100)
+            time.sleep(0.01)
+        # Touch "a" so "b" becomes the least recently used entry.
+        assert cache.lookup("a", "png") is not None
+        cache.flush()
+        # Nothing is evicted while this build still uses the entries.
+        assert cache.disk_stats()["entries"] == 3
+        result = cache.release()
+        assert result["removed"] == 1
+        assert cache.lookup("b", "png") is None
+        assert cache.lookup("a", "png") is not None
+        assert cache.lookup("c", "png") is not None
+
+        index = json.loads((Path(td) / "index.json").read_text(encoding="utf-8"))
+        assert set(index["entries"]) == {"a.png", "c.png"}
+
+
+def _test_prune_keeps_entries_pinned_by_other_builds() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        building = MermaidCache(Path(td))
+        _put(building, "in-use", 100)
+        time.sleep(0.01)
+        other = MermaidCache(Path(td), max_bytes=150)
+        _put(other, "newer", 100)
+        other.flush()
+        building.flush()
+
+        # The size limit would evict the older entry, but a build is still using it.
+        assert other.release()["removed"] == 0
+        assert building.image_path("in-use", "png").exists()
+
+        building.release()
+        assert not list((Path(td) / ".pins").iterdir())
+        assert other.prune()["removed"] == 1
+        assert not building.image_path("in-use", "png").exists()
+
+        # A pin left behind by a crashed build expires.
+        crashed = MermaidCache(Path(td))
+        assert crashed.lookup("newer", "png") is not None
+        stale = time.time() - 2 * 24 * 3600
+        os.utime(crashed._pin_path, (stale, stale))
+        assert other.prune(max_bytes=0)["removed"] == 1
+
+
+def _test_age_limit_and_clear() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        cache = MermaidCache(Path(td))
+        _put(cache, "old", 10)
+        _put(cache, "new", 10)
+        cache.flush()
+        cache._index["old.png"]["last_used"] = time.time() - 3600
+        cache._write_index(cache._index)
+        cache.release()
+
+        assert cache.prune(max_age_seconds=60)["removed"] == 1
+        assert cache.disk_stats()["entries"] == 1
+
+        (Path(td) / ".dead.tmp.png").write_bytes(b"partial")
+        os.utime(Path(td) / ".dead.tmp.png", (time.time() - 7200, time.time() - 7200))
+        assert cache.clear() == {"removed": 1, "freed_bytes": 10, "kept": 0}
+        assert sorted(p.name for p in Path(td).iterdir()) == [".locks", "index.json"]
+
+
+def _test_clear_keeps_entries_pinned_by_other_builds() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        running = MermaidCache(Path(td))
+        _put(running, "in-use", 10)
+        staging = running.staging_path("rendering", "png")
+        staging.write_bytes(b"half")
+        running.flush()
+        other = MermaidCache(Path(td))
+        _put(other, "done", 10)
+        other.flush()
+        other.release()
+
+        assert other.clear() == {"removed": 1, "freed_bytes": 10, "kept": 1}
+        assert running.lookup("in-use", "png") is not None and staging.exists()
+        running.release()
+        assert other.clear()["removed"] == 1
+
+
+def _test_invalid_limits() -> None:
+    for cache_cfg in ({"max_size_mb": "big"}, {"max_age_days": -1}, {"max_size_mb": "nan"}):
+        try:
+            MermaidCache.from_config({"cache": cache_cfg}, ROOT)
+        except CacheConfigError as exc:
+            assert f"cache.{next(iter(cache_cfg))}" in str(exc)
+        else:
+            raise AssertionError(f"expected CacheConfigError for {cache_cfg}")
+    cache = MermaidCache.from_config({"cache": {"max_size_mb": "0.5", "max_age_days": 0}}, ROOT)
+    assert cache.max_bytes == 512 * 1024 and cache.max_age_seconds is None
+
+
+def _test_stats_hit_rate() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        cache = MermaidCache(Path(td))
+        assert cache.lookup("x", "svg") is None
+        staging = cache.staging_path("x", "svg")
+        staging.write_text("<svg/>", encoding="utf-8")
+        cache.commit(staging, "x", "svg")
+        assert cache.lookup("x", "svg") is not None
+        assert cache.stats()["hit_rate"] == 0.5
+
+
+def _test_profiles_live_side_by_side() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        mermaid_cfg = root / "mermaid.json"
+        mermaid_cfg.write_text('{"theme": "default"}', encoding="utf-8")
+        default_settings = SubprocessToolRunner(mmdc_path=None, mmdc_config_path=str(mermaid_cfg)).mermaid_settings()
+        mermaid_cfg.write_text('{"theme": "dark"}', encoding="utf-8")
+        dark_settings = SubprocessToolRunner(mmdc_path=None, mmdc_config_path=str(mermaid_cfg)).mermaid_settings()
+        assert default_settings["mmdc_config_sha256"] != dark_settings["mmdc_config_sha256"]
+
+        cache = MermaidCache(root / "cache", max_bytes=1000)
+        default_profile = cache.register_profile({**default_settings, "format": "png"})
+        dark_profile = cache.register_profile({**dark_settings, "format": "png"})
+        assert default_profile != dark_profile
+
+        for profile in (default_profile, dark_profile):
+            staging = cache.staging_path("same", "png", profile)
+            staging.write_bytes(b"img")
+            cache.commit(staging, "same", "png", profile)
+        cache.flush()
+        assert cache.lookup("same", "png", default_profile) is not None
+        assert cache.lookup("same", "png", dark_profile) is not None
+        assert cache.disk_stats()["entries"] == 2
+        assert (root / "cache" / dark_profile / "settings.json").exists()
+
+        cache.release()
+        assert cache.clear()["removed"] == 2
+        assert sorted(p.name for p in (root / "cache").iterdir()) == [".locks", "index.json"]
+
+
+def main() -> int:
+    _test_lru_eviction_keeps_recent_entries()
+    _test_prune_keeps_entries_pinned_by_other_builds()
+    _test_age_limit_and_clear()
+    _test_clear_keeps_entries_pinned_by_other_builds()
+    _test_invalid_limits()
+    _test_stats_hit_rate()
+    _test_profiles_live_side_by_side()
+    _test_render_lock_single_flight_across_processes()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import base64
+import json
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.pandoc_server import PandocServerToolRunner, _embedded_files
+from docforge.adapters.tool_runner import CompletedProcessLike, SubprocessToolRunner, ToolTimeoutError
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Mimics the pandoc server JSON API closely enough for the runner."""
+
+    protocol_version = "HTTP/1.1"
+    requests: list[dict] = []
+
+    def do_GET(self):
+        self._reply(200, b"3.1.11")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        StandInHandler.requests.append(body)
+        if "HANG" in body["text"]:
+            time.sleep(2)
+        if "FAIL" in body["text"]:
+            self._reply(500, b"Unknown reader: nope")
+            return
+        docx = ("docx:" + body["text"]).encode("utf-8")
+        payload = {"output": base64.b64encode(docx).decode("ascii"), "base64": True, "messages": []}
+        self._reply(200, json.dumps(payload).encode("utf-8"))
+
+    def _reply(self, status, data):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class RecordingFallback(SubprocessToolRunner):
+    def __init__(self):
+        super().__init__(pandoc_path=None, mmdc_path=None)
+        self.calls = []
+
+    def run_pandoc(self, args, input_text=None):
+        self.calls.append(args)
+        return CompletedProcessLike(0, "", "")
+
+
+def _test_server_runner_round_trip() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            (root / "img.png").write_bytes(b"\x89PNG fake")
+            src = root / "in.md"
+            src.write_text("# Hello\n\n![x](img.png)\n", encoding="utf-8")
+            ref = ROOT / "templates" / "tech_template_v1.docx"
+            out = root / "out.docx"
+            fallback = RecordingFallback()
+            runner = PandocServerToolRunner(fallback, server_url=f"http://127.0.0.1:{server.server_port}")
+
+            base_args = [str(src), "--from", "gfm", "--to", "docx", "--output", str(out)]
+            args = base_args + ["--reference-doc", str(ref), "--resource-path", str(root), "--toc", "-M", "title=T"]
+            for _ in range(2):
+                cp = runner.run_pandoc(args)
+                assert cp.returncode == 0, cp.stderr
+            assert out.read_bytes().startswith(b"docx:# Hello")
+            sent = StandInHandler.requests[-1]
+            assert sent["table-of-contents"] is True
+            assert sent["metadata"] == {"title": "T"}
+            assert set(sent["files"]) == {ref.name, "img.png"}
+            assert fallback.calls == []
+
+            # Content passed directly needs no input file at all.
+            cp = runner.run_pandoc(base_args[1:], input_text="# Direct\n")
+            assert cp.returncode == 0
+            assert out.read_bytes() == b"docx:# Direct\n"
+
+            # Lua filters are not available in the server sandbox.
+            runner.run_pandoc(base_args + ["--lua-filter", "x.lua"])
+            assert len(fallback.calls) == 1
+
+            src.write_text("FAIL\n", encoding="utf-8")
+            cp = runner.run_pandoc(base_args)
+            assert cp.returncode == 1
+            assert "Unknown reader" in cp.stderr
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _test_file_uri_images_are_embedded() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        image = Path(td) / "mermaid cache" / "diagram 1.png"
+        image.parent.mkdir()
+        image.write_bytes(b"\x89PNG fake")
+        uri = image.resolve().as_uri()
+        assert "%20" in uri
+        files = _embedded_files(f"![Mermaid diagram 1]({uri})\n", [])
+        assert files == {uri: base64.b64encode(b"\x89PNG fake").decode("ascii")}
+
+
+def _test_timeout_fails_and_unreachable_server_falls_back() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as td:
+            out = Path(td) / "out.docx"
+            args = ["--from", "gfm", "--to", "docx", "--output", str(out)]
+            fallback = RecordingFallback()
+            runner = PandocServerToolRunner(
+                fallback, server_url=f"http://127.0.0.1:{server.server_port}", request_timeout=0.3
+            )
+            start = time.monotonic()
+            try:
+                runner.run_pandoc(args, input_text="HANG\n")
+            except ToolTimeoutError as exc:
+                assert "0.3s" in str(exc)
+            else:
+                raise AssertionError("expected ToolTimeoutError")
+            assert time.monotonic() - start < 1.5
+            assert fallback.calls == []
+
+            # Nothing listens on a just-released port: the subprocess path takes over.
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", 0))
+                closed_port = sock.getsockname()[1]
+            runner = PandocServerToolRunner(fallback, server_url=f"http://127.0.0.1:{closed_port}")
+            cp = runner.run_pandoc(args, input_text="# Hi\n")
+            assert cp.returncode == 0
+            assert len(fallback.calls) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main() -> int:
+    _test_server_runner_round_trip()
+    _test_file_uri_images_are_embedded()
+    _test_timeout_fails_and_unreachable_server_falls_back()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
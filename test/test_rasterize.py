@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.core import rasterize
+from docforge.core.mermaid_cache import MermaidCache
+from docforge.core.models import BuildOptions, EXIT_OK
+from docforge.core.rasterize import RasterizeError, SvgRasterizer, with_png_dpi
+from docforge.core.service import BuildService, DerivedPng
+from docforge.core.timing import PhaseTimer
+
+
+def _chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+def _png(width: int = 2, height: int = 1) -> bytes:
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    rows = b"".join(b"\x00" + b"\xff\x00\x00" * width for _ in range(height))
+    return rasterize.PNG_SIGNATURE + _chunk(b"IHDR", ihdr) + _chunk(b"IDAT", zlib.compress(rows)) + _chunk(b"IEND", b"")
+
+
+def _chunks(data: bytes) -> list[tuple[bytes, bytes]]:
+    chunks = []
+    pos = len(rasterize.PNG_SIGNATURE)
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        kind, body = data[pos + 4 : pos + 8], data[pos + 8 : pos + 8 + length]
+        assert struct.unpack(">I", data[pos + 8 + length : pos + 12 + length])[0] == zlib.crc32(kind + body)
+        chunks.append((kind, body))
+        pos += 12 + length
+    return chunks
+
+
+class FakeRasterizer(SvgRasterizer):
+    def rasterize(self, svg_path, png_path):
+        assert svg_path.read_text(encoding="utf-8") == "<svg></svg>"
+        png_path.write_bytes(with_png_dpi(_png(), self.dpi))
+
+
+class SvgOnlyRunner(ToolRunner):
+    def __init__(self):
+        self.outputs: list[str] = []
+        self._lock = threading.Lock()
+
+    def run_pandoc(self, args, input_text=None):
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        with self._lock:
+            self.outputs.append(output_svg.suffix)
+        output_svg.write_text("<svg></svg>", encoding="utf-8")
+        return CompletedProcessLike(0, "", "")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+class HtmlLabelRunner(SvgOnlyRunner):
+    """Mermaid output for a diagram type that keeps HTML labels."""
+
+    def run_mermaid(self, input_mmd, output_svg):
+        with self._lock:
+            self.outputs.append(output_svg.suffix)
+        if output_svg.suffix == ".svg":
+            output_svg.write_text("<svg><foreignObject><div>Animal</div></foreignObject></svg>", encoding="utf-8")
+        else:
+            output_svg.write_bytes(_png())
+        return CompletedProcessLike(0, "", "")
+
+
+def _test_png_dpi_chunk() -> None:
+    data = with_png_dpi(_png(), 192)
+    kinds = [kind for kind, _ in _chunks(data)]
+    assert kinds == [b"IHDR", b"pHYs", b"IDAT", b"IEND"]
+    phys = dict(_chunks(data))[b"pHYs"]
+    assert struct.unpack(">IIB", phys) == (7559, 7559, 1)
+    again = with_png_dpi(data, 300)
+    assert [kind for kind, _ in _chunks(again)].count(b"pHYs") == 1
+    assert struct.unpack(">IIB", dict(_chunks(again))[b"pHYs"])[0] == 11811
+    try:
+        with_png_dpi(b"<svg/>", 96)
+    except RasterizeError:
+        pass
+    else:
+        raise AssertionError("expected RasterizeError")
+
+
+def _test_from_config() -> None:
+    assert SvgRasterizer.from_config({}) is None
+    assert SvgRasterizer.from_config({"mermaid_raster": "browser"}) is None
+    cfg = {"mermaid_raster": "local", "mermaid_png_dpi": 300, "mermaid_png_scale": 2}
+    if rasterize.cairosvg is None:
+        try:
+            SvgRasterizer.from_config(cfg)
+        except RasterizeError as exc:
+            assert "CairoSVG" in str(exc)
+        else:
+            raise AssertionError("expected RasterizeError")
+    else:
+        assert SvgRasterizer.from_config(cfg) == SvgRasterizer(dpi=300, scale=2)
+
+
+def _test_png_derived_from_shared_svg() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        runner = SvgOnlyRunner()
+        svc = BuildService(base_dir=ROOT, tool_runner=runner)
+        text = "# Doc\n\n```mermaid\ngraph TD; A-->B\n```\n\n```mermaid\ngraph TD; B-->C\n```\n"
+        cache = MermaidCache(Path(td))
+        derive = DerivedPng(FakeRasterizer(dpi=192), svg_profile="svgprofile")
+
+        timer = PhaseTimer()
+        converted, count = svc._replace_mermaid_with_image(
+            text, cache, runner, "png", profile="png192", timer=timer, derive=derive
+        )
+        assert count == 2 and runner.outputs == [".svg", ".svg"]
+        assert converted.count("png192/") == 2 and ".png)" in converted
+        assert {block["cache"] for block in timer.mermaid_blocks} == {"miss"}
+        assert "mermaid.rasterize" in timer.phases
+
+        # The SVG build and a PNG build at another density reuse the browser renders.
+        svc._replace_mermaid_with_image(text, cache, runner, "svg", profile="svgprofile")
+        timer = PhaseTimer()
+        derive = DerivedPng(FakeRasterizer(dpi=300), svg_profile="svgprofile")
+        svc._replace_mermaid_with_image(text, cache, runner, "png", profile="png300", timer=timer, derive=derive)
+        assert runner.outputs == [".svg", ".svg"]
+        assert {block["cache"] for block in timer.mermaid_blocks} == {"derived"}
+        pngs = sorted((Path(td) / "png300").glob("*.png"))
+        assert len(pngs) == 2 and struct.unpack(">IIB", dict(_chunks(pngs[0].read_bytes()))[b"pHYs"])[0] == 11811
+
+
+def _test_html_labels_fall_back_to_browser_png() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        runner = HtmlLabelRunner()
+        svc = BuildService(base_dir=ROOT, tool_runner=runner)
+        text = "# Doc\n\n```mermaid\nclassDiagram\n  class Animal\n```\n"
+        cache = MermaidCache(Path(td))
+        derive = DerivedPng(FakeRasterizer(dpi=192), svg_profile="svgprofile")
+
+        timer = PhaseTimer()
+        converted, count = svc._replace_mermaid_with_image(
+            text, cache, runner, "png", profile="png192", timer=timer, derive=derive
+        )
+        assert count == 1 and runner.outputs == [".svg", ".png"]
+        assert "png192/" in converted and "mermaid.rasterize" not in timer.phases
+        assert [event["event"] for event in timer.events] == ["mermaid_raster_fallback"]
+        warning = BuildService._raster_fallback_warning(timer)
+        assert warning is not None and warning.code == "MERMAID_RASTER_FALLBACK" and "block(s) 1 " in warning.message
+        assert BuildService._raster_fallback_warning(PhaseTimer()) is None
+
+
+def _test_missing_cairosvg_falls_back_to_browser() -> None:
+    if rasterize.cairosvg is not None:
+        return
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        config = root / "templates.yaml"
+        text = (ROOT / "config" / "templates.yaml").read_text(encoding="utf-8")
+        config.write_text(text.replace("mermaid_raster: browser", "mermaid_raster: local"), encoding="utf-8")
+        src = root / "doc.md"
+        src.write_text("# Doc\n\n```mermaid\ngraph TD; A-->B\n```\n", encoding="utf-8")
+        runner = SvgOnlyRunner()
+        result = BuildService(base_dir=root, tool_runner=runner).run(
+            BuildOptions(
+                input_path=src,
+                output_path=root / "doc.docx",
+                config_path=config,
+                template_dir=ROOT / "templates",
+                mermaid_format="png",
+            )
+        )
+        assert result.exit_code == EXIT_OK
+        assert runner.outputs == [".png"]
+        assert [w.code for w in result.warnings] == ["MERMAID_RASTER_UNAVAILABLE"]
+
+
+def main() -> int:
+    _test_png_dpi_chunk()
+    _test_from_config()
+    _test_png_derived_from_shared_svg()
+    _test_html_labels_fall_back_to_browser_png()
+    _test_missing_cairosvg_falls_back_to_browser()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
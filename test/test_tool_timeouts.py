@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.async_runner import AsyncToolRunner
+from docforge.adapters.tool_runner import (
+    CompletedProcessLike,
+    SubprocessToolRunner,
+    ToolRunner,
+    ToolTimeoutError,
+)
+from docforge.core.async_service import AsyncBuildService
+from docforge.core.models import BuildOptions, EXIT_MERMAID_ERROR, STATUS_BUILT
+from docforge.core.service import BuildService, MermaidRetryPolicy
+
+DOC = "# Title\n\n```mermaid\ngraph TD; A-->B\n```\n"
+
+
+def _hanging_tool(root: Path) -> tuple[Path, Path]:
+    """A fake tool that starts a grandchild (like mmdc starting Chromium) and hangs."""
+    pid_file = root / "child.pid"
+    script = root / "hang"
+    script.write_text(
+        f"#!/bin/sh\nsleep 60 &\necho $! > '{pid_file}'\nwait\n",
+        encoding="utf-8",
+    )
+    script.chmod(0o755)
+    return script, pid_file
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child of an already reaped parent is reparented and reaped by init; zombies count as dead.
+    try:
+        return Path(f"/proc/{pid}/stat").read_text().split()[2] != "Z"
+    except OSError:
+        return True
+
+
+def _wait_dead(pid: int) -> bool:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if not _alive(pid):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _test_timeout_kills_process_group() -> None:
+    if os.name == "nt":
+        return
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        tool, pid_file = _hanging_tool(root)
+        runner = SubprocessToolRunner(pandoc_path=str(tool), mmdc_path=str(tool), pandoc_timeout=0.5)
+        started = time.monotonic()
+        try:
+            runner.run_pandoc(["--to", "docx"], input_text="# x\n")
+        except ToolTimeoutError as exc:
+            assert "timed out after 0.5s" in str(exc)
+        else:
+            raise AssertionError("expected ToolTimeoutError")
+        assert time.monotonic() - started < 10
+        assert _wait_dead(int(pid_file.read_text().strip()))
+
+        pid_file.unlink()
+        arunner = AsyncToolRunner(pandoc_path=str(tool), mmdc_path=str(tool), mermaid_timeout=0.5)
+        try:
+            asyncio.run(arunner.arun_mermaid(root / "in.mmd", root / "out.svg"))
+        except ToolTimeoutError:
+            pass
+        else:
+            raise AssertionError("expected ToolTimeoutError")
+        assert _wait_dead(int(pid_file.read_text().strip()))
+
+
+def _test_retry_policy() -> None:
+    policy = MermaidRetryPolicy(retries=2, backoff_seconds=0.5)
+    assert policy.next_delay(1, "mmdc timed out after 120s and was killed") == 0.5
+    assert policy.next_delay(2, "Protocol error: Target closed") == 1.0
+    assert policy.next_delay(3, "Protocol error: Target closed") is None
+    assert policy.next_delay(1, "Error: Parse error on line 2:") is None
+    assert policy.next_delay(1, "UnknownDiagramError: No diagram type detected") is None
+    assert MermaidRetryPolicy().next_delay(1, "crash") is None
+
+
+class FlakyRunner(ToolRunner):
+    """Times out on the first render, crashes on the second, then succeeds (or always reports a parse error)."""
+
+    def __init__(self, parse_error: bool = False) -> None:
+        self.parse_error = parse_error
+        self.mermaid_calls = 0
+        self._lock = threading.Lock()
+
+    def run_pandoc(self, args, input_text=None):
+        shutil.copyfile(args[args.index("--reference-doc") + 1], args[args.index("--output") + 1])
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        with self._lock:
+            self.mermaid_calls += 1
+            call = self.mermaid_calls
+        if self.parse_error:
+            return CompletedProcessLike(1, "", "Error: Parse error on line 1")
+        if call == 1:
+            raise ToolTimeoutError("mmdc timed out after 120s and was killed")
+        if call == 2:
+            return CompletedProcessLike(1, "", "Protocol error: Target closed")
+        output_svg.write_text("<svg></svg>", encoding="utf-8")
+        return CompletedProcessLike(0, "", "")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _options(root: Path, name: str) -> BuildOptions:
+    config = root / "templates.yaml"
+    if not config.exists():
+        text = (ROOT / "config" / "templates.yaml").read_text(encoding="utf-8")
+        config.write_text(text.replace("mermaid_retry_backoff: 1.0", "mermaid_retry_backoff: 0.01"), encoding="utf-8")
+    src = root / f"{name}.md"
+    src.write_text(DOC.replace("A-->B", f"A-->{name}"), encoding="utf-8")
+    return BuildOptions(
+        input_path=src,
+        output_path=root / f"{name}.docx",
+        config_path=config,
+        template_dir=ROOT / "templates",
+    )
+
+
+def _test_service_retries_transient_mermaid_failures() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        runner = FlakyRunner()
+        result = BuildService(base_dir=root, tool_runner=runner).run(_options(root, "flaky"))
+        assert result.status == STATUS_BUILT, result.error
+        assert runner.mermaid_calls == 3
+        events = json.loads(result.meta_path.read_text(encoding="utf-8"))["events"]
+        assert [e["event"] for e in events] == ["mermaid_timeout", "mermaid_retry", "mermaid_retry"]
+        assert [e.get("attempt") for e in events] == [1, 2, 3]
+        assert [e.get("delay_seconds") for e in events[1:]] == [0.01, 0.02]
+
+        runner = FlakyRunner()
+        result = asyncio.run(AsyncBuildService(base_dir=root, tool_runner=runner).run(_options(root, "aflaky")))
+        assert result.status == STATUS_BUILT, result.error
+        assert runner.mermaid_calls == 3
+
+        runner = FlakyRunner(parse_error=True)
+        result = BuildService(base_dir=root, tool_runner=runner).run(_options(root, "broken"))
+        assert result.exit_code == EXIT_MERMAID_ERROR and runner.mermaid_calls == 1
+        assert "Parse error" in result.error.message and "events" not in result.error.details
+
+
+def main() -> int:
+    _test_timeout_kills_process_group()
+    _test_retry_policy()
+    _test_service_retries_transient_mermaid_failures()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
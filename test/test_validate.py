@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import ToolRunner
+from docforge.core.batch import BatchRunner, collect_jobs
+from docforge.core.mermaid_check import check_mermaid
+from docforge.core.models import (
+    BuildOptions,
+    EXIT_MERMAID_ERROR,
+    EXIT_OK,
+    EXIT_TEMPLATE_ERROR,
+    STATUS_CHECKED,
+)
+from docforge.core.service import BuildService
+
+GOOD = """---
+title: Guide
+---
+# Guide
+
+```mermaid
+graph TD
+  A[Start] --> B{"Ready (yes/no)?"}
+  subgraph inner
+    B -->|yes| C>Done]
+  end
+```
+
+```mermaid
+sequenceDiagram
+  loop Every minute
+    A->>B: ping
+  end
+```
+"""
+
+BAD = """# Broken
+
+```mermaid
+graph TD
+  A[Start --> B
+```
+
+```mermaid
+graf TD
+  A --> B
+```
+"""
+
+
+class ExplodingRunner(ToolRunner):
+    def run_pandoc(self, args, input_text=None):
+        raise AssertionError("validate must not run pandoc")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        raise AssertionError("validate must not run mmdc")
+
+    def get_versions(self):
+        raise AssertionError("validate must not query tools")
+
+
+def _options(src: Path, **overrides) -> BuildOptions:
+    fields = {"config_path": ROOT / "config" / "templates.yaml", "template_dir": ROOT / "templates", **overrides}
+    return BuildOptions(input_path=src, output_path=src.with_suffix(".docx"), **fields)
+
+
+def _test_check_mermaid() -> None:
+    assert check_mermaid("graph LR\n  A-->B\n") == []
+    assert check_mermaid("%% comment\n---\n\nflowchart TB\n  A(round) --> B[(db)]\n") == [
+        (2, "unknown diagram type '---'")
+    ]
+    assert check_mermaid("---\ntitle: x\n---\npie\n  \"a\" : 1\n") == []
+    assert check_mermaid("graph XY\n  A-->B\n") == [(1, "unknown flowchart direction 'XY'")]
+    assert check_mermaid("graph TD\n  A[x --> B(y]\n") == [(2, "unbalanced ']'")]
+    assert check_mermaid("graph TD\n  A[\"label ] with bracket\"] --> B\n") == []
+    # HTML and edge label text is not bracket syntax.
+    assert check_mermaid("graph TD\n  A[<b>bold</b>] --> B\n") == []
+    assert check_mermaid("graph TD\n  A -->|a>b| B\n  C>asymmetric] --> D{{hex}}\n") == []
+    assert check_mermaid("graph TD\n  A -->|oops B\n") == [(2, "unclosed '|'")]
+    # Statements after the header's ';' are checked too.
+    assert check_mermaid("graph TD; A-->") == [(1, "link without a target node")]
+    assert check_mermaid("graph TD; A-->B; B-->C[x\n") == [(1, "unclosed '['")]
+    assert check_mermaid("graph TD\n  A -->|yes|\n  B --- C; C -.->\n") == [
+        (2, "link without a target node"),
+        (3, "link without a target node"),
+    ]
+    assert check_mermaid("graph LR; A[a #59; b] --> B; subgraph s; C-->D; end") == []
+    assert check_mermaid("sequenceDiagram\n  alt ok\n    A->>B: hi\n  end\n  end\n") == [
+        (5, "'end' without an open block")
+    ]
+    assert check_mermaid("sequenceDiagram\n  opt maybe\n    A->>B: hi\n") == [(2, "'opt' is never closed with 'end'")]
+    assert check_mermaid("\n%% only a comment\n") == [(2, "empty diagram")]
+
+
+def _test_validate_writes_nothing() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        src = root / "guide.md"
+        src.write_text(GOOD, encoding="utf-8")
+        result = BuildService(base_dir=root, tool_runner=ExplodingRunner()).validate(_options(src))
+        assert result.exit_code == EXIT_OK, result.error
+        assert result.status == STATUS_CHECKED
+        assert result.output_path is None and result.meta_path is None
+        assert "mermaid_check" in result.timings["phases"]
+        assert sorted(p.name for p in root.iterdir()) == ["guide.md"]
+
+        disabled = BuildService(base_dir=root).validate(_options(src, enable_mermaid=False))
+        assert disabled.exit_code == EXIT_OK
+        assert [w.code for w in disabled.warnings] == ["MERMAID_SKIPPED"]
+
+
+def _test_validate_reports_every_problem() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        src = root / "broken.md"
+        src.write_text(BAD, encoding="utf-8")
+        result = BuildService(base_dir=root, tool_runner=ExplodingRunner()).validate(_options(src))
+        assert result.exit_code == EXIT_MERMAID_ERROR and result.status == STATUS_CHECKED
+        assert result.error.details["mermaid"] == [
+            "Mermaid block #1 (line 5): unclosed '['",
+            "Mermaid block #2 (line 9): unknown diagram type 'graf'",
+        ]
+        assert result.error.message == result.error.details["mermaid"][0]
+
+        src.write_text("---\ntemplate: nope\n---\n# X\n", encoding="utf-8")
+        result = BuildService(base_dir=root).validate(_options(src))
+        assert result.exit_code == EXIT_TEMPLATE_ERROR and result.status == STATUS_CHECKED
+
+        fake_template = root / "templates" / "tech_template_v1.docx"
+        fake_template.parent.mkdir()
+        fake_template.write_bytes(b"not a zip")
+        src.write_text("# X\n", encoding="utf-8")
+        result = BuildService(base_dir=root).validate(_options(src, template_dir=fake_template.parent))
+        assert result.exit_code == EXIT_TEMPLATE_ERROR
+        assert "not a DOCX package" in result.error.message
+
+
+def _test_batch_check_mode() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        (root / "good.md").write_text(GOOD, encoding="utf-8")
+        (root / "bad.md").write_text(BAD, encoding="utf-8")
+        template = _options(root / "template.md")
+        jobs = collect_jobs([str(root / "*.md")], None, root / "out", template)
+        report = BatchRunner(
+            base_dir=root, config_path=template.config_path, tool_runner=ExplodingRunner(), check=True
+        ).run(jobs)
+        assert {item.input_path.name: item.exit_code for item in report.items} == {
+            "bad.md": EXIT_MERMAID_ERROR,
+            "good.md": EXIT_OK,
+        }
+        assert report.exit_code == EXIT_MERMAID_ERROR
+        assert not (root / "out").exists()
+
+
+def main() -> int:
+    _test_check_mermaid()
+    _test_validate_writes_nothing()
+    _test_validate_reports_every_problem()
+    _test_batch_check_mode()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
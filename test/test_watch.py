@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from docforge.adapters.tool_runner import CompletedProcessLike, ToolRunner
+from docforge.core.models import BuildOptions, STATUS_BUILT, STATUS_SKIPPED_UP_TO_DATE
+from docforge.core.watch import Watcher, linked_images
+
+
+class GatedRunner(ToolRunner):
+    """Copies the reference doc as its output; optionally holds each pandoc call until released."""
+
+    def __init__(self, gate: threading.Event | None = None):
+        self.gate = gate
+        self.started = threading.Event()
+        self.lock = threading.Lock()
+        self.active: dict[str, int] = {}
+        self.max_active = 0
+
+    def run_pandoc(self, args, input_text=None):
+        output = args[args.index("--output") + 1]
+        with self.lock:
+            self.active[output] = self.active.get(output, 0) + 1
+            self.max_active = max(self.max_active, self.active[output])
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        shutil.copyfile(args[args.index("--reference-doc") + 1], output)
+        with self.lock:
+            self.active[output] -= 1
+        return CompletedProcessLike(0, "", "")
+
+    def run_mermaid(self, input_mmd, output_svg):
+        output_svg.write_text("<svg></svg>", encoding="utf-8")
+        return CompletedProcessLike(0, "", "")
+
+    def get_versions(self):
+        return {"pandoc": "fake", "mmdc": "fake"}
+
+
+def _setup(root: Path) -> tuple[Path, list[BuildOptions]]:
+    config = root / "templates.yaml"
+    config.write_text((ROOT / "config" / "templates.yaml").read_text(encoding="utf-8"), encoding="utf-8")
+    (root / "img.png").write_bytes(b"\x89PNG one")
+    (root / "a.md").write_text("# A\n\n![pic](img.png \"Pic\")\n", encoding="utf-8")
+    (root / "b.md").write_text("# B\n", encoding="utf-8")
+    jobs = [
+        BuildOptions(
+            input_path=root / name,
+            output_path=root / "out" / name.replace(".md", ".docx"),
+            config_path=config,
+            template_dir=ROOT / "templates",
+            enable_mermaid=False,
+        )
+        for name in ("a.md", "b.md")
+    ]
+    return config, jobs
+
+
+def _test_rebuilds_only_affected_documents() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        config, jobs = _setup(root)
+        assert linked_images(jobs[0].input_path) == {(root / "img.png").resolve()}
+
+        results: list[tuple[str, str]] = []
+        watcher = Watcher(
+            base_dir=root,
+            config_path=config,
+            jobs=jobs,
+            tool_runner=GatedRunner(),
+            on_result=lambda job, result, _elapsed: results.append((job.input_path.name, result.status)),
+        )
+        try:
+            watcher.start()
+            watcher.flush()
+            assert sorted(results) == [("a.md", STATUS_BUILT), ("b.md", STATUS_BUILT)]
+            assert watcher.check() == set()
+
+            results.clear()
+            (root / "b.md").write_text("# B edited\n", encoding="utf-8")
+            assert watcher.check() == {1}
+            watcher.flush()
+            assert results == [("b.md", STATUS_BUILT)]
+
+            # Images are not in the build fingerprint; the watcher forces the rebuild.
+            results.clear()
+            (root / "img.png").write_bytes(b"\x89PNG two!")
+            assert watcher.check() == {0}
+            watcher.flush()
+            assert results == [("a.md", STATUS_BUILT)]
+
+            results.clear()
+            config.write_text(config.read_text(encoding="utf-8") + "# tweak\n", encoding="utf-8")
+            assert watcher.check() == {0, 1}
+            watcher.flush()
+            assert sorted(results) == [("a.md", STATUS_BUILT), ("b.md", STATUS_BUILT)]
+
+            # Touching an input without changing it is caught by the build manifest.
+            results.clear()
+            stat = (root / "b.md").stat()
+            os.utime(root / "b.md", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            assert watcher.check() == {1}
+            watcher.flush()
+            assert results == [("b.md", STATUS_SKIPPED_UP_TO_DATE)]
+        finally:
+            watcher.close()
+
+
+def _test_never_overlaps_builds_of_one_target() -> None:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        config, jobs = _setup(root)
+        gate = threading.Event()
+        runner = GatedRunner(gate)
+        builds: list[str] = []
+        watcher = Watcher(
+            base_dir=root,
+            config_path=config,
+            jobs=jobs[1:],
+            tool_runner=runner,
+            workers=4,
+            on_result=lambda job, result, _elapsed: builds.append(result.status),
+        )
+        try:
+            watcher.start()
+            assert len(watcher.dispatch()) == 1
+            assert runner.started.wait(5)
+            (root / "b.md").write_text("# B changed while building\n", encoding="utf-8")
+            assert watcher.check() == {0}
+            assert watcher.dispatch() == []
+            gate.set()
+            watcher.flush()
+            assert builds == [STATUS_BUILT, STATUS_BUILT]
+            assert runner.max_active == 1
+        finally:
+            gate.set()
+            watcher.close()
+
+
+def main() -> int:
+    _test_rebuilds_only_affected_documents()
+    _test_never_overlaps_builds_of_one_target()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())